@@ -0,0 +1,78 @@
+# 担当教員の閲覧・操作権限
+#
+# 教員ごとに「担当クラスID」「担当生徒ID」の集合を作り、
+# 権限チェックをメモリ上の所属判定（student_id in access.student_ids）で行う。
+# ・担当クラスID（ClassStaff）は毎回DBから読む（インデックスだけで返る1クエリ）。割り当ての解除は
+#   ワーカーごとのキャッシュ（LocMemCache）に関係なく、全ワーカーで直ちに反映される
+# ・担当クラスの生徒ID集合だけをキャッシュする。クラス・生徒の変更時は conditional.bump_global() で
+#   全体バージョンが進み作り直される。キャッシュが共有されていない構成でも ACCESS_TIMEOUT 秒で失効する
+
+from typing import NamedTuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import metrics
+from .conditional import GLOBAL_KEY
+from .models import ClassStaff, Student
+from .tenancy import current_db
+
+ACCESS_KEY = "access:{db}:{classes}"
+ACCESS_TIMEOUT = 60
+
+
+class Access(NamedTuple):
+    class_ids: frozenset
+    student_ids: frozenset
+
+    def can_view_student(self, student_id) -> bool:
+        return student_id in self.student_ids
+
+
+NO_ACCESS = Access(frozenset(), frozenset())
+
+
+def _class_ids(user, school):
+    assignments = ClassStaff.objects.filter(user=user)
+    if school is not None:
+        assignments = assignments.filter(class_room__grade__school=school)
+    return frozenset(assignments.values_list("class_room_id", flat=True))
+
+
+def get_access(user, school=None) -> Access:
+    """教員が担当するクラス・生徒のID集合を返す（生徒ID集合はキャッシュ済みなら問い合わせなし）"""
+    if not user.is_authenticated:
+        return NO_ACCESS
+    class_ids = _class_ids(user, school)
+    if not class_ids:
+        return NO_ACCESS
+    db = current_db()
+    global_key = GLOBAL_KEY.format(db=db)
+    key = ACCESS_KEY.format(db=db, classes=",".join(map(str, sorted(class_ids))))
+    cached = cache.get_many([global_key, key])
+    version = cached.get(global_key)
+    if version is None:
+        # バージョンが無い（未設定・追い出し）場合は古いキャッシュを信用せず、新しいバージョンから始める
+        cache.add(global_key, timezone.now(), None)
+        version = cache.get(global_key)
+    stored = cached.get(key)
+    hit = stored is not None and version is not None and stored[0] == version
+    metrics.cache_lookup("access", hit)
+    if hit:
+        return Access(class_ids, stored[1])
+    student_ids = frozenset(Student.objects.filter(class_room_id__in=class_ids).values_list("id", flat=True))
+    if version is not None:
+        cache.set(key, (version, student_ids), ACCESS_TIMEOUT)
+    return Access(class_ids, student_ids)
+
+
+def request_access(request) -> Access:
+    """リクエスト中は1回だけ求めて使い回す（ETag 計算とビュー本体で共有）"""
+    if not hasattr(request, "_access"):
+        request._access = get_access(request.user, getattr(request, "school", None))
+    return request._access
+
+
+def scope_entries(queryset, access):
+    """Entry のクエリセットを担当生徒の分だけに絞り込む（一括操作の対象チェック用）"""
+    return queryset.filter(student_id__in=access.student_ids)
@@ -1,32 +1,128 @@
 #モデルクラス（管理者画面でのDB更新）
 
+import unicodedata
+
 from django.contrib import admin, messages
-from .models import Grade, ClassRoom, Student, Entry
+from .models import School, Grade, ClassRoom, ClassStaff, Student, Entry, EntryEvent, Job, AlertKeyword, EntryAlert, TeacherDigest
 from django.utils import timezone
 from django.http import HttpResponseRedirect
 from django.contrib.admin.utils import unquote
 from django.db.models.functions import Cast
 from django.db.models import IntegerField
+from django.db import transaction, router
+from .conditional import bump_entries
+from . import metrics
+from .replica import replica_reads
+from . import jobs
+from .alerts import scan_entry
+from .search import matching_keys, prefix_q, search_user_ids
+from django.conf import settings
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.db.models import Case, Q, When
+
+
+# 一覧画面（changelist）の読み取りをレプリカへ送る（GET のみ。アクション実行の POST はプライマリ）
+class ReplicaChangeListMixin:
+    def changelist_view(self, request, extra_context=None):
+        with replica_reads(request):
+            return super().changelist_view(request, extra_context)
+
+
+# オートコンプリートの入力が止まってから問い合わせる（1打鍵ごとに検索しない）
+class DebouncedAutocompleteSelect(AutocompleteSelect):
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        # Select2 は data-* 属性をオプションとして読む（data-ajax--delay → ajax.delay）
+        attrs["data-ajax--delay"] = settings.ADMIN_AUTOCOMPLETE_DELAY_MS
+        attrs["data-minimum-input-length"] = settings.ADMIN_AUTOCOMPLETE_MIN_CHARS
+        return attrs
+
+
+class DebouncedAutocompleteMixin:
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if "widget" not in kwargs and db_field.name in self.get_autocomplete_fields(request):
+            kwargs["widget"] = DebouncedAutocompleteSelect(db_field, self.admin_site, using=kwargs.get("using"))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+# ユーザー名・氏名の検索を core.search の検索キー（前方一致・インデックス）で行う
+# （icontains で auth_user を全件走査しない）。オートコンプリートでは関連度順に上位だけを返し、
+# 一覧画面では一致する全件を対象にする
+class IndexedUserSearchMixin:
+    user_search_field = "pk"  # 検索対象のユーザーを指すフィールド
+
+    def extra_search_q(self, search_term):
+        """ユーザー以外の項目での検索条件（既定はなし）"""
+        return Q(pk__in=[])
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return super().get_search_results(request, queryset, search_term)
+        field = f"{self.user_search_field}__in"
+        if getattr(request.resolver_match, "url_name", None) != "autocomplete":
+            users = matching_keys(search_term, using=queryset.db).values("user_id")
+            return queryset.filter(Q(**{field: users}) | self.extra_search_q(search_term)), False
+        user_ids = search_user_ids(search_term, settings.ADMIN_AUTOCOMPLETE_LIMIT, using=queryset.db)
+        queryset = queryset.filter(Q(**{field: user_ids}) | self.extra_search_q(search_term))
+        if user_ids:
+            ranking = Case(*[When(**{self.user_search_field: pk}, then=i) for i, pk in enumerate(user_ids)],
+                           default=len(user_ids))
+            queryset = queryset.order_by(ranking, "pk")
+        return queryset, False
+
+
+admin.site.unregister(User)
+
+
+@admin.register(User)
+class IndexedUserAdmin(IndexedUserSearchMixin, UserAdmin):
+    # 標準の UserAdmin と同じくメールアドレスでも探せるようにする（完全一致・大文字小文字を区別しない）
+    def extra_search_q(self, search_term):
+        return Q(email__iexact=search_term.strip())
+
+# 学校項目のDB編集処理
+@admin.register(School)
+class SchoolAdmin(admin.ModelAdmin):
+    list_display = ("id","code","name")
+    search_fields = ("code","name")
 
 # 学年項目のDB編集処理
 @admin.register(Grade)
 class GradeAdmin(admin.ModelAdmin):
-    list_display = ("id","name","year")
+    list_display = ("id","school","name","year")
+    list_filter = ("school",)
     search_fields = ("name",) 
 
+# 担当教員（副担任・学年主任など）の割り当て。担任は homeroom_teacher から自動で登録される
+class ClassStaffInline(DebouncedAutocompleteMixin, admin.TabularInline):
+    model = ClassStaff
+    autocomplete_fields = ("user",)
+    extra = 0
+
+
 # 学級項目のDB編集処理
 @admin.register(ClassRoom)
-class ClassRoomAdmin(admin.ModelAdmin):
+class ClassRoomAdmin(DebouncedAutocompleteMixin, admin.ModelAdmin):
     list_display = ("id","grade","name","homeroom_teacher")
     autocomplete_fields = ("grade","homeroom_teacher",)
     search_fields = ("name",) 
+    inlines = [ClassStaffInline]
 
 # 生徒項目のDB編集処理
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(ReplicaChangeListMixin, IndexedUserSearchMixin, DebouncedAutocompleteMixin, admin.ModelAdmin):
     list_display = ("id","student_no","user","class_room")
-    search_fields = ("student_no","user__username","user__first_name","user__last_name")
+    # ユーザー名・氏名は検索キーで、生徒番号は前方一致（idx_student_no の範囲検索）で探す（IndexedUserSearchMixin）。
+    # 以前の部分一致（icontains）と違い、番号の途中の数字では見つからない（"2" で 12番は出ない）
+    search_fields = ("student_no",)
+    user_search_field = "user_id"
     autocomplete_fields = ("user","class_room",)
+
+    def extra_search_q(self, search_term):
+        no = unicodedata.normalize("NFKC", search_term).strip()  # 全角数字でも探せるようにする
+        return prefix_q("student_no", no) if no else Q(pk__in=[])
  
     def get_queryset(self, request):
         qs = super().get_queryset(request)
@@ -37,49 +133,165 @@ class StudentAdmin(admin.ModelAdmin):
         return qs.order_by("class_room_id", "student_no_int", "id")
 
 
+# 要注意キーワードの登録（保存時に検知用オートマトンが作り直される）
+@admin.register(AlertKeyword)
+class AlertKeywordAdmin(admin.ModelAdmin):
+    list_display = ("keyword","category","is_active")
+    list_editable = ("is_active",)
+    list_filter = ("category","is_active")
+    search_fields = ("keyword",)
+
+
+# 連絡帳のキーワード検知結果（参照のみ）
+class EntryAlertInline(admin.TabularInline):
+    model = EntryAlert
+    fields = ("keyword","category","created_at")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+# 既読・未読の操作履歴（参照のみ）
+class EntryEventInline(admin.TabularInline):
+    model = EntryEvent
+    fields = ("created_at","action","actor","source")
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("actor")
+
+
 # 連絡帳データ項目のDB編集処理
 @admin.register(Entry)
-class EntryAdmin(admin.ModelAdmin):
+class EntryAdmin(ReplicaChangeListMixin, DebouncedAutocompleteMixin, admin.ModelAdmin):
     list_display = ("student","target_date","is_read","read_by","read_at","status")
     list_filter = ("status","target_date","student__class_room")
     search_fields = ("student__user__username","student__student_no","content",)
     readonly_fields = ("status","read_by","read_at")
+    # 全生徒を選択肢に読み込まないよう検索で選ぶ
+    autocomplete_fields = ("student",)
     change_form_template = "admin/core/entry/change_form.html"
+    inlines = [EntryAlertInline, EntryEventInline]
 
     # 連絡帳データを未提出に戻してデータを削除する処理
     @admin.action(description="未提出に戻す（選択した提出データを削除）")
     def revert_to_unsubmitted(modeladmin, request, queryset):
-        count = queryset.count()
-        queryset.delete()
-        messages.success(request, f"{count}件を未提出に戻しました。")
+        # 削除はバックグラウンドジョブで実行（リクエスト内で大量削除しない）
+        ids = list(queryset.values_list("pk", flat=True))
+        job = jobs.enqueue("entries.delete", {"ids": ids})
+        messages.success(request, f"{len(ids)}件を未提出に戻す処理を受け付けました（ジョブ#{job.pk}）。")
     
     # 連絡帳データを未読に戻してデータを更新する処理
     @admin.action(description="未読に戻す（既読を解除）")
     def revert_to_unread(self, request, queryset):
-        count = queryset.update(read_at=None, read_by=None,status=Entry.Status.SUBMITTED,)
+        db = router.db_for_write(Entry)
+        with transaction.atomic(using=db):
+            # 既読だったものだけを対象にし、同じトランザクションで操作履歴をまとめて追記
+            ids = list(queryset.filter(read_at__isnull=False).values_list("pk", flat=True))
+            now = timezone.now()
+            count = Entry.objects.using(db).filter(pk__in=ids).update(
+                read_at=None, read_by=None, status=Entry.Status.SUBMITTED, updated_at=now)
+            EntryEvent.record(ids, EntryEvent.Action.UNREAD, request.user, "admin_bulk", using=db, at=now)
+        bump_entries(Entry.objects.using(db).filter(pk__in=ids))
         self.message_user(request, f"{count}件を未読に戻しました。", level=messages.SUCCESS)
 
     # 連絡帳データを既読に戻してデータを更新する処理
     @admin.action(description="既読にする")
     def mark_as_read(self, request, queryset):
-        count = queryset.update(read_at=timezone.now(), read_by=request.user, status=Entry.Status.READ,)
+        db = router.db_for_write(Entry)
+        with transaction.atomic(using=db):
+            # 未読だったものだけを対象にする（既読の読者・日時は上書きせず、履歴も重複させない）
+            ids = list(queryset.filter(read_at__isnull=True).values_list("pk", flat=True))
+            now = timezone.now()
+            count = Entry.objects.using(db).filter(pk__in=ids, read_at__isnull=True).update(
+                read_at=now, read_by=request.user, status=Entry.Status.READ, updated_at=now)
+            EntryEvent.record(ids, EntryEvent.Action.READ, request.user, "admin_bulk", using=db, at=now)
+        bump_entries(Entry.objects.using(db).filter(pk__in=ids))
+        metrics.inc("entry_marked_read_total", count, source="admin")
         self.message_user(request, f"{count}件を既読にしました。", level=messages.SUCCESS)
 
     # 既読→未読にするための処理メソッド
     def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
         if request.method == "POST" and "_unread" in request.POST:
             obj = self.get_object(request, unquote(object_id))
-            Entry.objects.filter(pk=obj.pk).update(
-                status=Entry.Status.SUBMITTED,
-                read_at=None,
-                read_by=None,
-            )
+            obj.unlock_as_unread(actor=request.user, source="admin")
             self.message_user(request, "既読を未読に戻しました。")
             return HttpResponseRedirect(request.path)
         return super().changeform_view(request, object_id, form_url, extra_context)
 
+    # 内容を編集した場合はキーワード検知をやり直す
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if "content" in form.changed_data or not change:
+            scan_entry(obj)
+
     # 変更処理のレスポンス処理
     def response_change(self, request, obj):
         return super().response_change(request, obj)
 
-    actions = ["mark_as_read", "revert_to_unread"]
\ No newline at end of file
+    actions = ["mark_as_read", "revert_to_unread", "revert_to_unsubmitted"]
+
+
+# 既読・未読の操作履歴の一覧（先生ごとの確認用。追記のみのため編集・削除は不可）
+@admin.register(EntryEvent)
+class EntryEventAdmin(admin.ModelAdmin):
+    # 削除済みの連絡帳の履歴も表示するため entry は結合しない（INNER JOIN で消えないよう entry_id を表示）
+    list_display = ("created_at","entry_id","action","actor","source")
+    list_filter = ("action","source")
+    search_fields = ("actor__username","entry__student__user__username")
+    list_select_related = ("actor",)
+    date_hierarchy = "created_at"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+# バックグラウンドジョブの確認・再実行
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id","name","status","attempts","max_attempts","run_after","locked_by","updated_at")
+    list_filter = ("status","name")
+    readonly_fields = ("name","payload","status","attempts","max_attempts","run_after",
+                       "locked_by","locked_at","result","last_error","created_at","updated_at")
+    actions = ["retry"]
+
+    # 失敗したジョブを再実行待ちに戻す処理
+    @admin.action(description="再実行する")
+    def retry(self, request, queryset):
+        count = queryset.filter(status=Job.Status.FAILED).update(
+            status=Job.Status.QUEUED, attempts=0, run_after=timezone.now(), updated_at=timezone.now())
+        self.message_user(request, f"{count}件を再実行待ちに戻しました。", level=messages.SUCCESS)
+
+
+# 担当教員ごとの朝のダイジェスト（build_digests が作成する。閲覧のみ）
+@admin.register(TeacherDigest)
+class TeacherDigestAdmin(admin.ModelAdmin):
+    list_display = ("school_day","teacher","missing_count","unread_count","generated_at","emailed_at")
+    list_filter = ("school_day",)
+    list_select_related = ("teacher",)
+    date_hierarchy = "school_day"
+    readonly_fields = ("teacher","school_day","missing","unread","missing_count","unread_count",
+                       "generated_at","emailed_at")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
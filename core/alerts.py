@@ -0,0 +1,139 @@
+# 連絡帳の要注意キーワード検知
+#
+# ・AlertKeyword に登録したキーワードを Aho-Corasick オートマトンにまとめ、
+#   本文を1回走査するだけで全キーワードを検出する（キーワード数に依存せず本文長に比例）
+# ・本文・キーワードとも NFKC 正規化 + カタカナ→ひらがな + 小文字化してから照合する
+#   （「イジメ」「いじめ」「ｲｼﾞﾒ」を同一視）
+# ・オートマトンはDBごとにプロセス内でキャッシュし、キーワード変更時にキャッシュ上の版数で無効化する。
+#   版数が他のプロセスに届かない構成（LocMemCache、別プロセスの run_worker）でも AUTOMATON_TIMEOUT 秒で作り直す
+
+import time
+import unicodedata
+from collections import deque
+
+from django.core.cache import cache
+
+from .tenancy import current_db
+
+VERSION_KEY = "alerts:keywords:v:{db}"
+
+# DBエイリアス → (版数, オートマトン, 作成時刻)
+_compiled = {}
+AUTOMATON_TIMEOUT = 60
+
+# カタカナ（ァ〜ヶ）→ ひらがな（ぁ〜ゖ）
+_KANA_FOLD = {c: c - 0x60 for c in range(0x30A1, 0x30F7)}
+
+
+def normalize(text: str) -> str:
+    """照合用に正規化する（NFKC・カタカナ→ひらがな・小文字化）"""
+    return unicodedata.normalize("NFKC", text or "").translate(_KANA_FOLD).lower()
+
+
+class Automaton:
+    """Aho-Corasick オートマトン
+
+    patterns は [(キーワード, 値), ...]。search() は本文中に現れたキーワードの値を出現順（重複なし）で返す。
+    """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._values = []
+        for word, value in patterns:
+            word = normalize(word).strip()
+            if not word:
+                continue
+            node = 0
+            for ch in word:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(len(self._values))
+            self._values.append(value)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                # 失敗先で一致するキーワードもこのノードで一致したものとして扱う
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self._values)
+
+    def search(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        found = []
+        seen = set()
+        node = 0
+        for ch in normalize(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for i in out[node]:
+                if i not in seen:
+                    seen.add(i)
+                    found.append(self._values[i])
+        return found
+
+
+def bump_keywords(db=None):
+    """キーワード変更時に呼び、各プロセスのオートマトンを作り直させる"""
+    key = VERSION_KEY.format(db=db or current_db())
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def get_automaton(db=None) -> Automaton:
+    """現在のDBのキーワードから作ったオートマトンを返す（版数が変わるか AUTOMATON_TIMEOUT 秒経つまで再利用）"""
+    from .models import AlertKeyword
+
+    db = db or current_db()
+    key = VERSION_KEY.format(db=db)
+    version = cache.get(key)
+    if version is None:
+        # キャッシュから消えた場合に古い版数と衝突しないよう時刻で初期化する
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    cached = _compiled.get(db)
+    if cached is not None and cached[0] == version and time.monotonic() - cached[2] < AUTOMATON_TIMEOUT:
+        return cached[1]
+    rows = AlertKeyword.objects.using(db).filter(is_active=True).values_list("keyword", "category")
+    automaton = Automaton((kw, (kw, cat)) for kw, cat in rows)
+    _compiled[db] = (version, automaton, time.monotonic())
+    return automaton
+
+
+def scan(text, automaton=None):
+    """本文を走査して [(キーワード, 区分), ...] を返す"""
+    if automaton is None:
+        automaton = get_automaton()
+    return automaton.search(text)
+
+
+def scan_entry(entry, automaton=None):
+    """1件の連絡帳を走査し、検知結果（EntryAlert）を置き換える。検知件数を返す"""
+    from .models import EntryAlert
+
+    hits = scan(entry.content, automaton)
+    db = entry._state.db or current_db()
+    EntryAlert.objects.using(db).filter(entry=entry).delete()
+    EntryAlert.objects.using(db).bulk_create(
+        EntryAlert(entry=entry, keyword=kw, category=cat) for kw, cat in hits)
+    return len(hits)
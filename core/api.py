@@ -0,0 +1,360 @@
+# タブレット（キオスク）・モバイル向けの JSON API（/api/v1/）
+#
+# ・認証は画面と同じセッション（login/ で取得）。POST には CSRF トークン（X-CSRFToken ヘッダ）が必要で、
+#   トークンのクッキーは me/ の GET で発行する
+# ・一覧は fields= で返す項目を絞り込み、cursor= で次のページを取得する（提出日・IDの降順）
+# ・複数クラスの提出状況、複数件の既読はそれぞれ1回のリクエストで扱う
+# ・参照系は画面と同じ ETag で条件付きGETに対応する（変化がなければ 304）
+
+import base64
+import json
+from datetime import date
+from functools import wraps
+
+from django.contrib.auth import login
+from django.contrib.auth.forms import AuthenticationForm
+from django.db.models import IntegerField, Q
+from django.db.models.functions import Cast, Concat
+from django.http import JsonResponse
+from django.urls import path
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import condition
+
+from .access import request_access, scope_entries
+from .auth import remember_device
+from .conditional import student_etag, student_last_modified, teacher_etag, teacher_last_modified
+from .models import ClassRoom, Entry, Student, calc_prev_schoolday
+from .replica import read_from_replica
+from .views import is_in
+
+app_name = "api"
+
+# 1ページの件数（既定・上限）と、一括操作で受け付ける件数の上限
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_BATCH = 500
+
+# fields= で指定できる項目名 → values_list の列
+ENTRY_FIELDS = {
+    "id": "id",
+    "date": "target_date",
+    "student": "student_id",
+    "student_no": "student__student_no",
+    "name": "student_name",
+    "class": "student__class_room_id",
+    "content": "content",
+    "condition": "condition",
+    "mental": "mental",
+    "read_at": "read_at",
+    "updated_at": "updated_at",
+}
+DEFAULT_ENTRY_FIELDS = ("id", "date", "student", "condition", "mental", "read_at")
+TODAY_FIELDS = ("id", "date", "content", "condition", "mental", "read_at", "updated_at")
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+def api_view(*roles, methods=("GET",)):
+    """JSON API 用のデコレータ（未ログインは 401、ロール外は 403、入力エラーは 400 を JSON で返す）"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method not in methods:
+                response = JsonResponse({"error": "許可されていないメソッドです"}, status=405)
+                response["Allow"] = ", ".join(methods)
+                return response
+            if roles:
+                if not request.user.is_authenticated:
+                    return JsonResponse({"error": "ログインが必要です"}, status=401)
+                if not any(is_in(request.user, role) for role in roles):
+                    return JsonResponse({"error": "権限がありません"}, status=403)
+            try:
+                return view_func(request, *args, **kwargs)
+            except ApiError as e:
+                return JsonResponse({"error": str(e), **e.extra}, status=e.status)
+        return _wrapped
+    return decorator
+
+
+# 生徒・担任のどちらでも使う一覧は、ロールに合わせてバリデータを選ぶ
+def _entries_etag(request, *args, **kwargs):
+    return (teacher_etag if is_in(request.user, "TEACHER") else student_etag)(request)
+
+
+def _entries_last_modified(request, *args, **kwargs):
+    return (teacher_last_modified if is_in(request.user, "TEACHER") else student_last_modified)(request)
+
+
+# ---------- 入力の解釈 ----------
+def _body(request):
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        raise ApiError("JSON の形式が正しくありません")
+    if not isinstance(data, dict):
+        raise ApiError("JSON オブジェクトを送信してください")
+    return data
+
+
+def _ids(values, name):
+    """ID のリスト（JSON の配列、またはカンマ区切り文字列）を重複なしの int のリストにする"""
+    if isinstance(values, str):
+        values = [v for v in values.split(",") if v.strip()]
+    if not isinstance(values, list):
+        raise ApiError(f"{name} は ID の配列で指定してください")
+    try:
+        ids = list(dict.fromkeys(int(v) for v in values if not isinstance(v, bool)))
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} は ID の配列で指定してください")
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f"{name} は {MAX_BATCH} 件までです")
+    return ids
+
+
+def _date(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"{name} は YYYY-MM-DD 形式で指定してください")
+
+
+def _scale(value, name):
+    """1〜5 の整数（省略時は 3=ふつう）。画面と違い、範囲外は丸めずにエラーにする"""
+    if value is None:
+        return 3
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= 5:
+        raise ApiError(f"{name} は 1〜5 の整数で指定してください")
+    return value
+
+
+def _fields(request, default):
+    raw = request.GET.get("fields")
+    if not raw:
+        return default
+    fields = list(dict.fromkeys(f.strip() for f in raw.split(",") if f.strip()))
+    unknown = [f for f in fields if f not in ENTRY_FIELDS]
+    if unknown:
+        raise ApiError(f"不明な項目です: {', '.join(unknown)}", allowed=list(ENTRY_FIELDS))
+    return fields
+
+
+# ---------- カーソルページング ----------
+def encode_cursor(target_date, pk):
+    raw = f"{target_date.isoformat()}:{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        target_date, pk = raw.split(":")
+        return date.fromisoformat(target_date), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ApiError("cursor が正しくありません")
+
+
+def paginate(request, queryset, fields):
+    """(提出日, ID) の降順で1ページ分を返す。次のページがあれば next にカーソルを入れる"""
+    try:
+        limit = min(max(int(request.GET.get("limit") or PAGE_SIZE), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        raise ApiError("limit は整数で指定してください")
+
+    queryset = queryset.order_by("-target_date", "-id")
+    if "name" in fields:
+        queryset = queryset.annotate(student_name=Concat("student__user__last_name", "student__user__first_name"))
+    if request.GET.get("cursor"):
+        last_date, last_id = decode_cursor(request.GET["cursor"])
+        queryset = queryset.filter(Q(target_date__lt=last_date) | Q(target_date=last_date, id__lt=last_id))
+
+    # 指定された項目の列だけを読む（カーソル用に提出日・IDは常に含める）
+    columns = list(dict.fromkeys(["target_date", "id", *(ENTRY_FIELDS[f] for f in fields)]))
+    rows = [dict(zip(columns, row)) for row in queryset.values_list(*columns)[:limit + 1]]
+    items = [{f: row[ENTRY_FIELDS[f]] for f in fields} for row in rows[:limit]]
+    more = len(rows) > limit
+    return {
+        "items": items,
+        "next": encode_cursor(rows[limit - 1]["target_date"], rows[limit - 1]["id"]) if more else None,
+    }
+
+
+# ---------- セッション ----------
+def _me(request):
+    user = request.user
+    if not user.is_authenticated:
+        return {"user": None}
+    return {
+        "user": {
+            "id": user.pk,
+            "username": user.username,
+            "name": f"{user.last_name}{user.first_name}" or user.username,
+            "roles": sorted(user.groups.values_list("name", flat=True)),
+        },
+        "date": calc_prev_schoolday(),
+    }
+
+
+@api_view()
+@ensure_csrf_cookie
+def me(request):
+    return JsonResponse(_me(request))
+
+
+@api_view(methods=("POST",))
+def api_login(request):
+    data = _body(request)
+    form = AuthenticationForm(request, data=data)
+    if not form.is_valid():
+        return JsonResponse({"error": "ユーザー名またはパスワードが正しくありません"}, status=400)
+    login(request, form.get_user())
+    remember_device(request, data.get("remember") is True)
+    return JsonResponse(_me(request))
+
+
+# ---------- 生徒 ----------
+def _own_student(request):
+    student = Student.objects.for_school(request.school).filter(user=request.user).first()
+    if student is None:
+        raise ApiError("生徒情報が登録されていません", status=404)
+    return student
+
+
+def _entry_dict(entry):
+    return {f: getattr(entry, ENTRY_FIELDS[f]) for f in TODAY_FIELDS}
+
+
+@api_view("STUDENT", methods=("GET", "HEAD", "POST"))
+@read_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=student_etag, last_modified_func=student_last_modified)
+def today(request):
+    """GET: 前登校日分の提出状況 / POST: 提出（未読の間は上書き可）"""
+    student = _own_student(request)
+    tdate = calc_prev_schoolday()
+    if request.method == "POST":
+        data = _body(request)
+        content = data.get("content") or ""
+        if not isinstance(content, str):
+            raise ApiError("content は文字列で指定してください")
+        entry, result = Entry.submit(student, tdate, content.strip(),
+                                     _scale(data.get("condition"), "condition"), _scale(data.get("mental"), "mental"))
+        status = {"created": 201, "updated": 200, "locked": 409}[result]
+        return JsonResponse({"result": result, "date": tdate, "entry": _entry_dict(entry)}, status=status)
+
+    entry = Entry.objects.filter(student=student, target_date=tdate).first()
+    return JsonResponse({
+        "date": tdate,
+        "entry": _entry_dict(entry) if entry else None,
+        "can_edit": entry is None or not entry.is_read,
+    })
+
+
+# ---------- 一覧（生徒は本人分、担任は担当生徒分） ----------
+@api_view("STUDENT", "TEACHER", methods=("GET", "HEAD"))
+@read_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_entries_etag, last_modified_func=_entries_last_modified)
+def entries(request):
+    """提出履歴。担任は class=（カンマ区切り）・student=・unread=1 で絞り込める"""
+    fields = _fields(request, DEFAULT_ENTRY_FIELDS)
+    if is_in(request.user, "TEACHER"):
+        access = request_access(request)
+        queryset = scope_entries(Entry.objects.all(), access)
+        if request.GET.get("class"):
+            class_ids = _ids(request.GET["class"], "class")
+            if not set(class_ids) <= access.class_ids:
+                raise ApiError("担当外のクラスが含まれています", status=403)
+            queryset = queryset.filter(student__class_room_id__in=class_ids)
+        if request.GET.get("student"):
+            student_ids = _ids(request.GET["student"], "student")
+            if not all(access.can_view_student(sid) for sid in student_ids):
+                raise ApiError("担当外の生徒が含まれています", status=403)
+            queryset = queryset.filter(student_id__in=student_ids)
+        if request.GET.get("unread") in ("1", "true"):
+            queryset = queryset.filter(read_at__isnull=True)
+    else:
+        queryset = Entry.objects.filter(student=_own_student(request))
+
+    since = _date(request.GET.get("since"), "since")
+    until = _date(request.GET.get("until"), "until")
+    if since:
+        queryset = queryset.filter(target_date__gte=since)
+    if until:
+        queryset = queryset.filter(target_date__lte=until)
+    return JsonResponse(paginate(request, queryset, fields))
+
+
+# ---------- 担任：複数クラスの提出状況・一括既読 ----------
+@api_view("TEACHER", methods=("GET", "HEAD"))
+@read_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=teacher_etag, last_modified_func=teacher_last_modified)
+def class_status(request):
+    """ids=（カンマ区切り、省略時は担当クラス全部）の提出数・未読数・未提出の生徒をまとめて返す"""
+    access = request_access(request)
+    class_ids = _ids(request.GET["ids"], "ids") if request.GET.get("ids") else sorted(access.class_ids)
+    forbidden = [cid for cid in class_ids if cid not in access.class_ids]
+    if forbidden:
+        raise ApiError("担当外のクラスが含まれています", status=403, forbidden=forbidden)
+    tdate = _date(request.GET.get("date"), "date") or calc_prev_schoolday()
+
+    # クラス・生徒・対象日の提出をそれぞれ1回の問い合わせで読む
+    classes = {
+        cid: {"id": cid, "name": name, "grade": grade, "students": 0, "submitted": 0, "unread": 0,
+              "not_submitted": []}
+        for cid, name, grade in ClassRoom.objects.filter(id__in=class_ids)
+        .order_by("grade__year", "name", "id").values_list("id", "name", "grade__name")
+    }
+    submitted = dict(
+        Entry.objects.filter(target_date=tdate, student__class_room_id__in=class_ids)
+        .values_list("student_id", "read_at")
+    )
+    for sid, cid, no, last, first, username in (
+        Student.objects.filter(class_room_id__in=class_ids)
+        .annotate(student_no_int=Cast("student_no", IntegerField()))
+        .order_by("class_room_id", "student_no_int", "id")
+        .values_list("id", "class_room_id", "student_no", "user__last_name", "user__first_name", "user__username")
+    ):
+        summary = classes[cid]
+        summary["students"] += 1
+        if sid not in submitted:
+            summary["not_submitted"].append({"id": sid, "no": no, "name": f"{last}{first}" or username})
+        else:
+            summary["submitted"] += 1
+            summary["unread"] += submitted[sid] is None
+    return JsonResponse({"date": tdate, "classes": list(classes.values())})
+
+
+@api_view("TEACHER", methods=("POST",))
+def mark_read(request):
+    """{"ids": [...]} の連絡帳をまとめて既読にする（担当外・存在しないIDは結果で知らせる）"""
+    ids = _ids(_body(request).get("ids", []), "ids")
+    access = request_access(request)
+    owners = dict(Entry.objects.filter(pk__in=ids).values_list("id", "student_id"))
+    allowed = [pk for pk in ids if pk in owners and access.can_view_student(owners[pk])]
+    read = Entry.lock_many_as_read(allowed, request.user, source="api")
+    newly = set(read)
+    return JsonResponse({
+        "read": read,
+        "already_read": [pk for pk in allowed if pk not in newly],
+        "forbidden": [pk for pk in ids if pk in owners and not access.can_view_student(owners[pk])],
+        "not_found": [pk for pk in ids if pk not in owners],
+    })
+
+
+urlpatterns = [
+    path("me/", me, name="me"),
+    path("login/", api_login, name="login"),
+    path("entries/", entries, name="entries"),
+    path("entries/today/", today, name="today"),
+    path("entries/read/", mark_read, name="mark_read"),
+    path("classes/status/", class_status, name="class_status"),
+]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # シグナル受信処理・バックグラウンドタスク・設定チェックの登録
+        from . import checks, signals, tasks  # noqa: F401
@@ -0,0 +1,86 @@
+# ログイン集中時の認証まわり
+#
+# ・TunablePBKDF2PasswordHasher: PBKDF2 の反復回数を settings.PBKDF2_ITERATIONS で変えられるハッシャー。
+#   アルゴリズム名は標準と同じため既存のハッシュをそのまま検証でき、反復回数が異なるハッシュは
+#   ログイン成功時に Django が現在の設定で再ハッシュする
+# ・LimitedModelBackend: パスワード検証（CPUを使う処理）を同時に LOGIN_HASH_CONCURRENCY 件までに制限する。
+#   gthread ワーカーの全スレッドがハッシュ計算で埋まらないようにし、ダッシュボード等の応答を確保する。
+#   空きを LOGIN_HASH_WAIT_SECONDS 待っても得られなければ LoginBusy を送出し、
+#   LoginBusyMiddleware が 503（Retry-After 付き）に変換する
+
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.http import HttpResponse, JsonResponse
+
+from . import metrics
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return settings.PBKDF2_ITERATIONS or PBKDF2PasswordHasher.iterations
+
+
+class LoginBusy(Exception):
+    """パスワード検証の順番待ちが上限時間を超えた"""
+
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+def _semaphore():
+    global _slots
+    with _slots_lock:
+        if _slots is None or _slots[0] != settings.LOGIN_HASH_CONCURRENCY:
+            _slots = (settings.LOGIN_HASH_CONCURRENCY, threading.BoundedSemaphore(settings.LOGIN_HASH_CONCURRENCY))
+        return _slots[1]
+
+
+class LimitedModelBackend(ModelBackend):
+    """ModelBackend と同じ認証を、プロセス内の同時実行数を制限して行う"""
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if settings.LOGIN_HASH_CONCURRENCY <= 0:
+            return super().authenticate(request, username, password, **kwargs)
+        slots = _semaphore()
+        started = time.perf_counter()
+        if not slots.acquire(timeout=settings.LOGIN_HASH_WAIT_SECONDS):
+            metrics.inc("login_busy_total")
+            raise LoginBusy()
+        metrics.observe("login_hash_wait_seconds", time.perf_counter() - started)
+        try:
+            return super().authenticate(request, username, password, **kwargs)
+        finally:
+            slots.release()
+
+
+class LoginBusyMiddleware:
+    """LoginBusy を 503 に変換する（ログイン画面・API・管理画面のログインで共通）"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, LoginBusy):
+            return None
+        message = "ログインが混み合っています。しばらくしてから再度お試しください。"
+        if request.path.startswith("/api/"):
+            response = JsonResponse({"error": message}, status=503)
+        else:
+            response = HttpResponse(message, content_type="text/plain; charset=utf-8", status=503)
+        response["Retry-After"] = str(settings.LOGIN_RETRY_AFTER_SECONDS)
+        return response
+
+
+def remember_device(request, remember):
+    """「この端末を記憶する」が選ばれたらセッションの有効期限を延ばす（ログイン直後に呼ぶ）"""
+    if remember and settings.REMEMBER_DEVICE_DAYS > 0:
+        request.session.set_expiry(settings.REMEMBER_DEVICE_DAYS * 24 * 60 * 60)
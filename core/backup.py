@@ -0,0 +1,109 @@
+# SQLite のオンラインバックアップ・リストア（backup_db / restore_db コマンドから使用）
+#
+# ・ファイルコピーではなく SQLite のバックアップAPIで少しずつ（pages 単位）コピーし、
+#   ステップ間で sleep して提出処理の書き込みロックを長く握らない
+#   （コピー中に他の接続から書き込まれた場合は SQLite が自動でやり直すため、途中状態のコピーにならない）
+# ・コピー後に PRAGMA integrity_check で検証してから gzip 圧縮し、一時ファイルから差し替える
+# ・スナップショット名は <DBエイリアス>-<UTC日時>.sqlite3.gz（名前順 = 時刻順）
+
+import gzip
+import os
+import shutil
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+from django.conf import settings
+
+SUFFIX = ".sqlite3.gz"
+
+
+class BackupError(Exception):
+    pass
+
+
+def primary_aliases():
+    """バックアップ対象のDBエイリアス（レプリカを除く）"""
+    replicas = set(settings.REPLICAS.values())
+    return [alias for alias in settings.DATABASES if alias not in replicas]
+
+
+def db_path(alias):
+    """DBエイリアスに対応する SQLite ファイルのパス"""
+    return Path(str(settings.DATABASES[alias]["NAME"]))
+
+
+def integrity_check(path):
+    """PRAGMA integrity_check の結果が ok でなければ BackupError"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as e:
+        rows = [str(e)]
+    finally:
+        conn.close()
+    if rows != ["ok"]:
+        raise BackupError(f"整合性チェックに失敗しました: {path}: {'; '.join(rows[:5])}")
+
+
+def _copy(src, dst, pages, sleep):
+    try:
+        src.backup(dst, pages=pages, sleep=sleep)
+    finally:
+        dst.close()
+        src.close()
+
+
+def snapshot(source, alias, dest_dir, pages=256, sleep=0.01, now=None):
+    """source（SQLiteファイル）を dest_dir に alias 名の圧縮スナップショットとして保存し、そのパスを返す"""
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    stamp = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    final = dest_dir / f"{alias}-{stamp}{SUFFIX}"
+    raw = dest_dir / f".{alias}-{stamp}.sqlite3.tmp"
+    packed = dest_dir / f".{alias}-{stamp}{SUFFIX}.tmp"
+    try:
+        _copy(sqlite3.connect(str(source)), sqlite3.connect(str(raw)), pages, sleep)
+        integrity_check(raw)
+        with open(raw, "rb") as fin, gzip.open(packed, "wb", compresslevel=6) as fout:
+            shutil.copyfileobj(fin, fout, 1024 * 1024)
+        os.replace(packed, final)
+    finally:
+        for tmp in (raw, packed):
+            if tmp.exists():
+                tmp.unlink()
+    return final
+
+
+def snapshots(alias, dest_dir):
+    """alias のスナップショットを古い順に返す"""
+    return sorted(Path(dest_dir).glob(f"{alias}-*{SUFFIX}"))
+
+
+def rotate(alias, dest_dir, keep):
+    """新しい keep 件を残して古いスナップショットを削除し、削除したパスを返す"""
+    old = snapshots(alias, dest_dir)[:-keep] if keep > 0 else []
+    for path in old:
+        path.unlink()
+    return old
+
+
+def restore(path, target, pages=256, sleep=0.0):
+    """スナップショットを検証してから target（SQLiteファイル）へ書き戻す
+
+    稼働中の接続があってもファイルを差し替えず、バックアップAPI経由で書き込む
+    （SQLite のロックに従うため、読み手が壊れたファイルを開くことはない）。
+    """
+    path, target = Path(path), Path(target)
+    raw = target.with_name(f".{target.name}.restore.tmp")
+    try:
+        if path.suffix == ".gz":
+            with gzip.open(path, "rb") as fin, open(raw, "wb") as fout:
+                shutil.copyfileobj(fin, fout, 1024 * 1024)
+        else:
+            shutil.copyfile(path, raw)
+        integrity_check(raw)
+        _copy(sqlite3.connect(str(raw)), sqlite3.connect(str(target)), pages, sleep)
+    finally:
+        if raw.exists():
+            raw.unlink()
@@ -0,0 +1,22 @@
+# 起動時の設定チェック（manage.py check・migrate・各管理コマンドの実行前に Django が呼ぶ）
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# プロセスごとに中身が別になるキャッシュ
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    """ETag の版数などをプロセス間で共有するため、本番でプロセス内キャッシュを使っていないか確かめる"""
+    if settings.DEBUG or settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        "既定のキャッシュがプロセスごとに別になっているため、ETag の版数などの更新が他のワーカーに届きません。",
+        hint="DJANGO_CACHE_DIR に全ワーカー・管理コマンドから読み書きできるディレクトリを設定してください。",
+        id="core.E001",
+    )]
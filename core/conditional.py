@@ -0,0 +1,137 @@
+# 条件付きGET（ETag / Last-Modified）用のバリデータ計算
+#
+# バリデータは「MAX(Entry.updated_at)」＋「スコープごとのバージョン（最終変更時刻）」から作る。
+# .update() や delete() は updated_at に現れないため、書き込み側で bump_* を呼んでバージョンを進める。
+# バージョンは Django のキャッシュに保存する。gunicorn の各ワーカーと管理コマンド・run_worker の間で共有されないと
+# 他のプロセスでの更新が ETag に現れず古い画面が 304 で返り続けるため、本番ではファイルキャッシュを必須とする
+# （settings の既定。プロセスごとの LocMemCache は DEBUG 時のみで、core.checks が確認する）。
+
+import hashlib
+
+from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from . import metrics
+from .replica import read_source
+from .models import ClassStaff, Entry, Student, calc_prev_schoolday
+from .tenancy import current_db
+
+# キャッシュキー（生徒スコープは生徒ユーザーID、担任スコープは担任ユーザーIDで管理）
+# 学校DBごとにユーザーIDが重複するため、先頭にDBエイリアスを付ける
+GLOBAL_KEY = "etag:v:{db}:global"
+STUDENT_KEY = "etag:v:{db}:student:{id}"
+TEACHER_KEY = "etag:v:{db}:teacher:{id}"
+
+
+def _is_in(user, group_name: str) -> bool:
+    return user.is_authenticated and user.groups.filter(name=group_name).exists()
+
+
+# ---------- バージョン更新（書き込み側から呼ぶ） ----------
+def bump_global():
+    """クラス編成・生徒情報など全画面に影響する変更時に呼ぶ"""
+    cache.set(GLOBAL_KEY.format(db=current_db()), timezone.now(), None)
+
+
+def bump_students(student_ids):
+    """指定生徒の提出データが変わった時に、生徒本人と担任のバージョンを進める"""
+    student_ids = [sid for sid in set(student_ids) if sid is not None]
+    if not student_ids:
+        return
+    now = timezone.now()
+    db = current_db()
+    rows = list(Student.objects.filter(id__in=student_ids).values_list("user_id", "class_room_id"))
+    keys = {STUDENT_KEY.format(db=db, id=user_id): now for user_id, _ in rows}
+    # 担任だけでなく副担任・学年主任など担当教員全員の画面を更新対象にする
+    staff = ClassStaff.objects.filter(class_room_id__in={c for _, c in rows}).values_list("user_id", flat=True)
+    for teacher_id in set(staff):
+        keys[TEACHER_KEY.format(db=db, id=teacher_id)] = now
+    if keys:
+        cache.set_many(keys, None)
+
+
+def bump_entries(queryset):
+    """Entry のクエリセット（.update() / .delete() の対象）に含まれる生徒のバージョンを進める"""
+    bump_students(queryset.values_list("student_id", flat=True).distinct())
+
+
+# ---------- バリデータ計算（ビュー側の condition デコレータから呼ぶ） ----------
+def _validators(request, scope_key, entries):
+    """(etag, last_modified) を返す"""
+    global_key = GLOBAL_KEY.format(db=current_db())
+    latest = entries.aggregate(m=Max("updated_at"))["m"]
+    versions = cache.get_many([global_key, scope_key])
+    for key in (global_key, scope_key):
+        metrics.cache_lookup("etag_version", key in versions)
+    stamps = [t for t in (latest, *versions.values()) if t is not None]
+    last_modified = max(stamps) if stamps else None
+
+    # 検索語(q)・タイムライン(sid)で表示が変わるためクエリ文字列込みのパスを含める。
+    # CSRFトークンを含むページを返すため、CSRFクッキーもETagに含める（再ログイン後の古いトークン対策）
+    # 版数はキャッシュ（プライマリ側の最新）から読むため、レプリカから読んだ場合はその同期時刻も含める
+    raw = "|".join([
+        request.get_full_path(),
+        str(request.user.pk),
+        str(calc_prev_schoolday()),
+        str(latest),
+        str(versions.get(global_key)),
+        str(versions.get(scope_key)),
+        request.META.get("CSRF_COOKIE", ""),
+        read_source(),
+    ])
+    etag = 'W/"%s"' % hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return etag, last_modified
+
+
+def _skip(request) -> bool:
+    # GET/HEAD 以外、または未表示のフラッシュメッセージがある場合は条件付き応答にしない
+    if request.method not in ("GET", "HEAD"):
+        return True
+    return len(messages.get_messages(request)) > 0
+
+
+# etag_func / last_modified_func の両方から呼ばれるため、同一リクエスト内では結果を使い回す
+def _student_validators(request):
+    if not hasattr(request, "_entry_validators"):
+        if _skip(request) or not _is_in(request.user, "STUDENT"):
+            request._entry_validators = (None, None)
+        else:
+            request._entry_validators = _validators(
+                request,
+                STUDENT_KEY.format(db=current_db(), id=request.user.pk),
+                Entry.objects.filter(student__user=request.user),
+            )
+    return request._entry_validators
+
+
+def _teacher_validators(request):
+    from .access import request_access
+
+    if not hasattr(request, "_entry_validators"):
+        if _skip(request) or not _is_in(request.user, "TEACHER"):
+            request._entry_validators = (None, None)
+        else:
+            request._entry_validators = _validators(
+                request,
+                TEACHER_KEY.format(db=current_db(), id=request.user.pk),
+                Entry.objects.filter(student_id__in=request_access(request).student_ids),
+            )
+    return request._entry_validators
+
+
+def student_etag(request, *args, **kwargs):
+    return _student_validators(request)[0]
+
+
+def student_last_modified(request, *args, **kwargs):
+    return _student_validators(request)[1]
+
+
+def teacher_etag(request, *args, **kwargs):
+    return _teacher_validators(request)[0]
+
+
+def teacher_last_modified(request, *args, **kwargs):
+    return _teacher_validators(request)[1]
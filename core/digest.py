@@ -0,0 +1,127 @@
+# 担当教員向けの朝のダイジェスト（build_digests コマンドから使用）
+#
+# ・対象登校日の未提出の生徒と、対象登校日より前の分でまだ未読の連絡帳（前日までに読むはずだったもの）を、学校全体について
+#   集合演算のクエリ（担当割り当て・未提出・未読の3回）で求める。クラス単位のループやダッシュボードの描画はしない
+# ・未読は直近 unread_days 日（既定は settings.DIGEST_UNREAD_DAYS）の分に限る。古い未読が溜まっても一覧とメールが膨らまない
+# ・結果を担当教員ごとにまとめ、TeacherDigest に一括で保存する（同じ教員・登校日は上書き）
+# ・メールは1つの接続でまとめて送り、実際に送れた教員の分だけ送信日時を記録する（送信方式は settings.EMAIL_BACKEND）
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Exists, IntegerField, OuterRef
+from django.db.models.functions import Cast
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import ClassRoom, ClassStaff, Entry, Student, TeacherDigest
+
+EMAIL_TEMPLATE = "digest/teacher_email.txt"
+DIGEST_FIELDS = ["missing", "unread", "missing_count", "unread_count", "generated_at"]
+
+
+def _display_name(last_name, first_name, username):
+    return f"{last_name}{first_name}" or username
+
+
+def _class_label(grade, name):
+    return f"{grade} {name}"
+
+
+def collect(school, day, using, unread_days=None):
+    """教員ID → {"missing": [...], "unread": [...]} と、教員ID → (メールアドレス, 氏名) を返す（クエリ3回）"""
+    if unread_days is None:
+        unread_days = settings.DIGEST_UNREAD_DAYS
+    teachers = {}
+    staff_by_class = {}
+    for user_id, class_id, email, last, first, username in (
+        ClassStaff.objects.using(using)
+        .filter(class_room__in=ClassRoom.objects.using(using).for_school(school).values("id"))
+        .order_by("user_id", "class_room_id")
+        .values_list("user_id", "class_room_id", "user__email",
+                     "user__last_name", "user__first_name", "user__username")
+    ):
+        teachers[user_id] = (email, _display_name(last, first, username))
+        staff_by_class.setdefault(class_id, []).append(user_id)
+    digests = {user_id: {"missing": [], "unread": []} for user_id in teachers}
+
+    submitted = Entry.objects.using(using).filter(student=OuterRef("pk"), target_date=day)
+    for sid, class_id, no, grade, class_name, last, first, username in (
+        Student.objects.using(using).for_school(school)
+        .filter(~Exists(submitted))
+        .annotate(student_no_int=Cast("student_no", IntegerField()))
+        .order_by("class_room__grade__year", "class_room__name", "student_no_int", "id")
+        .values_list("id", "class_room_id", "student_no", "class_room__grade__name", "class_room__name",
+                     "user__last_name", "user__first_name", "user__username")
+    ):
+        row = {"student_id": sid, "class_room": _class_label(grade, class_name), "no": no,
+               "name": _display_name(last, first, username)}
+        for user_id in staff_by_class.get(class_id, ()):
+            digests[user_id]["missing"].append(row)
+
+    # 未読の部分インデックス（idx_entry_unread）の範囲だけを読む
+    for entry_id, class_id, target_date, no, grade, class_name, last, first, username in (
+        Entry.objects.using(using).for_school(school)
+        .filter(read_at__isnull=True, target_date__lt=day, target_date__gte=day - timedelta(days=unread_days))
+        .order_by("target_date", "student_id")
+        .values_list("id", "student__class_room_id", "target_date", "student__student_no",
+                     "student__class_room__grade__name", "student__class_room__name",
+                     "student__user__last_name", "student__user__first_name", "student__user__username")
+    ):
+        row = {"entry_id": entry_id, "class_room": _class_label(grade, class_name), "no": no,
+               "name": _display_name(last, first, username), "target_date": target_date.isoformat()}
+        for user_id in staff_by_class.get(class_id, ()):
+            digests[user_id]["unread"].append(row)
+
+    return digests, teachers
+
+
+def save(digests, day, using):
+    """TeacherDigest を一括で保存（同じ教員・登校日の既存分は上書き）し、保存した件数を返す"""
+    now = timezone.now()
+    rows = [
+        TeacherDigest(teacher_id=user_id, school_day=day, missing=d["missing"], unread=d["unread"],
+                      missing_count=len(d["missing"]), unread_count=len(d["unread"]), generated_at=now)
+        for user_id, d in digests.items()
+    ]
+    with transaction.atomic(using=using):
+        TeacherDigest.objects.using(using).bulk_create(
+            rows, batch_size=500, update_conflicts=True,
+            unique_fields=["teacher", "school_day"], update_fields=DIGEST_FIELDS,
+        )
+    return len(rows)
+
+
+def build_messages(digests, teachers, day):
+    """未提出・未読のある教員（メールアドレス登録済み）宛てのメールを [(教員ID, EmailMessage)] で返す"""
+    messages = []
+    for user_id, d in digests.items():
+        email, name = teachers[user_id]
+        if not email or not (d["missing"] or d["unread"]):
+            continue
+        body = render_to_string(EMAIL_TEMPLATE, {"day": day, "teacher": name, **d})
+        subject = f"【連絡帳】{day:%m/%d} 未提出{len(d['missing'])}人・未読{len(d['unread'])}件"
+        messages.append((user_id, EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [email])))
+    return messages
+
+
+def send(messages, day, using):
+    """メールを1つの接続で送り、実際に送れた教員のダイジェストにだけ送信日時を記録して送信数を返す
+
+    send_messages は送れた通数しか返さないため1通ずつ渡して判定する。送れなかった分は emailed_at が
+    空のまま残り、再実行で送り直せる。
+    """
+    if not messages:
+        return 0
+    sent_to = []
+    with get_connection(fail_silently=True) as connection:
+        for user_id, message in messages:
+            if connection.send_messages([message]):
+                sent_to.append(user_id)
+    if sent_to:
+        TeacherDigest.objects.using(using).filter(
+            teacher_id__in=sent_to, school_day=day,
+        ).update(emailed_at=timezone.now())
+    return len(sent_to)
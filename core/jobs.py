@@ -0,0 +1,122 @@
+# DBベースのバックグラウンドジョブキュー
+#
+# ・ビューや管理画面は enqueue() でジョブを登録し、job_status() で状態を確認する
+# ・run_worker コマンドが claim() で条件付き UPDATE によりジョブを取得し、スレッドプールで実行する
+#   （SQLite には SKIP LOCKED がないため「QUEUED のものだけ RUNNING に更新できた件数」で取得を判定する）
+# ・失敗時は指数バックオフで再実行し、max_attempts に達したら FAILED にする
+
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .tenancy import current_db
+
+logger = logging.getLogger(__name__)
+
+# タスク名 → 関数（payload を受け取り、JSON化できる結果を返す）
+_registry = {}
+
+# バックオフの基準秒数（attempts 回目の失敗後は BACKOFF_BASE * 2**(attempts-1) 秒 + ゆらぎ）
+BACKOFF_BASE = 10
+# RUNNING のまま放置されたジョブ（ワーカー異常終了）を再投入するまでの秒数
+STALE_AFTER = 15 * 60
+
+
+def task(name):
+    """ジョブとして実行できる関数を登録するデコレータ"""
+    def _register(func):
+        _registry[name] = func
+        return func
+    return _register
+
+
+def enqueue(name, payload=None, *, delay=0, max_attempts=3) -> Job:
+    """ジョブを登録して返す（トランザクション内で呼んだ場合はコミット時に確定する）"""
+    if name not in _registry:
+        raise ValueError(f"未登録のタスクです: {name}")
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def job_status(job_id) -> dict:
+    """ジョブの状態を辞書で返す（存在しなければ None）"""
+    job = Job.objects.filter(pk=job_id).first()
+    if job is None:
+        return None
+    return {
+        "id": job.pk,
+        "name": job.name,
+        "status": job.status,
+        "attempts": job.attempts,
+        "result": job.result,
+        "error": job.last_error.splitlines()[-1] if job.last_error else "",
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+
+def requeue_stale(now=None) -> int:
+    """ロックが古いまま RUNNING のジョブを待機に戻す"""
+    now = now or timezone.now()
+    return Job.objects.filter(
+        status=Job.Status.RUNNING,
+        locked_at__lt=now - timedelta(seconds=STALE_AFTER),
+    ).update(status=Job.Status.QUEUED, locked_by="", locked_at=None, updated_at=now)
+
+
+def claim(worker_id: str, limit: int):
+    """実行可能なジョブを最大 limit 件取得して RUNNING にする"""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.Status.QUEUED, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:limit]
+    )
+    claimed = []
+    for job_id in candidates:
+        # 他のワーカーが先に取得していれば 0 件更新となる
+        updated = Job.objects.filter(pk=job_id, status=Job.Status.QUEUED).update(
+            status=Job.Status.RUNNING,
+            locked_by=worker_id,
+            locked_at=now,
+            attempts=F("attempts") + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed.append(job_id)
+    return list(Job.objects.filter(pk__in=claimed).order_by("id"))
+
+
+def run(job: Job):
+    """取得済みジョブを1件実行し、結果に応じて状態を更新する"""
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f"未登録のタスクです: {job.name}")
+        with transaction.atomic(using=current_db()):
+            result = func(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = BACKOFF_BASE * 2 ** (job.attempts - 1) * (1 + random.random() * 0.1)
+            fields = dict(status=Job.Status.QUEUED, run_after=now + timedelta(seconds=delay))
+            logger.warning("job %s (%s) failed, retry in %.0fs", job.pk, job.name, delay)
+        else:
+            fields = dict(status=Job.Status.FAILED)
+            logger.error("job %s (%s) failed permanently", job.pk, job.name)
+        Job.objects.filter(pk=job.pk).update(
+            last_error=error, locked_by="", locked_at=None, updated_at=now, **fields)
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.Status.DONE, result=result, last_error="",
+            locked_by="", locked_at=None, updated_at=timezone.now())
@@ -0,0 +1,28 @@
+# SQLite の統計情報（sqlite_stat1）の更新（夜間に定期実行する）
+#
+# 統計情報がないとクエリプランナーは行数を推定できず、未読のみの部分インデックス（idx_entry_unread）より
+# 行数の多い通常のインデックスを選ぶことがある。analysis_limit で各インデックスの読み取り行数を抑えるため、
+# 大きな表でも短時間で終わる。
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "ANALYZE でクエリプランナーの統計情報を更新する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（settings.SCHOOLS にあればその学校のDB）")
+        parser.add_argument("--limit", type=int, default=1000,
+                            help="インデックスごとに読む行数の上限（PRAGMA analysis_limit。0 で全行）")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        with using_school(opts["school"]) as db, connections[db].cursor() as cursor:
+            cursor.execute(f"PRAGMA analysis_limit = {max(0, opts['limit'])}")
+            cursor.execute("ANALYZE")
+        self.stdout.write(self.style.SUCCESS(
+            f"{db} の統計情報を更新しました（{time.perf_counter() - started:.2f}秒）。"))
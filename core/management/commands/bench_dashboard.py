@@ -0,0 +1,52 @@
+# 担任ダッシュボードのHTMLサイズと応答時間（TTFB相当）を計測するベンチマーク
+import gzip
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+
+class Command(BaseCommand):
+    help = "teacher_dashboard のHTMLペイロード（生/gzip）と応答時間を計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--teacher", type=str, default=None,
+                            help="計測に使う担任のユーザー名（省略時は担当生徒の提出が最も多い担任）")
+        parser.add_argument("--requests", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        if opts["teacher"]:
+            teacher = User.objects.filter(username=opts["teacher"]).first()
+        else:
+            from django.db.models import Count
+            teacher = (User.objects.filter(groups__name="TEACHER")
+                       .annotate(n=Count("homeroom_classes__student__entry"))
+                       .order_by("-n").first())
+        if teacher is None:
+            raise CommandError("担任ユーザーが見つかりません。seed_bulk でデータを投入してください。")
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h and "*" not in h and not h.startswith(".")),
+                    "localhost")
+        client = Client(HTTP_HOST=host)
+        client.force_login(teacher)
+        url = reverse("teacher_dashboard")
+
+        timings = []
+        body = b""
+        for _ in range(max(1, opts["requests"])):
+            started = time.perf_counter()
+            res = client.get(url, secure=True)
+            timings.append((time.perf_counter() - started) * 1000)
+            if res.status_code != 200:
+                raise CommandError(f"status {res.status_code}")
+            body = res.content
+
+        self.stdout.write(f"teacher       : {teacher.username}")
+        self.stdout.write(f"html bytes    : {len(body)}")
+        self.stdout.write(f"gzip bytes    : {len(gzip.compress(body))}")
+        self.stdout.write(f"ttfb p50 (ms) : {statistics.median(timings):.2f}")
+        self.stdout.write(f"ttfb mean (ms): {statistics.fmean(timings):.2f}")
@@ -0,0 +1,68 @@
+# ログイン（パスワード検証）の処理能力の計測
+#
+# 設定中のハッシャー（PASSWORD_HASHERS の先頭）でハッシュを作り、検証を一定時間繰り返して
+# 1秒あたりの検証回数を求める。--threads ごとに並列で実行し、1コアあたりの値も表示する
+# （hashlib の PBKDF2 は計算中に GIL を解放するため、スレッドでもコア数まで伸びる）。
+#
+# 例: python manage.py bench_login --seconds 3 --threads 1 4 --iterations 1000000 600000 --students 1000
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.management.base import BaseCommand, CommandError
+
+_PASSWORD = "correct horse battery staple"
+
+
+def _run(verify, seconds):
+    """seconds 秒の間 verify を繰り返し、実行回数を返す"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        verify()
+        count += 1
+    return count
+
+
+class Command(BaseCommand):
+    help = "パスワード検証（ログイン）の回数/秒をスレッド数・PBKDF2 の反復回数ごとに計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=3, help="1条件あたりの計測時間（秒）")
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                            help="並列に検証するスレッド数")
+        parser.add_argument("--iterations", type=int, nargs="+", default=None,
+                            help="比較する PBKDF2 の反復回数（省略時は現在の設定のみ）")
+        parser.add_argument("--students", type=int, default=1000, help="一斉ログインにかかる時間の試算に使う人数")
+
+    def handle(self, *args, **opts):
+        hasher = get_hasher("default")
+        if opts["iterations"] and not isinstance(hasher, PBKDF2PasswordHasher):
+            raise CommandError(f"--iterations は PBKDF2 の場合のみ指定できます（現在: {hasher.algorithm}）。")
+        cores = os.cpu_count() or 1
+        salt = hasher.salt()
+
+        self.stdout.write(f"hasher={hasher.algorithm}, CPU={cores}コア, {opts['seconds']:g}秒/条件")
+        self.stdout.write(f"{'iterations':>11}{'threads':>9}{'ms/login':>10}{'logins/s':>10}{'/core':>8}"
+                          f"{opts['students']:>7}人")
+        for iterations in opts["iterations"] or [None]:
+            encoded = (hasher.encode(_PASSWORD, salt, iterations) if iterations
+                       else hasher.encode(_PASSWORD, salt))
+            label = hasher.decode(encoded).get("iterations", "-")
+
+            def verify():
+                if not hasher.verify(_PASSWORD, encoded):
+                    raise CommandError("検証に失敗しました。")
+
+            verify()  # 初回のライブラリ読み込みは計測に含めない
+            for threads in opts["threads"]:
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    started = time.perf_counter()
+                    count = sum(pool.map(lambda _: _run(verify, opts["seconds"]), range(threads)))
+                    elapsed = time.perf_counter() - started
+                rate = count / elapsed
+                per_core = rate / min(threads, cores)
+                self.stdout.write(
+                    f"{label:>11}{threads:>9}{elapsed * threads / count * 1000:>10.1f}{rate:>10.1f}"
+                    f"{per_core:>8.1f}{opts['students'] / rate:>7.1f}s")
@@ -0,0 +1,87 @@
+# 管理画面のユーザー検索（core.search の検索キー）と従来の icontains 検索の応答時間の比較
+#
+# 既定では計測用のユーザーを1トランザクション内で作成し、計測後にロールバックする（DBに残さない）。
+# 氏名の一部はカタカナで登録し、ひらがなの検索語でも一致することを確認する。
+#
+# 例: python manage.py bench_search --users 50000 --queries 200
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from core.alerts import normalize
+from core.search import index_users, search_user_ids
+
+PREFIX = "bench_"
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, round(len(ordered) * 0.95) - 1)]
+    return f"p50 {statistics.median(ordered):7.2f} / p95 {p95:7.2f} / max {ordered[-1]:7.2f} ms"
+
+
+class Command(BaseCommand):
+    help = "大量ユーザーでの管理画面の検索（検索キーの前方一致 / icontains）の応答時間を計測する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50000, help="作成する計測用ユーザー数")
+        parser.add_argument("--queries", type=int, default=200, help="計測する検索語の数")
+        parser.add_argument("--limit", type=int, default=20, help="1回の検索で返す件数")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="計測用ユーザーを削除せず残す")
+
+    def handle(self, *args, **opts):
+        try:
+            from faker import Faker
+        except Exception as e:
+            raise CommandError("Faker が見つかりません。requirements に追加してください。") from e
+        fake = Faker("ja_JP")
+        Faker.seed(opts["seed"])
+        rng = random.Random(opts["seed"])
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            users = []
+            for i in range(opts["users"]):
+                kana = i % 3 == 0
+                users.append(User(
+                    username=f"{PREFIX}{i:06d}",
+                    last_name=fake.last_kana_name() if kana else fake.last_name(),
+                    first_name=fake.first_kana_name() if kana else fake.first_name(),
+                    password="!",
+                ))
+            User.objects.bulk_create(users, batch_size=2000)
+            indexed = index_users(User.objects.filter(username__startswith=PREFIX))
+            self.stdout.write(f"{opts['users']}人を作成し、{indexed}人の検索キーを作成しました"
+                              f"（{time.perf_counter() - started:.1f}秒）。全ユーザー数: {User.objects.count()}")
+
+            # 姓・姓名・ユーザー名の先頭 1〜4 文字を検索語にする（カタカナの氏名はひらがなで検索）
+            terms = []
+            for user in rng.sample(users, min(opts["queries"], len(users))):
+                source = rng.choice([user.last_name, user.last_name + " " + user.first_name, user.username])
+                term = source[:rng.randint(1, 4)]
+                terms.append(normalize(term) if source is not user.username else term)
+
+            indexed_ms, icontains_ms, hits = [], [], 0
+            for term in terms:
+                t0 = time.perf_counter()
+                ids = search_user_ids(term, opts["limit"])
+                list(User.objects.filter(pk__in=ids))
+                t1 = time.perf_counter()
+                list(User.objects.filter(Q(username__icontains=term) | Q(first_name__icontains=term) |
+                                         Q(last_name__icontains=term)).order_by("username")[:opts["limit"]])
+                t2 = time.perf_counter()
+                indexed_ms.append((t1 - t0) * 1000)
+                icontains_ms.append((t2 - t1) * 1000)
+                hits += bool(ids)
+
+            self.stdout.write(f"検索語 {len(terms)}件（結果あり {hits}件）、上限 {opts['limit']}件")
+            self.stdout.write(f"  検索キー（前方一致）: {_summary(indexed_ms)}")
+            self.stdout.write(f"  icontains（従来）   : {_summary(icontains_ms)}")
+            if not opts["keep"]:
+                transaction.set_rollback(True)
@@ -0,0 +1,58 @@
+# セッション方式ごとの1リクエストあたりのDBクエリ数を計測するベンチマーク
+# 計測用のユーザーはトランザクション内で作成し、最後にロールバックする（実データには残らない）
+# cached_db のセッションは本番と同じキャッシュに専用の KEY_PREFIX を付けて置き、計測後にログアウトして消す
+# （既定のキャッシュを clear() すると、ETag の版数や利用者のセッションまで消えてしまう）
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+BENCH_CACHE_ALIAS = "bench_sessions"
+
+ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+
+class Command(BaseCommand):
+    help = "セッション方式（db / cached_db / signed_cookies）ごとのDB負荷を比較する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        n = max(1, opts["requests"])
+        host = next((h for h in settings.ALLOWED_HOSTS if h and "*" not in h and not h.startswith(".")),
+                    "localhost")
+        url = reverse("home")
+        bench_caches = {
+            **settings.CACHES,
+            BENCH_CACHE_ALIAS: {**settings.CACHES[settings.SESSION_CACHE_ALIAS], "KEY_PREFIX": BENCH_CACHE_ALIAS},
+        }
+
+        self.stdout.write(f"{'engine':<16}{'queries/req':>12}{'session q/req':>15}{'ms/req':>10}")
+        with transaction.atomic():
+            user = User.objects.create_user(username="__bench_sessions__")
+            for name, engine in ENGINES.items():
+                with override_settings(SESSION_ENGINE=engine, CACHES=bench_caches,
+                                       SESSION_CACHE_ALIAS=BENCH_CACHE_ALIAS):
+                    client = Client(HTTP_HOST=host)
+                    client.force_login(user)
+                    started = time.perf_counter()
+                    with CaptureQueriesContext(connection) as ctx:
+                        for _ in range(n):
+                            client.get(url, secure=True)
+                    elapsed = time.perf_counter() - started
+                    client.logout()
+                session_q = sum(1 for q in ctx.captured_queries if "django_session" in q["sql"])
+                self.stdout.write(
+                    f"{name:<16}{len(ctx) / n:>12.2f}{session_q / n:>15.2f}{elapsed * 1000 / n:>10.2f}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,97 @@
+# 一覧画面のテンプレート描画時間の比較（Django テンプレート / Jinja2）
+#
+# DBを使わずにメモリ上で連絡帳（Entry）を行数分作り、担任ダッシュボード（履歴）と生徒の提出履歴を
+# 両方のエンジンで描画して1回あたりの時間を比べる。ビュー・クエリの時間は含まない。
+#
+# 例: python manage.py bench_templates --rows 200 1000 5000 --repeat 5
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import RequestFactory
+from django.utils import timezone
+
+from core.models import ClassRoom, Entry, Grade, RiskScore, Student
+
+TEMPLATES = ("teacher_dashboard.html", "student_entries.html")
+
+
+def sample_entries(count, seed=0):
+    """select_related 済みと同じ状態（関連オブジェクトがキャッシュ済み）の Entry を count 件作る"""
+    rng = random.Random(seed)
+    teacher = User(id=1, username="teacher", last_name="担任", first_name="花子")
+    students = []
+    for g in range(1, 4):
+        grade = Grade(id=g, name=f"{g}年", year=2025)
+        for c in range(1, 5):
+            class_room = ClassRoom(id=g * 10 + c, name=f"{c}組", grade=grade, homeroom_teacher=teacher)
+            for no in range(1, 31):
+                sid = len(students) + 1
+                user = User(id=100 + sid, username=f"s{sid:04d}", last_name="生徒", first_name=f"{sid}")
+                student = Student(id=sid, user=user, class_room=class_room, student_no=str(no))
+                # 逆方向の OneToOne（student.risk）もキャッシュされる
+                RiskScore(student=student, score=rng.uniform(0, 80), missing_streak=rng.randint(0, 3))
+                students.append(student)
+
+    now = timezone.now()
+    entries = []
+    for i in range(count):
+        read = rng.random() < 0.5
+        entries.append(Entry(
+            id=i + 1,
+            student=students[i % len(students)],
+            target_date=now.date() - timedelta(days=i // len(students)),
+            content="昨日は元気に過ごしました。" * rng.randint(1, 4),
+            condition=rng.randint(1, 5),
+            mental=rng.randint(1, 5),
+            read_at=now if read else None,
+            read_by=teacher if read else None,
+        ))
+    return entries, students
+
+
+class Command(BaseCommand):
+    help = "一覧画面のテンプレートを Django テンプレートと Jinja2 で描画し、行数ごとの時間を比べる"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, nargs="+", default=[200, 1000, 5000], help="描画する行数")
+        parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数（中央値を表示）")
+
+    def handle(self, *args, **opts):
+        request = RequestFactory().get("/teacher/dashboard/", secure=True)
+        request.user = AnonymousUser()
+
+        self.stdout.write(f"{'template':<26}{'rows':>7}{'django':>11}{'jinja2':>11}{'ratio':>8}  (ms, 中央値)")
+        for rows in opts["rows"]:
+            entries, students = sample_entries(rows)
+            contexts = {
+                "teacher_dashboard.html": {
+                    "tdate": entries[0].target_date if entries else timezone.localdate(),
+                    "flagged": [],
+                    "risk_threshold": settings.RISK_ALERT_THRESHOLD,
+                    "entries_today": entries[:40],
+                    "not_submitted": students[:10],
+                    "history": entries,
+                    "selected_student": None,
+                },
+                "student_entries.html": {"entries": entries},
+            }
+            for name in TEMPLATES:
+                timings = {}
+                for engine in ("django", "jinja2"):
+                    template = engines[engine].get_template(name)
+                    template.render(contexts[name], request)  # 初回のコンパイルは計測に含めない
+                    samples = []
+                    for _ in range(max(1, opts["repeat"])):
+                        started = time.perf_counter()
+                        template.render(contexts[name], request)
+                        samples.append((time.perf_counter() - started) * 1000)
+                    timings[engine] = statistics.median(samples)
+                ratio = timings["django"] / timings["jinja2"] if timings["jinja2"] else 0
+                self.stdout.write(f"{name:<26}{rows:>7}{timings['django']:>11.1f}{timings['jinja2']:>11.1f}"
+                                  f"{ratio:>7.1f}x")
@@ -0,0 +1,53 @@
+# 担当教員ごとの朝のダイジェスト（未提出の生徒・未読の連絡帳）を作成する（始業前の定時実行用）
+#
+# 対象登校日（既定は前登校日＝ダッシュボードの「本日提出分」）の未提出と、それより前の登校日の分で
+# まだ未読の連絡帳を学校全体で求め、TeacherDigest に一括保存する（対象登校日の分は当日読むため含めない）。
+# 未読は直近 --unread-days 日（既定は DJANGO_DIGEST_UNREAD_DAYS）の分に限る。
+# --email を付けると、未提出・未読のある教員へまとめてメールを送る（EMAIL_BACKEND）。
+#
+# 例: python manage.py build_digests --school school-a --email
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import digest
+from core.models import School, calc_prev_schoolday
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "担当教員ごとの未提出・未読の一覧（TeacherDigest）を作成し、必要ならメールで送る"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（省略時は全クラス）")
+        parser.add_argument("--date", default=None, help="対象の登校日（YYYY-MM-DD。省略時は前登校日）")
+        parser.add_argument("--unread-days", type=int, default=None,
+                            help="未読を遡る日数（省略時は settings.DIGEST_UNREAD_DAYS）")
+        parser.add_argument("--email", action="store_true", help="未提出・未読のある教員へメールを送る")
+
+    def handle(self, *args, **opts):
+        try:
+            day = date.fromisoformat(opts["date"]) if opts["date"] else calc_prev_schoolday()
+        except ValueError:
+            raise CommandError("--date は YYYY-MM-DD 形式で指定してください。")
+        if opts["unread_days"] is not None and opts["unread_days"] < 1:
+            raise CommandError("--unread-days は1以上を指定してください。")
+
+        started = time.perf_counter()
+        with using_school(opts["school"]) as db:
+            school = None
+            if opts["school"]:
+                school = School.objects.using(db).filter(code=opts["school"]).first()
+                if school is None:
+                    raise CommandError(f"学校コード {opts['school']} が見つかりません。")
+            digests, teachers = digest.collect(school, day, db, opts["unread_days"])
+            collected = time.perf_counter()
+            saved = digest.save(digests, day, db)
+            sent = digest.send(digest.build_messages(digests, teachers, day), day, db) if opts["email"] else 0
+
+        missing = len({s["student_id"] for d in digests.values() for s in d["missing"]})
+        unread = len({e["entry_id"] for d in digests.values() for e in d["unread"]})
+        self.stdout.write(self.style.SUCCESS(
+            f"{day} 分のダイジェストを{saved}人分作成しました（未提出{missing}人・未読{unread}件、"
+            f"メール{sent}通、集計 {collected - started:.2f}秒 / 合計 {time.perf_counter() - started:.2f}秒）。"))
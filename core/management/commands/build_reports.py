@@ -0,0 +1,78 @@
+# クラス別の週次レポート（HTML）を学校単位でまとめて作成する
+#
+# 対象週のデータはクラス・生徒・連絡帳の3回のクエリで取得し、クラスごとの集計と描画は
+# プロセスプールで並列に行う（ワーカーはDBに接続しない）。
+#
+# 例: python manage.py build_reports --school school-a --week 2025-06-09 --workers 4
+#     → <REPORTS_DIR>/school-a/2025-06-09/index.html と class-<id>.html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from functools import partial
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from core import reports
+from core.models import School, calc_prev_schoolday
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "クラスごとの週次レポート（提出数・未提出日・体調/メンタル平均）を HTML で書き出す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（省略時は全クラス）")
+        parser.add_argument("--week", default=None,
+                            help="対象週に含まれる日付（YYYY-MM-DD。省略時は前登校日の週）")
+        parser.add_argument("--out", default=None, help="出力先ディレクトリ（既定は REPORTS_DIR）")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="描画に使うプロセス数（既定はCPU数。1 ならプールを使わない）")
+
+    def handle(self, *args, **opts):
+        try:
+            day = date.fromisoformat(opts["week"]) if opts["week"] else calc_prev_schoolday()
+        except ValueError:
+            raise CommandError("--week は YYYY-MM-DD 形式で指定してください。")
+        days = reports.week_days(day)
+        if not days:
+            raise CommandError(f"{day} の週には登校日がありません。")
+        workers = opts["workers"] or os.cpu_count() or 1
+        if workers < 1:
+            raise CommandError("--workers は1以上を指定してください。")
+
+        started = time.perf_counter()
+        with using_school(opts["school"]) as db:
+            school = None
+            if opts["school"]:
+                school = School.objects.using(db).filter(code=opts["school"]).first()
+                if school is None:
+                    raise CommandError(f"学校コード {opts['school']} が見つかりません。")
+            classes = reports.collect(school, days, db)
+        loaded = time.perf_counter()
+
+        week_start = day - timedelta(days=day.weekday())
+        out_dir = Path(opts["out"] or settings.REPORTS_DIR) / (opts["school"] or "all") / week_start.isoformat()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        extra = {"week_start": week_start, "generated_at": timezone.localtime()}
+        render = partial(reports.render_class, out_dir=out_dir, extra=extra)
+
+        if workers == 1 or len(classes) <= 1:
+            summaries = [render(c) for c in classes]
+        else:
+            # fork したワーカーへDB接続を引き継がない（spawn の場合は initializer で Django を初期化する）
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=min(workers, len(classes)), initializer=django.setup) as pool:
+                summaries = list(pool.map(render, classes))
+        index = reports.render_index(summaries, out_dir, dict(
+            extra, school_name=school.name if school else ""))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(classes)}クラスのレポートを作成しました（{days[0]}〜{days[-1]}、"
+            f"取得 {loaded - started:.2f}秒 / 合計 {elapsed:.2f}秒）: {index}"))
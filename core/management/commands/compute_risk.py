@@ -0,0 +1,77 @@
+# 体調・メンタルの推移から生徒ごとの早期警戒スコアを再計算する（夜間バッチ用）
+import math
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import risk
+from core.conditional import bump_global
+from core.models import Entry, RiskScore, School, Student, calc_prev_schoolday
+from core.tenancy import using_school
+
+
+def _float(v):
+    v = float(v)
+    return None if math.isnan(v) else round(v, 3)
+
+
+class Command(BaseCommand):
+    help = "直近の登校日の体調・メンタルから早期警戒スコア（RiskScore）を再計算する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（省略時は全生徒）")
+        parser.add_argument("--days", type=int, default=10, help="集計する登校日数（既定は約2週間）")
+        parser.add_argument("--as-of", default=None,
+                            help="集計の最終登校日（YYYY-MM-DD。省略時は前登校日）")
+
+    def handle(self, *args, **opts):
+        try:
+            as_of = date.fromisoformat(opts["as_of"]) if opts["as_of"] else calc_prev_schoolday()
+        except ValueError:
+            raise CommandError("--as-of は YYYY-MM-DD 形式で指定してください。")
+        if opts["days"] < 2:
+            raise CommandError("--days は2以上を指定してください。")
+
+        started = time.perf_counter()
+        with using_school(opts["school"]) as db:
+            school = None
+            if opts["school"]:
+                school = School.objects.using(db).filter(code=opts["school"]).first()
+                if school is None:
+                    raise CommandError(f"学校コード {opts['school']} が見つかりません。")
+            students = Student.objects.using(db).for_school(school)
+            student_ids = list(students.order_by("id").values_list("id", flat=True))
+            days = risk.school_days(as_of, opts["days"])
+
+            condition, mental = risk.load_matrix(
+                student_ids, days, Entry.objects.using(db).for_school(school))
+            result = risk.score(condition, mental)
+            loaded = time.perf_counter()
+
+            rows = [
+                RiskScore(
+                    student_id=sid,
+                    score=float(result["score"][i]),
+                    condition_mean=_float(result["condition_mean"][i]),
+                    mental_mean=_float(result["mental_mean"][i]),
+                    condition_slope=_float(result["condition_slope"][i]),
+                    mental_slope=_float(result["mental_slope"][i]),
+                    missing_streak=int(result["missing_streak"][i]),
+                    as_of=as_of,
+                )
+                for i, sid in enumerate(student_ids)
+            ]
+            with transaction.atomic(using=db):
+                RiskScore.objects.using(db).filter(student__in=students).delete()
+                RiskScore.objects.using(db).bulk_create(rows, batch_size=1000)
+            # 担任ダッシュボードの表示（並び順・強調）が変わるため ETag を更新する
+            bump_global()
+
+        elapsed = time.perf_counter() - started
+        high = int((result["score"] >= settings.RISK_ALERT_THRESHOLD).sum()) if len(student_ids) else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(student_ids)}人のスコアを計算しました（{days[0]}〜{as_of}、要注意{high}人、"
+            f"計算 {loaded - started:.2f}秒 / 合計 {elapsed:.2f}秒）。"))
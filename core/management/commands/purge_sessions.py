@@ -0,0 +1,48 @@
+# 期限切れセッションの削除（チャンク単位で削除し、提出処理のロックを長時間握らない）
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import School
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "期限切れセッションをチャンク単位で削除する（clearsessions の分割版）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（省略時は既定のDB）")
+        parser.add_argument("--chunk-size", type=int, default=500,
+                            help="1回のDELETEで削除する件数")
+        parser.add_argument("--sleep", type=float, default=0.05,
+                            help="チャンク間の待機秒数（書き込みロックを他の処理に譲る）")
+
+    def handle(self, *args, **opts):
+        if settings.SESSION_ENGINE.endswith("signed_cookies"):
+            self.stdout.write("signed_cookies セッションのため削除対象はありません。")
+            return
+
+        chunk = max(1, opts["chunk_size"])
+        now = timezone.now()
+        total = 0
+        # セッションは学校ごとのDBに保存されるため、その学校のDBから削除する
+        with using_school(opts["school"]) as db:
+            if opts["school"] and not School.objects.using(db).filter(code=opts["school"]).exists():
+                raise CommandError(f"学校コード {opts['school']} が見つかりません。")
+            while True:
+                keys = list(
+                    Session.objects.using(db).filter(expire_date__lt=now)
+                    .values_list("session_key", flat=True)[:chunk]
+                )
+                if not keys:
+                    break
+                deleted, _ = Session.objects.using(db).filter(session_key__in=keys).delete()
+                total += deleted
+                if len(keys) < chunk:
+                    break
+                time.sleep(opts["sleep"])
+
+        self.stdout.write(self.style.SUCCESS(f"期限切れセッションを{total}件削除しました。"))
@@ -0,0 +1,23 @@
+# 管理画面のユーザー検索キーの再作成（bulk_create などシグナルを通らない一括投入の後に実行する）
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from core.search import index_users
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "全ユーザーの検索キー（UserSearchKey）を作り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（settings.SCHOOLS にあればその学校のDB）")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="1回に処理するユーザー数")
+
+    def handle(self, *args, **opts):
+        started = time.perf_counter()
+        with using_school(opts["school"]) as db:
+            count = index_users(User.objects.using(db).all(), using=db, chunk_size=opts["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{count}人の検索キーを作り直しました（{time.perf_counter() - started:.1f}秒）。"))
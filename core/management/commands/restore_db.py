@@ -0,0 +1,46 @@
+# backup_db のスナップショットからDBを復元する
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import backup
+
+
+class Command(BaseCommand):
+    help = "backup_db で作成したスナップショットを検証してからDBへ書き戻す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("snapshot", nargs="?", default=None,
+                            help="スナップショットのパス（省略時は最新のもの）")
+        parser.add_argument("--database", default="default", help="復元先のDBエイリアス")
+        parser.add_argument("--dest", default=None, help="スナップショットの保存先（既定は settings.BACKUP_DIR）")
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive",
+                            help="確認せずに実行する")
+
+    def handle(self, *args, **opts):
+        alias = opts["database"]
+        if alias not in backup.primary_aliases():
+            raise CommandError(f"復元できないDBエイリアスです: {alias}")
+
+        path = opts["snapshot"]
+        if path is None:
+            found = backup.snapshots(alias, opts["dest"] or settings.BACKUP_DIR)
+            if not found:
+                raise CommandError(f"{alias} のスナップショットが見つかりません。")
+            path = found[-1]
+
+        if opts["interactive"]:
+            answer = input(f"{alias} を {path} の内容で上書きします。よろしいですか？ [y/N] ")
+            if answer.strip().lower() not in ("y", "yes"):
+                self.stdout.write("中止しました。")
+                return
+
+        connections[alias].close()
+        try:
+            backup.restore(path, backup.db_path(alias))
+        except backup.BackupError as e:
+            raise CommandError(str(e)) from e
+        # ETag のバージョンやセッション等のキャッシュは復元前のデータに基づくため破棄する
+        cache.clear()
+        self.stdout.write(self.style.SUCCESS(f"{alias} を {path} から復元しました。"))
@@ -0,0 +1,59 @@
+# バックグラウンドジョブのワーカー（Job テーブルからジョブを取得してスレッドプールで実行する）
+# スレッドが1つ空くたびに次のジョブを取得する（時間のかかるジョブが他のスレッドを止めない）
+import contextvars
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import jobs
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "Job テーブルのジョブを取得して実行する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="同時実行数")
+        parser.add_argument("--poll", type=float, default=2.0, help="ジョブがない時の待機秒数")
+        parser.add_argument("--once", action="store_true", help="実行可能なジョブを処理したら終了する")
+        parser.add_argument("--school", type=str, default=None, help="対象の学校コード（学校ごとのDB用）")
+
+    def handle(self, *args, **opts):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        threads = max(1, opts["threads"])
+
+        with using_school(opts["school"]), ThreadPoolExecutor(max_workers=threads) as pool:
+            self.stdout.write(f"worker {worker_id} started ({threads} threads)")
+            running = set()
+            while True:
+                claimed = []
+                if len(running) < threads:
+                    jobs.requeue_stale()
+                    claimed = jobs.claim(worker_id, threads - len(running))
+                    # スレッドにも学校DBの指定（contextvars）を引き継ぐ
+                    running |= {pool.submit(contextvars.copy_context().run, self._run, job) for job in claimed}
+                if not running:
+                    if opts["once"]:
+                        break
+                    time.sleep(opts["poll"])
+                    continue
+                # 満杯なら1件終わるまで、空きがあれば新しいジョブを探しに戻る（取得できなければ poll 秒待つ）
+                if len(running) >= threads:
+                    timeout = None
+                else:
+                    timeout = 0 if claimed else opts["poll"]
+                done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for f in done:
+                    f.result()
+
+    def _run(self, job):
+        try:
+            jobs.run(job)
+            self.stdout.write(f"job {job.pk} {job.name} finished")
+        finally:
+            # スレッドごとの接続を閉じる
+            close_old_connections()
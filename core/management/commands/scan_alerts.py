@@ -0,0 +1,55 @@
+# 既存の連絡帳をまとめてキーワード検知し直す（キーワード追加後のバックフィル用）
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.alerts import get_automaton
+from core.conditional import bump_entries
+from core.models import Entry, EntryAlert
+from core.tenancy import using_school
+
+
+class Command(BaseCommand):
+    help = "既存の連絡帳をキーワード検知し、検知結果（EntryAlert）を作り直す"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--school", default=None, help="対象の学校コード（DB振り分け用）")
+        parser.add_argument("--since", default=None, help="この日付（YYYY-MM-DD）以降の連絡帳のみ対象")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="1トランザクションで処理する件数")
+
+    def handle(self, *args, **opts):
+        try:
+            since = date.fromisoformat(opts["since"]) if opts["since"] else None
+        except ValueError:
+            raise CommandError("--since は YYYY-MM-DD 形式で指定してください。")
+        chunk = max(1, opts["chunk_size"])
+
+        with using_school(opts["school"]) as db:
+            automaton = get_automaton(db)
+            entries = Entry.objects.using(db).order_by("id")
+            if since:
+                entries = entries.filter(target_date__gte=since)
+
+            scanned = flagged = 0
+            last_id = 0
+            while True:
+                rows = list(entries.filter(id__gt=last_id).values_list("id", "content")[:chunk])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                ids = [pk for pk, _ in rows]
+                alerts = [
+                    EntryAlert(entry_id=pk, keyword=kw, category=cat)
+                    for pk, content in rows
+                    for kw, cat in automaton.search(content)
+                ]
+                with transaction.atomic(using=db):
+                    EntryAlert.objects.using(db).filter(entry_id__in=ids).delete()
+                    EntryAlert.objects.using(db).bulk_create(alerts, batch_size=500)
+                bump_entries(Entry.objects.using(db).filter(id__in=ids))
+                scanned += len(rows)
+                flagged += len({a.entry_id for a in alerts})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{scanned}件を走査し、{flagged}件でキーワードを検知しました（キーワード{len(automaton)}語）。"))
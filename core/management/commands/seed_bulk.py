@@ -2,7 +2,8 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth.models import User, Group
 from django.db import transaction
-from core.models import Grade, ClassRoom, Student
+from core.models import School, Grade, ClassRoom, Student
+from core.tenancy import using_school
 
 class Command(BaseCommand):
     help = "Seed bulk data: grades x classes x students（例: 3 x 3 x 30 = 270生徒）"
@@ -15,9 +16,15 @@ class Command(BaseCommand):
         parser.add_argument("--seed", type=int, default=42)
         parser.add_argument("--purge", action="store_true",
                             help="既存データを初期化してから投入する")
+        parser.add_argument("--school", type=str, default="default",
+                            help="投入先の学校コード（settings.SCHOOLS にあればその学校のDBへ投入）")
 
-    @transaction.atomic
     def handle(self, *args, **opts):
+        # 学校コードに対応するDBを対象に、1トランザクションで投入する
+        with using_school(opts["school"]) as db, transaction.atomic(using=db):
+            self._seed(opts)
+
+    def _seed(self, opts):
         # Faker は投入時のみ読み込み（本番通常起動へ影響させない）
         try:
             from faker import Faker
@@ -27,12 +34,15 @@ class Command(BaseCommand):
         fake = Faker("ja_JP")
         Faker.seed(opts["seed"])
 
-        # 既存消去（必要なら）
+        # 学校
+        school, _ = School.objects.get_or_create(code=opts["school"], defaults={"name": opts["school"]})
+
+        # 既存消去（必要なら、対象の学校分のみ）
         if opts["purge"]:
             # 順序はモデル依存で調整
-            Student.objects.all().delete()
-            ClassRoom.objects.all().delete()
-            Grade.objects.all().delete()
+            Student.objects.for_school(school).delete()
+            ClassRoom.objects.for_school(school).delete()
+            Grade.objects.for_school(school).delete()
             # ユーザは prefix で絞って消すと安全
             User.objects.filter(username__startswith=f"{opts['prefix']}_").delete()
 
@@ -45,7 +55,7 @@ class Command(BaseCommand):
         # 学年
         grades = []
         for gy in range(1, opts["grades"] + 1):
-            grade, _ = Grade.objects.get_or_create(name=f"{gy}年", defaults={"year": gy})
+            grade, _ = Grade.objects.get_or_create(school=school, name=f"{gy}年", defaults={"year": gy})
             grades.append(grade)
 
         # 学年ごとにクラスと教師・生徒
@@ -0,0 +1,272 @@
+# 朝の提出ラッシュ（7:30〜8:30）の負荷シミュレーション
+#
+# 起動中のサーバー（runserver / gunicorn）に対して、seed_bulk で作成した生徒・担任ユーザーが
+# 同時にログイン → 提出 / ダッシュボード更新 → いいね（既読）を行う。
+# 各ユーザーは到着プロファイルに従った時刻に開始し、スレッドプールで並行に実行する。
+#
+# 例: python manage.py seed_bulk --students 30
+#     python manage.py simulate_rush --base-url http://127.0.0.1:8000 --profile bell --duration 60 --concurrency 50
+import http.client
+import random
+import re
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+_READ_URL = re.compile(r'action="(/teacher/entry/\d+/read/)"')
+_LOCK_METRIC = re.compile(r"^schoolcomms_db_lock_errors_total(?:\{\})? (\S+)$", re.M)
+
+
+def _percentile(values, p):
+    """最近傍順位法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+def arrival_offsets(profile, count, duration, rng):
+    """各ユーザーの開始時刻（秒）を返す
+
+    flat   : 全員が同時に開始
+    linear : duration 秒かけて一定の割合で増やす
+    bell   : 始業前に集中（duration の 8 割付近をピークとする三角分布）
+    """
+    if profile == "flat" or duration <= 0:
+        return [0.0] * count
+    if profile == "linear":
+        return [duration * i / max(count, 1) for i in range(count)]
+    return sorted(rng.triangular(0, duration, duration * 0.8) for _ in range(count))
+
+
+class _Session:
+    """1ユーザー分の HTTP セッション（クッキー・CSRFトークンを保持する）"""
+
+    def __init__(self, base, host, timeout, record):
+        self.base = base
+        self.host = host
+        self.timeout = timeout
+        self.record = record
+        self.cookies = {}
+        self.conn = None
+
+    def _connect(self):
+        cls = http.client.HTTPSConnection if self.base.scheme == "https" else http.client.HTTPConnection
+        self.conn = cls(self.base.hostname, self.base.port, timeout=self.timeout)
+
+    def request(self, label, method, path, data=None):
+        headers = {
+            "Host": self.host,
+            # TLS 終端のプロキシ配下と同じ扱いにする（SECURE_SSL_REDIRECT / Secure クッキー対策）
+            "X-Forwarded-Proto": "https",
+            "Origin": f"https://{self.host}",
+            "Referer": f"https://{self.host}{path}",
+        }
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        body = None
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.cookies.get("csrftoken", ""))
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+
+        started = time.perf_counter()
+        try:
+            if self.conn is None:
+                self._connect()
+            self.conn.request(method, path, body=body, headers=headers)
+            res = self.conn.getresponse()
+            payload = res.read()
+        except (socket.timeout, TimeoutError):
+            self.conn = None
+            self.record(label, None, time.perf_counter() - started, "timeout")
+            return None, b""
+        except (OSError, http.client.HTTPException) as e:
+            self.conn = None
+            self.record(label, None, time.perf_counter() - started, type(e).__name__)
+            return None, b""
+        self.record(label, res.status, time.perf_counter() - started, None)
+
+        for header in res.headers.get_all("Set-Cookie") or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for key, morsel in cookie.items():
+                self.cookies[key] = morsel.value
+        if res.getheader("Connection", "").lower() == "close":
+            self.conn.close()
+            self.conn = None
+        return res.status, payload
+
+
+class Command(BaseCommand):
+    help = "起動中のサーバーに対して朝の提出ラッシュ（生徒の提出・担任のダッシュボード更新）を再現する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="対象サーバーのURL")
+        parser.add_argument("--host", default=None, help="Host ヘッダ（学校ごとのホスト名を試す場合）")
+        parser.add_argument("--prefix", default="demo", help="seed_bulk のユーザー名接頭語")
+        parser.add_argument("--password", default="pass1234", help="seed_bulk ユーザーのパスワード")
+        parser.add_argument("--students", type=int, default=None, help="参加する生徒数（省略時は全員）")
+        parser.add_argument("--teachers", type=int, default=None, help="参加する担任数（省略時は全員）")
+        parser.add_argument("--profile", choices=["flat", "linear", "bell"], default="bell",
+                            help="到着プロファイル（flat=一斉、linear=一定割合で増加、bell=始業前に集中）")
+        parser.add_argument("--duration", type=float, default=60, help="到着させる時間幅（秒）")
+        parser.add_argument("--concurrency", type=int, default=50, help="同時に動くユーザー数の上限")
+        parser.add_argument("--refreshes", type=int, default=5, help="担任1人あたりのダッシュボード更新回数")
+        parser.add_argument("--think", type=float, default=2.0, help="担任の更新間隔（秒）")
+        parser.add_argument("--reads", type=int, default=3, help="担任が1回の更新で既読にする件数")
+        parser.add_argument("--timeout", type=float, default=30, help="1リクエストのタイムアウト（秒）")
+        parser.add_argument("--metrics-token", default="", help="/metrics/ の Bearer トークン")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **opts):
+        base = urlsplit(opts["base_url"])
+        if base.scheme not in ("http", "https") or not base.hostname:
+            raise CommandError("--base-url は http://host:port の形式で指定してください。")
+        self.base = base
+        self.host = opts["host"] or base.netloc
+        self.opts = opts
+        self.rng = random.Random(opts["seed"])
+
+        students = list(User.objects.filter(username__startswith=f"{opts['prefix']}_s_")
+                        .order_by("username").values_list("username", flat=True)[:opts["students"]])
+        teachers = list(User.objects.filter(username__startswith=f"{opts['prefix']}_t_")
+                        .order_by("username").values_list("username", flat=True)[:opts["teachers"]])
+        if not students and not teachers:
+            raise CommandError("シミュレーション用のユーザーが見つかりません。seed_bulk でデータを投入してください。")
+
+        # (役割, ユーザー名, 開始時刻) を到着順に並べる
+        users = [("student", u) for u in students] + [("teacher", u) for u in teachers]
+        self.rng.shuffle(users)
+        offsets = arrival_offsets(opts["profile"], len(users), opts["duration"], self.rng)
+        schedule = [(offset, role, name) for offset, (role, name) in zip(offsets, users)]
+
+        self.samples = defaultdict(list)
+        self.failures = defaultdict(lambda: defaultdict(int))
+        self.lock = threading.Lock()
+        locks_before = self._lock_errors()
+
+        self.stdout.write(f"生徒 {len(students)}人 / 担任 {len(teachers)}人, profile={opts['profile']}, "
+                          f"duration={opts['duration']:g}s, concurrency={opts['concurrency']}")
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, opts["concurrency"])) as pool:
+            for offset, role, name in schedule:
+                delay = offset - (time.perf_counter() - started)
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._run_user, role, name)
+        elapsed = time.perf_counter() - started
+
+        self._report(elapsed, locks_before, self._lock_errors())
+
+    # ---------- シミュレーション ----------
+    def _record(self, label, status, seconds, error):
+        with self.lock:
+            if error is not None:
+                self.failures[label][error] += 1
+            elif status >= 400:
+                self.failures[label][str(status)] += 1
+            else:
+                self.samples[label].append(seconds * 1000)
+
+    def _session(self):
+        return _Session(self.base, self.host, self.opts["timeout"], self._record)
+
+    def _login(self, session, username):
+        login_url = reverse("custom_login")
+        session.request("login_form", "GET", login_url)
+        status, _ = session.request("login", "POST", login_url,
+                                    {"username": username, "password": self.opts["password"]})
+        return status == 302
+
+    def _run_user(self, role, username):
+        try:
+            session = self._session()
+            if not self._login(session, username):
+                return
+            if role == "student":
+                self._student(session)
+            else:
+                self._teacher(session)
+        except Exception as e:  # シミュレーター側の想定外エラーも集計して続行する
+            self._record("simulator", None, 0, type(e).__name__)
+
+    def _student(self, session):
+        url = reverse("student_entry_new")
+        session.request("student_entry_form", "GET", url)
+        session.request("student_entry_submit", "POST", url, {
+            "content": "昨日は元気に過ごしました。",
+            "condition": self.rng.randint(2, 5),
+            "mental": self.rng.randint(2, 5),
+        })
+
+    def _teacher(self, session):
+        url = reverse("teacher_dashboard")
+        for i in range(max(1, self.opts["refreshes"])):
+            if i:
+                time.sleep(self.opts["think"])
+            status, body = session.request("teacher_dashboard", "GET", url)
+            if status != 200:
+                continue
+            targets = list(dict.fromkeys(_READ_URL.findall(body.decode("utf-8", "replace"))))
+            for path in targets[:self.opts["reads"]]:
+                session.request("mark_read", "POST", path, {})
+
+    # ---------- 集計 ----------
+    def _lock_errors(self):
+        """サーバーの db_lock_errors_total（取得できなければ None）"""
+        conn = None
+        try:
+            cls = http.client.HTTPSConnection if self.base.scheme == "https" else http.client.HTTPConnection
+            conn = cls(self.base.hostname, self.base.port, timeout=5)
+            headers = {"Host": self.host}
+            if self.opts["metrics_token"]:
+                headers["Authorization"] = f"Bearer {self.opts['metrics_token']}"
+            conn.request("GET", reverse("metrics"), headers=headers)
+            res = conn.getresponse()
+            text = res.read().decode("utf-8", "replace")
+        except (OSError, http.client.HTTPException):
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+        if res.status != 200:
+            return None
+        match = _LOCK_METRIC.search(text)
+        return float(match.group(1)) if match else 0.0
+
+    def _report(self, elapsed, locks_before, locks_after):
+        total_ok = sum(len(v) for v in self.samples.values())
+        total_ng = sum(sum(v.values()) for v in self.failures.values())
+        self.stdout.write("")
+        self.stdout.write(f"{'route':<22}{'ok':>7}{'err':>6}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+        for label in sorted(set(self.samples) | set(self.failures)):
+            ms = self.samples.get(label, [])
+            errors = sum(self.failures.get(label, {}).values())
+            self.stdout.write(
+                f"{label:<22}{len(ms):>7}{errors:>6}{len(ms) / elapsed:>8.1f}"
+                f"{_percentile(ms, 50):>9.1f}{_percentile(ms, 95):>9.1f}{_percentile(ms, 99):>9.1f}")
+        all_ms = [v for ms in self.samples.values() for v in ms]
+        self.stdout.write("")
+        self.stdout.write(f"経過時間      : {elapsed:.1f}s")
+        self.stdout.write(f"スループット  : {total_ok / elapsed:.1f} req/s（成功 {total_ok} / 失敗 {total_ng}）")
+        self.stdout.write(f"全体 p50/p95/p99 (ms): {_percentile(all_ms, 50):.1f} / "
+                          f"{_percentile(all_ms, 95):.1f} / {_percentile(all_ms, 99):.1f}")
+        for label, errors in sorted(self.failures.items()):
+            detail = ", ".join(f"{k}={v}" for k, v in sorted(errors.items()))
+            self.stdout.write(f"エラー {label}: {detail}")
+        timeouts = sum(e.get("timeout", 0) for e in self.failures.values())
+        self.stdout.write(f"タイムアウト  : {timeouts}")
+        if locks_before is None or locks_after is None:
+            self.stdout.write("DBロック待ち超過: 取得不可（/metrics/ にアクセスできません）")
+        else:
+            self.stdout.write(f"DBロック待ち超過: {locks_after - locks_before:g}"
+                              "（サーバーの db_lock_errors_total の増分。複数ワーカー時は1ワーカー分）")
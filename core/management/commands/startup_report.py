@@ -0,0 +1,94 @@
+# 起動時間（import コスト）の計測
+#
+# 新しい Python プロセスで wsgi アプリケーションの読み込みと warm_up() を行い、
+# 各段階の所要時間と -X importtime による import 時間の上位を表示する。
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 子プロセスで実行するスクリプト（段階ごとの経過秒数を JSON で標準出力へ）
+_PROBE = """
+import json, os, time
+t0 = time.perf_counter()
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "schoolcomms.settings")
+import django
+t1 = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+t2 = time.perf_counter()
+from schoolcomms.wsgi import application
+t3 = time.perf_counter()
+from schoolcomms.warmup import warm_up
+warm = warm_up()
+t4 = time.perf_counter()
+print(json.dumps({
+    "import django": t1 - t0,
+    "settings": t2 - t1,
+    "wsgi application (django.setup)": t3 - t2,
+    "warm-up": t4 - t3,
+    "total": t4 - t0,
+    "warm_steps": warm,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """-X importtime の出力を [(累積マイクロ秒, 自身のマイクロ秒, モジュール名, 深さ)] に変換する"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        try:
+            self_us, cumulative, name = line[len("import time:"):].split("|")
+            depth = (len(name) - len(name.lstrip())) // 2
+            rows.append((int(cumulative), int(self_us), name.strip(), depth))
+        except ValueError:
+            continue
+    return rows
+
+
+class Command(BaseCommand):
+    help = "新しいプロセスでアプリを起動し、段階ごとの所要時間と import 時間の上位を表示する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=15, help="表示する import の件数")
+        parser.add_argument("--depth", type=int, default=3, help="集計する import の階層の深さ")
+        parser.add_argument("--json", action="store_true", help="JSON で出力する（推移の記録用）")
+
+    def handle(self, *args, **opts):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "schoolcomms.settings"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"起動に失敗しました:\n{proc.stderr[-2000:]}")
+        phases = json.loads(proc.stdout.strip().splitlines()[-1])
+        warm_steps = phases.pop("warm_steps")
+
+        # wsgi から直接・間接に読み込まれるパッケージ（浅い階層）を累積時間の大きい順に並べる
+        imports = parse_importtime(proc.stderr)
+        top_level = sorted((r for r in imports if r[3] <= opts["depth"]), reverse=True)[:opts["top"]]
+
+        if opts["json"]:
+            self.stdout.write(json.dumps({
+                "phases": phases,
+                "warm_up": warm_steps,
+                "imports": [{"module": name, "cumulative_ms": cum / 1000, "self_ms": own / 1000}
+                            for cum, own, name, _ in top_level],
+            }, ensure_ascii=False))
+            return
+
+        self.stdout.write("段階別の所要時間")
+        for name, sec in phases.items():
+            self.stdout.write(f"  {name:<34}{sec * 1000:>9.1f} ms")
+        self.stdout.write("warm-up の内訳")
+        for name, sec in warm_steps.items():
+            self.stdout.write(f"  {name:<34}{sec * 1000:>9.1f} ms")
+        self.stdout.write(f"import 時間の上位 {len(top_level)} 件（累積 / 自身）")
+        for cum, own, name, _ in top_level:
+            self.stdout.write(f"  {name:<34}{cum / 1000:>9.1f} ms {own / 1000:>8.1f} ms")
@@ -0,0 +1,43 @@
+# 読み取り専用レプリカの同期（プライマリの SQLite をオンラインバックアップでコピーする）
+# cron 等で REPLICA_MAX_LAG_SECONDS より短い間隔で実行する。
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "settings.REPLICAS の各レプリカをプライマリからコピーして更新する"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=1000,
+                            help="1ステップでコピーするページ数（小さいほど書き込みを妨げにくい）")
+        parser.add_argument("--sleep", type=float, default=0.005,
+                            help="ステップ間の待機秒数")
+
+    def handle(self, *args, **opts):
+        if not settings.REPLICAS:
+            raise CommandError("レプリカが設定されていません（DJANGO_REPLICA_DB_PATH）。")
+
+        for primary, replica in settings.REPLICAS.items():
+            src_path = str(settings.DATABASES[primary]["NAME"])
+            dst_path = str(settings.DATABASES[replica]["NAME"])
+            tmp_path = f"{dst_path}.tmp"
+
+            started = time.time()
+            src = sqlite3.connect(src_path)
+            dst = sqlite3.connect(tmp_path)
+            try:
+                src.backup(dst, pages=opts["pages"], sleep=opts["sleep"])
+            finally:
+                dst.close()
+                src.close()
+            # 読み手が途中のファイルを見ないよう一時ファイルから差し替え、
+            # 更新時刻をコピー開始時刻に合わせる（遅延判定を安全側にする）
+            os.replace(tmp_path, dst_path)
+            os.utime(dst_path, (started, started))
+
+            self.stdout.write(f"{primary} -> {replica}: {time.time() - started:.2f}s")
+        self.stdout.write(self.style.SUCCESS("レプリカを同期しました。"))
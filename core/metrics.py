@@ -0,0 +1,147 @@
+# メトリクス収集（Prometheus テキスト形式で /metrics/ から出力）
+#
+# 値はプロセス内に保持する。gunicorn の複数ワーカー構成ではワーカーごとの値になるため、
+# スクレイプ側でインスタンス単位に集計すること。
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.db import connections, OperationalError
+
+PREFIX = "schoolcomms_"
+
+# レイテンシのヒストグラム境界（秒）
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# メトリクス定義（名前: (種別, 説明)）
+METRICS = {
+    "http_requests_total": ("counter", "HTTP requests by view, method and status."),
+    "http_request_duration_seconds": ("histogram", "HTTP request latency by view."),
+    "http_not_modified_total": ("counter", "Conditional GET 304 (Not Modified) responses by view."),
+    "cache_requests_total": ("counter", "Django cache lookups by cache (access/etag_version/session) and result (hit/miss)."),
+    "db_queries_total": ("counter", "Database queries executed while handling requests, by view and database alias."),
+    "db_lock_errors_total": ("counter", "Queries that failed with 'database is locked' (SQLite busy timeout)."),
+    "entry_submissions_total": ("counter", "Entry submissions by kind (created/updated)."),
+    "entry_marked_read_total": ("counter", "Entries marked as read by source (teacher/admin)."),
+    "login_hash_wait_seconds": ("histogram", "Time spent waiting for a password verification slot."),
+    "login_busy_total": ("counter", "Logins rejected with 503 because no verification slot freed up in time."),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)              # (name, labels) -> value
+_histograms = {}                            # (name, labels) -> [bucket counts..., sum, count]
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name, value=1, **labels):
+    """カウンタを加算する"""
+    with _lock:
+        _counters[_key(name, labels)] += value
+
+
+def observe(name, value, **labels):
+    """ヒストグラムに観測値を追加する"""
+    key = _key(name, labels)
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                h[i] += 1
+        h[-2] += value
+        h[-1] += 1
+
+
+def cache_lookup(cache_name, hit):
+    """Django キャッシュの参照結果（ヒット/ミス）を数える"""
+    inc("cache_requests_total", cache=cache_name, result="hit" if hit else "miss")
+
+
+def reset():
+    """全メトリクスを初期化する（テスト用）"""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _fmt_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{%s}" % body
+
+
+def render() -> str:
+    """Prometheus テキスト形式（version 0.0.4）で出力する"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        full = PREFIX + name
+        lines.append(f"# HELP {full} {help_text}")
+        lines.append(f"# TYPE {full} {kind}")
+        if kind == "counter":
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{full}{_fmt_labels(labels)} {value:g}")
+        else:
+            for (n, labels), h in sorted(histograms.items()):
+                if n != name:
+                    continue
+                for bound, count in zip(BUCKETS, h):
+                    lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', f'{bound:g}')])} {count}")
+                lines.append(f"{full}_bucket{_fmt_labels(labels, [('le', '+Inf')])} {h[-1]}")
+                lines.append(f"{full}_sum{_fmt_labels(labels)} {h[-2]:.6f}")
+                lines.append(f"{full}_count{_fmt_labels(labels)} {h[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ビュー名ごとのリクエスト数・レイテンシ・DBクエリ数を記録するミドルウェア"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = defaultdict(int)
+
+        def _counter(alias):
+            def _count(execute, sql, params, many, context):
+                queries[alias] += 1
+                try:
+                    return execute(sql, params, many, context)
+                except OperationalError as e:
+                    # 書き込みが集中して busy timeout を超えた場合（朝の提出ラッシュの監視用）
+                    if "locked" in str(e):
+                        inc("db_lock_errors_total")
+                    raise
+            return _count
+
+        started = time.perf_counter()
+        # 学校ごとのDB・レプリカへ振り分けられたクエリも数えるため、全エイリアスの接続に付ける
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(_counter(conn.alias)))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        # 404 などURL未解決のリクエストはラベルを固定してカーディナリティを抑える
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "unmatched"
+
+        inc("http_requests_total", view=view, method=request.method, status=response.status_code)
+        observe("http_request_duration_seconds", elapsed, view=view)
+        for alias, count in queries.items():
+            inc("db_queries_total", count, view=view, db=alias)
+        if response.status_code == 304:
+            inc("http_not_modified_total", view=view)
+        return response
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# 既存の学年を「既定の学校」に所属させる（単一校運用からの移行）
+def assign_default_school(apps, schema_editor):
+    db = schema_editor.connection.alias
+    School = apps.get_model("core", "School")
+    Grade = apps.get_model("core", "Grade")
+    if not Grade.objects.using(db).filter(school__isnull=True).exists():
+        return
+    school, _ = School.objects.using(db).get_or_create(code="default", defaults={"name": "既定の学校"})
+    Grade.objects.using(db).filter(school__isnull=True).update(school=school)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_entry_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='School',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(unique=True)),
+                ('name', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='grade',
+            name='school',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='grades', to='core.school'),
+        ),
+        migrations.RunPython(assign_default_school, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='grade',
+            name='school',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='grades', to='core.school'),
+        ),
+        migrations.AlterField(
+            model_name='grade',
+            name='year',
+            field=models.IntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='grade',
+            constraint=models.UniqueConstraint(fields=('school', 'year'), name='ux_core_grade_school_year'),
+        ),
+    ]
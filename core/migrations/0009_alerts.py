@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# 初期キーワード（管理画面から追加・無効化できる）
+DEFAULT_KEYWORDS = {
+    'BULLYING': ['いじめ', '無視され', '仲間外れ', '悪口', '殴られ', '蹴られ'],
+    'SELF_HARM': ['死にたい', '消えたい', '自殺', 'リストカット', '生きていたくない'],
+    'ILLNESS': ['発熱', '熱がある', '頭痛', '腹痛', '吐き気', '眠れない'],
+}
+
+
+def seed_keywords(apps, schema_editor):
+    AlertKeyword = apps.get_model('core', 'AlertKeyword')
+    db = schema_editor.connection.alias
+    AlertKeyword.objects.using(db).bulk_create(
+        [AlertKeyword(keyword=kw, category=cat) for cat, kws in DEFAULT_KEYWORDS.items() for kw in kws],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True)),
+                ('category', models.CharField(choices=[('BULLYING', 'いじめ'), ('SELF_HARM', '自傷・希死念慮'), ('ILLNESS', '体調不良'), ('OTHER', 'その他')], default='OTHER', max_length=20)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EntryAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('category', models.CharField(choices=[('BULLYING', 'いじめ'), ('SELF_HARM', '自傷・希死念慮'), ('ILLNESS', '体調不良'), ('OTHER', 'その他')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='core.entry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entry', 'keyword'), name='ux_core_entryalert_entry_keyword')],
+            },
+        ),
+        migrations.RunPython(seed_keywords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RiskScore',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='risk', serialize=False, to='core.student')),
+                ('score', models.FloatField(default=0)),
+                ('condition_mean', models.FloatField(blank=True, null=True)),
+                ('mental_mean', models.FloatField(blank=True, null=True)),
+                ('condition_slope', models.FloatField(blank=True, null=True)),
+                ('mental_slope', models.FloatField(blank=True, null=True)),
+                ('missing_streak', models.PositiveSmallIntegerField(default=0)),
+                ('as_of', models.DateField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='idx_riskscore_score')],
+            },
+        ),
+    ]
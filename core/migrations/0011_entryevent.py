@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_riskscore'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntryEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('READ', '既読'), ('UNREAD', '未読に戻す')], max_length=10)),
+                ('source', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='entry_events', to=settings.AUTH_USER_MODEL)),
+                ('entry', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='events', to='core.entry')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['entry', '-created_at'], name='idx_entryevent_entry'), models.Index(fields=['actor', '-created_at'], name='idx_entryevent_actor')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_entryevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['target_date', 'student'], name='idx_entry_date_student'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(condition=models.Q(('read_at__isnull', True)), fields=['student', '-target_date'], name='idx_entry_unread'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['student', 'updated_at'], name='idx_entry_stu_updated'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def assign_homeroom(apps, schema_editor):
+    # 既存クラスの担任を担当教員（担任）として登録する
+    ClassRoom = apps.get_model('core', 'ClassRoom')
+    ClassStaff = apps.get_model('core', 'ClassStaff')
+    db = schema_editor.connection.alias
+    ClassStaff.objects.using(db).bulk_create(
+        [ClassStaff(class_room_id=pk, user_id=teacher_id, role='HOMEROOM')
+         for pk, teacher_id in ClassRoom.objects.using(db).values_list('id', 'homeroom_teacher_id')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_entry_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassStaff',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('HOMEROOM', '担任'), ('ASSISTANT', '副担任'), ('GRADE_HEAD', '学年主任')], default='ASSISTANT', max_length=20)),
+                ('class_room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='core.classroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_assignments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='classroom',
+            name='staff',
+            field=models.ManyToManyField(blank=True, related_name='staffed_classes', through='core.ClassStaff', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='classstaff',
+            index=models.Index(fields=['user', 'class_room'], name='idx_classstaff_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='classstaff',
+            constraint=models.UniqueConstraint(fields=('class_room', 'user'), name='ux_core_classstaff_class_user'),
+        ),
+        migrations.RunPython(assign_homeroom, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:30
+
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# 作成時点の core.search の正規化を写したもの（後で core.search を変えてもこのマイグレーションの結果は変えない）
+_KANA_FOLD = {c: c - 0x60 for c in range(0x30A1, 0x30F7)}
+
+
+def search_keys(username, last_name, first_name):
+    """1ユーザー分の [(キー, 種類)]。NFKC・カタカナ→ひらがな・小文字化・空白除去し、同じキーは上位の種類だけを残す"""
+    # 種類: 0=ユーザー名 1=姓名 2=姓 3=名 4=名姓（UserSearchKey.Kind）
+    candidates = [
+        (username, 0),
+        (f"{last_name}{first_name}", 1),
+        (last_name, 2),
+        (first_name, 3),
+        (f"{first_name}{last_name}", 4),
+    ]
+    keys = {}
+    for text, kind in candidates:
+        normalized = unicodedata.normalize("NFKC", text or "").translate(_KANA_FOLD).lower()
+        key = "".join(normalized.split())[:150]
+        if key and key not in keys:
+            keys[key] = kind
+    return list(keys.items())
+
+
+def build_keys(apps, schema_editor):
+    # 既存ユーザーの検索キーを作成する（以降はユーザーの保存時に更新される）
+    User = apps.get_model('auth', 'User')
+    UserSearchKey = apps.get_model('core', 'UserSearchKey')
+    db = schema_editor.connection.alias
+    rows = User.objects.using(db).values_list('id', 'username', 'last_name', 'first_name').iterator(chunk_size=2000)
+    batch = []
+    for pk, username, last_name, first_name in rows:
+        batch += [UserSearchKey(user_id=pk, key=key, kind=kind) for key, kind in search_keys(username, last_name, first_name)]
+        if len(batch) >= 2000:
+            UserSearchKey.objects.using(db).bulk_create(batch)
+            batch = []
+    UserSearchKey.objects.using(db).bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_classstaff'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150)),
+                ('kind', models.PositiveSmallIntegerField(choices=[(0, 'ユーザー名'), (1, '姓名'), (2, '姓'), (3, '名'), (4, '名姓')])),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['key', 'user', 'kind'], name='idx_usersearchkey_key')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'key'), name='ux_core_usersearchkey_user_key')],
+            },
+        ),
+        migrations.RunPython(build_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_usersearchkey'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherDigest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('school_day', models.DateField()),
+                ('missing', models.JSONField(blank=True, default=list)),
+                ('unread', models.JSONField(blank=True, default=list)),
+                ('missing_count', models.PositiveIntegerField(default=0)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('generated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('emailed_at', models.DateTimeField(blank=True, null=True)),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='digests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-school_day', 'teacher_id'],
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'school_day'), name='ux_core_teacherdigest_teacher_day')],
+            },
+        ),
+    ]
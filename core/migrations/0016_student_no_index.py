@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_teacherdigest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['student_no'], name='idx_student_no'),
+        ),
+    ]
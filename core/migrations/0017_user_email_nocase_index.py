@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # 管理画面のユーザー検索はメールアドレスを大文字小文字を区別せずに完全一致で探す（email__iexact → LIKE）。
+    # SQLite の LIKE は NOCASE のインデックスがあれば範囲検索になるため、auth_user.email に作る
+    # （auth_user は Django 本体のモデルなので Meta.indexes ではなく SQL で追加する）
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0016_student_no_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS "idx_auth_user_email_nocase" ON "auth_user" ("email" COLLATE NOCASE)',
+            'DROP INDEX IF EXISTS "idx_auth_user_email_nocase"',
+        ),
+    ]
@@ -3,16 +3,57 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db import transaction
+from django.db import transaction, router
 from datetime import date, timedelta
 from django.core.exceptions import ValidationError
 import jpholiday
+from functools import lru_cache
 import unicodedata
+from . import metrics
+
+# 学校（テナント）登録クラス
+class School(models.Model):
+    code = models.SlugField(max_length=50, unique=True)  # ホスト名の先頭ラベルと一致させる（例: school-a）
+    name = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.name}"
+
+
+# 学校単位で絞り込むためのクエリセット（school が None の場合は絞り込まない＝単一校運用）
+class GradeQuerySet(models.QuerySet):
+    def for_school(self, school):
+        return self if school is None else self.filter(school=school)
+
+
+class ClassRoomQuerySet(models.QuerySet):
+    def for_school(self, school):
+        return self if school is None else self.filter(grade__school=school)
+
+
+class StudentQuerySet(models.QuerySet):
+    def for_school(self, school):
+        return self if school is None else self.filter(class_room__grade__school=school)
+
+
+class EntryQuerySet(models.QuerySet):
+    def for_school(self, school):
+        return self if school is None else self.filter(student__class_room__grade__school=school)
+
 
 # 学年登録クラス
 class Grade(models.Model):
+    school = models.ForeignKey(School, on_delete=models.PROTECT, related_name="grades")
     name = models.CharField(max_length=20)  # 1年,2年...
-    year = models.IntegerField(unique=True) # 西暦や学年コードなど任意（ただし一意）
+    year = models.IntegerField() # 西暦や学年コードなど任意（ただし学校内で一意）
+
+    objects = GradeQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['school', 'year'], name='ux_core_grade_school_year')  # school と year の複合ユニーク（同一学校内で学年コード重複を禁止）
+        ]
+
     def __str__(self):
         return f"{self.name}"
     
@@ -21,6 +62,10 @@ class ClassRoom(models.Model):
     grade = models.ForeignKey(Grade, on_delete=models.PROTECT)
     name = models.CharField(max_length=20)  # 1年1組,1年2組...（自由記述）
     homeroom_teacher = models.ForeignKey(User, on_delete=models.PROTECT, related_name="homeroom_classes")
+    # 担任を含む担当教員（副担任・学年主任など）。担任の割り当ては保存時に自動で同期する
+    staff = models.ManyToManyField(User, through="ClassStaff", related_name="staffed_classes", blank=True)
+
+    objects = ClassRoomQuerySet.as_manager()
 
     def clean(self):
         # 正規化（空白などを削除する処理）をここで反映
@@ -37,12 +82,37 @@ class ClassRoom(models.Model):
         return f"{self.grade} {self.name}"
 
 
+# クラスの担当教員の割り当て（閲覧・既読の権限は core.access で判定する）
+class ClassStaff(models.Model):
+    class Role(models.TextChoices):
+        HOMEROOM = "HOMEROOM", "担任"
+        ASSISTANT = "ASSISTANT", "副担任"
+        GRADE_HEAD = "GRADE_HEAD", "学年主任"
+
+    class_room = models.ForeignKey(ClassRoom, on_delete=models.CASCADE, related_name="assignments")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="class_assignments")
+    role = models.CharField(max_length=20, choices=Role.choices, default=Role.ASSISTANT)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["class_room", "user"], name="ux_core_classstaff_class_user"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "class_room"], name="idx_classstaff_user"),
+        ]
+
+    def __str__(self):
+        return f"{self.class_room} {self.get_role_display()} {self.user}"
+
+
 # 生徒登録クラス
 class Student(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     class_room = models.ForeignKey(ClassRoom, on_delete=models.PROTECT)
     student_no = models.CharField(max_length=20)
-    
+
+    objects = StudentQuerySet.as_manager()
+
     class Meta:
         constraints = [
             models.UniqueConstraint(
@@ -50,16 +120,26 @@ class Student(models.Model):
                 name='ux_core_student_class_no'
             )
         ]
+        indexes = [
+            # 管理画面の生徒番号検索（前方一致の範囲検索）。上の複合ユニークは class_room が先頭のため使えない
+            models.Index(fields=['student_no'], name='idx_student_no'),
+        ]
     def __str__(self):
         # 例: "3年 3組 1番 ○○（氏名）"
         return f"{self.class_room} {self.student_no}番 {self.user.last_name}{self.user.first_name}"
 
 # 祝日判定メソッド（weekdayメソッドでは月曜を0、火曜を1…と定義）※課題2要素
+# 祝日判定は毎リクエスト（ETag計算・提出・ダッシュボード）で呼ばれるため結果をプロセス内にキャッシュする
+@lru_cache(maxsize=2048)
+def is_holiday(d: date) -> bool:
+    return jpholiday.is_holiday(d)
+
+
 def calc_prev_schoolday(base_date=None):
     d = base_date or timezone.localdate()
     d -= timedelta(days=1)
     # 土日(weekday >= 5) または 祝日(jpholiday) の場合はさらに1日前へ
-    while d.weekday() >= 5 or jpholiday.is_holiday(d):
+    while d.weekday() >= 5 or is_holiday(d):
         d -= timedelta(days=1)
     return d
 
@@ -105,6 +185,8 @@ class Entry(models.Model):
         verbose_name="メンタル"
     )
 
+    objects = EntryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = "Entries" #Djangoが命名したスペルミスを修正
         ordering = ["-target_date"]
@@ -125,35 +207,108 @@ class Entry(models.Model):
         indexes = [
             models.Index(fields=["student", "-target_date"], name="idx_entry_stu_date_desc"),
             models.Index(fields=["read_by"], name="idx_entry_read_by"),
+            # 担任ダッシュボードの「対象日×担当生徒」と管理画面の日付順一覧
+            models.Index(fields=["target_date", "student"], name="idx_entry_date_student"),
+            # 未読のみの部分インデックス（既読になった行は含まれないため小さく保たれる）
+            models.Index(fields=["student", "-target_date"], name="idx_entry_unread",
+                         condition=models.Q(read_at__isnull=True)),
+            # 条件付きGETの MAX(updated_at) をテーブルを読まずにインデックスだけで求める
+            models.Index(fields=["student", "updated_at"], name="idx_entry_stu_updated"),
         ]
 
     # ---------- 機能①：既読ロック ----------
-    def lock_as_read(self, teacher: User):
+    def lock_as_read(self, teacher: User, source="teacher"):
         """担任が既読にする処理（レースコンディション防止）"""
-        with transaction.atomic():
+        from .conditional import bump_students
+        db = router.db_for_write(Entry, instance=self)  # レプリカから読んだ場合もプライマリへ書く
+        with transaction.atomic(using=db):
+            now = timezone.now()
             updated = (
-                Entry.objects.filter(pk=self.pk, read_at__isnull=True)
+                Entry.objects.using(db).filter(pk=self.pk, read_at__isnull=True)
                 .update(
                     read_by=teacher,
-                    read_at=timezone.now(),
+                    read_at=now,
                     status=Entry.Status.READ,
+                    updated_at=now,  # .update() では auto_now が効かないため明示
                 )
             )
             if updated:
                 self.read_by = teacher
-                self.read_at = timezone.now()
+                self.read_at = now
                 self.status = Entry.Status.READ
+                self.updated_at = now
+                EntryEvent.record([self.pk], EntryEvent.Action.READ, teacher, source, using=db, at=now)
+                bump_students([self.student_id])
+                metrics.inc("entry_marked_read_total", source=source)
 
     # ---------- 機能②：未読に戻す（課題2用） ----------
-    def unlock_as_unread(self):
+    def unlock_as_unread(self, actor: User = None, source="admin"):
         """管理者が既読を取り消す処理（課題2改善要素）"""
-        with transaction.atomic():
-            Entry.objects.filter(pk=self.pk).update(
-                read_by=None, read_at=None, status=Entry.Status.SUBMITTED
+        from .conditional import bump_students
+        db = router.db_for_write(Entry, instance=self)  # レプリカから読んだ場合もプライマリへ書く
+        with transaction.atomic(using=db):
+            now = timezone.now()
+            updated = Entry.objects.using(db).filter(pk=self.pk, read_at__isnull=False).update(
+                read_by=None, read_at=None, status=Entry.Status.SUBMITTED, updated_at=now
             )
             self.read_by = None
             self.read_at = None
             self.status = Entry.Status.SUBMITTED
+            self.updated_at = now
+            if updated:
+                EntryEvent.record([self.pk], EntryEvent.Action.UNREAD, actor, source, using=db, at=now)
+            bump_students([self.student_id])
+
+    # ---------- 一括既読（API のまとめて確認用） ----------
+    @classmethod
+    def lock_many_as_read(cls, entry_ids, teacher: User, source="api"):
+        """未読のものだけを1回の UPDATE で既読にし、既読にしたIDのリストを返す
+
+        権限の確認は呼び出し側で済ませておくこと。
+        """
+        from .conditional import bump_students
+        db = router.db_for_write(cls)
+        with transaction.atomic(using=db):
+            now = timezone.now()
+            targets = cls.objects.using(db).filter(pk__in=entry_ids, read_at__isnull=True)
+            if not targets.update(read_by=teacher, read_at=now, status=cls.Status.READ, updated_at=now):
+                return []
+            # 同時に既読にされた行を除くため、今回の時刻と担当者で既読になった行を読み直す
+            rows = list(cls.objects.using(db).filter(pk__in=entry_ids, read_at=now, read_by=teacher)
+                        .values_list("pk", "student_id"))
+            EntryEvent.record([pk for pk, _ in rows], EntryEvent.Action.READ, teacher, source, using=db, at=now)
+        bump_students([sid for _, sid in rows])
+        metrics.inc("entry_marked_read_total", len(rows), source=source)
+        return [pk for pk, _ in rows]
+
+    # ---------- 生徒の提出（画面・API 共通） ----------
+    @classmethod
+    def submit(cls, student, target_date, content, condition, mental):
+        """前登校日分を新規作成、または未読なら上書きする
+
+        (entry, 結果) を返す。結果は "created" / "updated" / "locked"（既読のため編集不可）。
+        """
+        from .alerts import scan_entry
+        db = router.db_for_write(cls)
+        # 競合対策：最新状態でロックして取得（管理画面の操作と衝突しにくくする）
+        with transaction.atomic(using=db):
+            entry = cls.objects.using(db).select_for_update().filter(student=student, target_date=target_date).first()
+            if entry is None:
+                entry = cls.objects.using(db).create(student=student, target_date=target_date, content=content,
+                                                     condition=condition, mental=mental, status=cls.Status.SUBMITTED)
+                result = "created"
+            elif entry.is_read:
+                return entry, "locked"
+            else:
+                entry.content = content
+                entry.condition = condition
+                entry.mental = mental
+                entry.status = cls.Status.SUBMITTED
+                entry.save(update_fields=["content", "condition", "mental", "status"])
+                result = "updated"
+            scan_entry(entry)
+        metrics.inc("entry_submissions_total", kind=result)
+        return entry, result
 
     # ---------- 機能③：前登校日バリデーション ----------
     def clean(self):
@@ -180,3 +335,182 @@ class Entry(models.Model):
         """
         student = self.student
         return f"{student.class_room} {student.student_no}番 {student.user.username} - {self.target_date}"
+
+
+# 既読・未読の操作履歴（追記のみ。更新・削除はしない）
+class EntryEvent(models.Model):
+    class Action(models.TextChoices):
+        READ = "READ", "既読"
+        UNREAD = "UNREAD", "未読に戻す"
+
+    # 連絡帳が削除されても履歴は残すため、DB上の外部キー制約は付けない
+    entry = models.ForeignKey(Entry, on_delete=models.DO_NOTHING, db_constraint=False, related_name="events")
+    action = models.CharField(max_length=10, choices=Action.choices)
+    actor = models.ForeignKey(User, null=True, blank=True, on_delete=models.PROTECT, related_name="entry_events")
+    source = models.CharField(max_length=20)  # teacher / admin / admin_bulk
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["entry", "-created_at"], name="idx_entryevent_entry"),
+            models.Index(fields=["actor", "-created_at"], name="idx_entryevent_actor"),
+        ]
+
+    @classmethod
+    def record(cls, entry_ids, action, actor, source, using=None, at=None):
+        """複数件の履歴を1回の bulk_create で追記する（呼び出し側のトランザクション内で使う）"""
+        at = at or timezone.now()
+        actor_id = actor.pk if actor is not None else None
+        return cls.objects.using(using).bulk_create(
+            [cls(entry_id=pk, action=action, actor_id=actor_id, source=source, created_at=at) for pk in entry_ids],
+            batch_size=500,
+        )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("操作履歴は変更できません。")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("操作履歴は削除できません。")
+
+    def __str__(self):
+        return f"{self.entry_id}: {self.get_action_display()} ({self.created_at:%Y-%m-%d %H:%M})"
+
+
+# 要注意キーワード登録クラス（連絡帳の内容を検知して担任に知らせる）
+class AlertKeyword(models.Model):
+    class Category(models.TextChoices):
+        BULLYING = "BULLYING", "いじめ"
+        SELF_HARM = "SELF_HARM", "自傷・希死念慮"
+        ILLNESS = "ILLNESS", "体調不良"
+        OTHER = "OTHER", "その他"
+
+    keyword = models.CharField(max_length=100, unique=True)
+    category = models.CharField(max_length=20, choices=Category.choices, default=Category.OTHER)
+    is_active = models.BooleanField(default=True)
+
+    def clean(self):
+        # 正規化（空白などを削除する処理）をここで反映
+        if self.keyword:
+            self.keyword = unicodedata.normalize('NFKC', self.keyword).strip()
+
+    def __str__(self):
+        return f"{self.keyword}（{self.get_category_display()}）"
+
+
+# 連絡帳のキーワード検知結果
+class EntryAlert(models.Model):
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE, related_name="alerts")
+    keyword = models.CharField(max_length=100)
+    category = models.CharField(max_length=20, choices=AlertKeyword.Category.choices)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["entry", "keyword"], name="ux_core_entryalert_entry_keyword"),
+        ]
+
+    def __str__(self):
+        return f"{self.entry_id}: {self.keyword}"
+
+
+# 生徒ごとの早期警戒スコア（compute_risk コマンドが夜間に再計算する）
+class RiskScore(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name="risk")
+    score = models.FloatField(default=0)  # 0〜100（高いほど要注意）
+    condition_mean = models.FloatField(null=True, blank=True)  # 直近の体調平均
+    mental_mean = models.FloatField(null=True, blank=True)  # 直近のメンタル平均
+    condition_slope = models.FloatField(null=True, blank=True)  # 体調の傾き（1登校日あたり）
+    mental_slope = models.FloatField(null=True, blank=True)  # メンタルの傾き（1登校日あたり）
+    missing_streak = models.PositiveSmallIntegerField(default=0)  # 直近の連続未提出日数
+    as_of = models.DateField()  # 集計対象の最終登校日
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score"], name="idx_riskscore_score"),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.score:.0f}"
+
+
+# バックグラウンドジョブ登録クラス（run_worker コマンドが取り出して実行する）
+class Job(models.Model):
+    class Status(models.TextChoices):
+        QUEUED = "QUEUED", "待機中"
+        RUNNING = "RUNNING", "実行中"
+        DONE = "DONE", "完了"
+        FAILED = "FAILED", "失敗"
+
+    name = models.CharField(max_length=100)  # core.jobs.task で登録したタスク名
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)  # リトライ時はバックオフ後の時刻
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="idx_job_status_run_after"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.name} ({self.status})"
+
+
+# 管理画面のユーザー検索キー（core.search が保存・検索する。ユーザーの保存時に作り直される）
+class UserSearchKey(models.Model):
+    class Kind(models.IntegerChoices):
+        # 値の小さい種類ほど検索結果の上位に並べる
+        USERNAME = 0, "ユーザー名"
+        FULL_NAME = 1, "姓名"
+        LAST_NAME = 2, "姓"
+        FIRST_NAME = 3, "名"
+        FULL_NAME_REVERSED = 4, "名姓"
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="search_keys")
+    key = models.CharField(max_length=150)  # 正規化済み（NFKC・ひらがな・小文字・空白なし）
+    kind = models.PositiveSmallIntegerField(choices=Kind.choices)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "key"], name="ux_core_usersearchkey_user_key"),
+        ]
+        indexes = [
+            # 前方一致（key の範囲検索）をインデックスだけで返す
+            models.Index(fields=["key", "user", "kind"], name="idx_usersearchkey_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key} ({self.get_kind_display()})"
+
+
+# 担当教員ごとの朝の確認リスト（build_digests コマンドが登校日ごとに作成する）
+class TeacherDigest(models.Model):
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name="digests")
+    school_day = models.DateField()  # 対象の登校日（ダッシュボードの「本日提出分」と同じ日）
+    missing = models.JSONField(default=list, blank=True)  # 未提出の生徒 [{student_id, class_room, no, name}]
+    unread = models.JSONField(default=list, blank=True)  # 前の登校日までの分で未読の連絡帳 [{entry_id, ..., target_date}]
+    missing_count = models.PositiveIntegerField(default=0)
+    unread_count = models.PositiveIntegerField(default=0)
+    generated_at = models.DateTimeField(default=timezone.now)
+    emailed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-school_day", "teacher_id"]
+        constraints = [
+            models.UniqueConstraint(fields=["teacher", "school_day"], name="ux_core_teacherdigest_teacher_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.school_day} {self.teacher}（未提出{self.missing_count}・未読{self.unread_count}）"
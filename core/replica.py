@@ -0,0 +1,134 @@
+# 読み取り専用レプリカへの振り分け
+#
+# settings.REPLICAS は {プライマリのDBエイリアス: レプリカのDBエイリアス} の辞書。
+# レプリカは sync_replica コマンドで定期的にコピーした SQLite ファイルで、
+# ファイルの更新時刻（コピー開始時刻）を最終同期時刻として扱う。
+#
+# ・@read_from_replica を付けたビュー（GET/HEAD のみ）の読み取りだけをレプリカへ送る
+# ・書き込みは常にプライマリ
+# ・レプリカが REPLICA_MAX_LAG_SECONDS より古い場合はプライマリで読む
+# ・書き込みリクエストの後は同じ時間だけクッキーでプライマリに固定する（自分の書き込みを必ず読める）
+# ・ETag の版数はキャッシュ（プライマリ側の最新）から読むため、レプリカから読んだ画面の ETag には
+#   同期時刻も含める（同期前の古い画面が新しい版数の ETag で保存され、同期後も 304 になり続けないように）
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+from .tenancy import current_db
+
+PIN_COOKIE = "pin_primary"
+
+# 現在のリクエストで読み取りに使うレプリカのエイリアス（None ならプライマリ）と、その最終同期時刻
+_replica_db = ContextVar("replica_db", default=None)
+_replica_synced_at = ContextVar("replica_synced_at", default=None)
+
+
+def replica_synced_at(alias):
+    """レプリカの最終同期時刻（UNIX時刻。ファイルがなければ None）"""
+    try:
+        return os.path.getmtime(settings.DATABASES[alias]["NAME"])
+    except (OSError, KeyError, TypeError):
+        return None
+
+
+def replica_age(alias):
+    """レプリカの最終同期からの経過秒数（ファイルがなければ None）"""
+    synced_at = replica_synced_at(alias)
+    return None if synced_at is None else time.time() - synced_at
+
+
+def choose_replica(request):
+    """このリクエストで使えるレプリカのエイリアスを返す（使えなければ None）"""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    replica = settings.REPLICAS.get(current_db())
+    if replica is None or request.COOKIES.get(PIN_COOKIE):
+        return None
+    age = replica_age(replica)
+    if age is None or age > settings.REPLICA_MAX_LAG_SECONDS:
+        return None
+    return replica
+
+
+@contextmanager
+def replica_reads(request):
+    """with ブロック内の読み取りをレプリカへ送る（条件を満たさなければプライマリのまま）"""
+    alias = choose_replica(request)
+    # 読み取りより先に同期時刻を控える（読んでいる間に同期されても、控えた時刻はデータより古い側になる）
+    token = _replica_db.set(alias)
+    synced_token = _replica_synced_at.set(replica_synced_at(alias) if alias else None)
+    try:
+        yield
+    finally:
+        _replica_synced_at.reset(synced_token)
+        _replica_db.reset(token)
+
+
+def read_source():
+    """現在の読み取り元（プライマリなら空文字、レプリカなら "エイリアス@同期時刻"）。ETag に含める"""
+    alias = _replica_db.get()
+    return f"{alias}@{_replica_synced_at.get()}" if alias else ""
+
+
+def read_from_replica(view_func):
+    """読み取り専用ビューに付けるデコレータ"""
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        with replica_reads(request):
+            return view_func(request, *args, **kwargs)
+    return _wrapped
+
+
+class ReplicaPinMiddleware:
+    """書き込みリクエスト（POST等）の後、一定時間プライマリ読み取りに固定するクッキーを付ける"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if settings.REPLICAS and request.method not in ("GET", "HEAD", "OPTIONS", "TRACE"):
+            response.set_cookie(
+                PIN_COOKIE, "1",
+                max_age=settings.REPLICA_MAX_LAG_SECONDS,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class ReplicaRouter:
+    """レプリカ指定中の読み取りをレプリカへ送るルーター（SchoolRouter より前に置く）"""
+
+    def _primary_of(self, alias):
+        for primary, replica in settings.REPLICAS.items():
+            if replica == alias:
+                return primary
+        return alias
+
+    def db_for_read(self, model, **hints):
+        return _replica_db.get()
+
+    def db_for_write(self, model, **hints):
+        # レプリカから読んだインスタンスを保存する場合もプライマリへ書く
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db in settings.REPLICAS.values():
+            return self._primary_of(instance._state.db)
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._primary_of(obj1._state.db) == self._primary_of(obj2._state.db):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # レプリカはコピーで作るため migrate 対象外
+        if db in settings.REPLICAS.values():
+            return False
+        return None
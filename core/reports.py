@@ -0,0 +1,146 @@
+# クラス別の週次レポート（build_reports コマンドから使用）
+#
+# ・対象週のクラス・生徒・連絡帳をそれぞれ1回の values_list で取得し、クラスごとの
+#   素の dict / list（pickle 可能な値のみ）にまとめる
+# ・集計と HTML の描画は render_class() がクラス単位で行う。DBに接続しないため
+#   プロセスプールのワーカーでそのまま実行できる
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.db.models import IntegerField
+from django.db.models.functions import Cast
+from django.template.loader import render_to_string
+
+from .models import ClassRoom, Entry, Student, is_holiday
+
+TEMPLATE = "reports/class_week.html"
+INDEX_TEMPLATE = "reports/index.html"
+
+
+def week_days(day):
+    """day を含む週（月〜金）の登校日（祝日を除く）を古い順に返す"""
+    monday = day - timedelta(days=day.weekday())
+    return [d for d in (monday + timedelta(days=i) for i in range(5)) if not is_holiday(d)]
+
+
+def _display_name(last_name, first_name, username):
+    return f"{last_name}{first_name}" or username
+
+
+def collect(school, days, using):
+    """クラスごとのレポート用データ（pickle 可能な dict）のリストを返す（クエリ3回）"""
+    classes = {}
+    for cid, name, grade, last, first, username in (
+        ClassRoom.objects.using(using).for_school(school)
+        .order_by("grade__year", "name", "id")
+        .values_list("id", "name", "grade__name",
+                     "homeroom_teacher__last_name", "homeroom_teacher__first_name",
+                     "homeroom_teacher__username")
+    ):
+        classes[cid] = {
+            "id": cid,
+            "name": name,
+            "grade": grade,
+            "teacher": _display_name(last, first, username),
+            "days": days,
+            "students": [],
+        }
+
+    students = {}
+    for sid, cid, no, last, first, username in (
+        Student.objects.using(using).for_school(school)
+        .annotate(student_no_int=Cast("student_no", IntegerField()))
+        .order_by("class_room_id", "student_no_int", "id")
+        .values_list("id", "class_room_id", "student_no",
+                     "user__last_name", "user__first_name", "user__username")
+    ):
+        if cid in classes:
+            student = {"no": no, "name": _display_name(last, first, username), "entries": {}}
+            students[sid] = student
+            classes[cid]["students"].append(student)
+
+    if days:
+        for sid, target_date, condition, mental in (
+            Entry.objects.using(using).for_school(school)
+            .filter(target_date__gte=days[0], target_date__lte=days[-1])
+            .values_list("student_id", "target_date", "condition", "mental")
+        ):
+            if sid in students:
+                students[sid]["entries"][target_date] = (condition, mental)
+
+    return list(classes.values())
+
+
+def _average(values):
+    return round(sum(values) / len(values), 2) if values else None
+
+
+def summarize(data):
+    """クラス1件分のデータから、提出数・未提出日・体調/メンタル平均を求める"""
+    days = data["days"]
+    rows = []
+    conditions, mentals = [], []
+    daily = {d: 0 for d in days}
+    for student in data["students"]:
+        submitted = [(d, student["entries"][d]) for d in days if d in student["entries"]]
+        for d, _ in submitted:
+            daily[d] += 1
+        cond = [c for _, (c, _) in submitted]
+        ment = [m for _, (_, m) in submitted]
+        conditions += cond
+        mentals += ment
+        rows.append({
+            "no": student["no"],
+            "name": student["name"],
+            "cells": [student["entries"].get(d) for d in days],
+            "submitted": len(submitted),
+            "missing": [d for d in days if d not in student["entries"]],
+            "condition_avg": _average(cond),
+            "mental_avg": _average(ment),
+        })
+
+    expected = len(rows) * len(days)
+    submitted = sum(daily.values())
+    return {
+        "class_room": {k: data[k] for k in ("id", "name", "grade", "teacher")},
+        "days": days,
+        "rows": rows,
+        "daily": [daily[d] for d in days],
+        "student_count": len(rows),
+        "submitted": submitted,
+        "missing": expected - submitted,
+        "rate": round(submitted * 100 / expected, 1) if expected else None,
+        "condition_avg": _average(conditions),
+        "mental_avg": _average(mentals),
+    }
+
+
+def filename(data):
+    return f"class-{data['id']}.html"
+
+
+def render_class(data, out_dir, extra=None):
+    """クラス1件分を集計・描画して out_dir に書き出し、インデックス用の要約を返す"""
+    context = summarize(data)
+    context.update(extra or {})
+    html = render_to_string(TEMPLATE, context)
+    Path(out_dir, filename(data)).write_text(html, encoding="utf-8")
+    return {
+        "file": filename(data),
+        "class_room": context["class_room"],
+        "student_count": context["student_count"],
+        "submitted": context["submitted"],
+        "missing": context["missing"],
+        "rate": context["rate"],
+        "condition_avg": context["condition_avg"],
+        "mental_avg": context["mental_avg"],
+    }
+
+
+def render_index(summaries, out_dir, extra=None):
+    context = {"classes": summaries}
+    context.update(extra or {})
+    path = Path(out_dir, "index.html")
+    path.write_text(render_to_string(INDEX_TEMPLATE, context), encoding="utf-8")
+    return path
@@ -0,0 +1,126 @@
+# 体調・メンタルの推移から早期警戒スコアを計算する（compute_risk コマンドから使用）
+#
+# ・対象期間の連絡帳を1回の values_list で取得し、生徒×登校日の行列（未提出は NaN）に並べる
+# ・生徒ごとのループを使わず、行列演算で直近の移動平均・傾き（最小二乗）・連続未提出日数を求める
+# ・スコアは「直近の低さ」「下降傾向」「連続未提出」を重み付けして 0〜100 に収める
+
+import numpy as np
+
+from .models import Entry, calc_prev_schoolday
+
+# 直近平均を取る登校日数
+RECENT_DAYS = 5
+
+# 各要素の重み（合計 1.0）
+WEIGHTS = {
+    "mental_level": 0.30,
+    "mental_slope": 0.25,
+    "condition_level": 0.15,
+    "condition_slope": 0.10,
+    "missing": 0.20,
+}
+
+
+def school_days(as_of, days):
+    """as_of を最終日とする直近 days 登校日を古い順に返す"""
+    result = [as_of]
+    while len(result) < days:
+        result.append(calc_prev_schoolday(result[-1]))
+    return result[::-1]
+
+
+def load_matrix(student_ids, days, entries=None):
+    """(体調, メンタル) の行列を返す（行=student_ids の順、列=days の順、未提出は NaN）
+
+    entries には学校で絞り込んだ Entry のクエリセットを渡せる（student_ids 以外の行は無視する）。
+    """
+    student_ids = np.asarray(student_ids, dtype=np.int64)
+    shape = (len(student_ids), len(days))
+    condition = np.full(shape, np.nan)
+    mental = np.full(shape, np.nan)
+    if not len(student_ids):
+        return condition, mental
+
+    rows = list(
+        (Entry.objects.all() if entries is None else entries)
+        .filter(target_date__gte=days[0], target_date__lte=days[-1])
+        .values_list("student_id", "target_date", "condition", "mental")
+    )
+    if not rows:
+        return condition, mental
+
+    sid, tdate, cond, ment = zip(*rows)
+    # 日付 → 列番号の対応表（登校日以外の日付は -1）
+    base = days[0].toordinal()
+    col_of = np.full(days[-1].toordinal() - base + 1, -1, dtype=np.int64)
+    col_of[[d.toordinal() - base for d in days]] = np.arange(len(days))
+    cols = col_of[np.fromiter((d.toordinal() - base for d in tdate), dtype=np.int64, count=len(rows))]
+
+    order = np.argsort(student_ids)
+    sid = np.fromiter(sid, dtype=np.int64, count=len(rows))
+    pos = np.searchsorted(student_ids, sid, sorter=order).clip(0, len(student_ids) - 1)
+    idx = order[pos]
+    keep = (student_ids[idx] == sid) & (cols >= 0)
+
+    condition[idx[keep], cols[keep]] = np.asarray(cond, dtype=float)[keep]
+    mental[idx[keep], cols[keep]] = np.asarray(ment, dtype=float)[keep]
+    return condition, mental
+
+
+def _mean(values):
+    """行ごとの NaN を除いた平均（値がなければ NaN）"""
+    observed = ~np.isnan(values)
+    count = observed.sum(axis=1)
+    total = np.where(observed, values, 0.0).sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan)
+
+
+def _slope(values):
+    """行ごとの最小二乗の傾き（観測点が2未満なら NaN）"""
+    observed = ~np.isnan(values)
+    x = np.broadcast_to(np.arange(values.shape[1], dtype=float), values.shape)
+    count = observed.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = np.where(observed, x, 0.0).sum(axis=1) / count
+        y_mean = np.where(observed, values, 0.0).sum(axis=1) / count
+        dx = np.where(observed, x - x_mean[:, None], 0.0)
+        dy = np.where(observed, values - y_mean[:, None], 0.0)
+        var = (dx * dx).sum(axis=1)
+        return np.where((count >= 2) & (var > 0), (dx * dy).sum(axis=1) / var, np.nan)
+
+
+def _missing_streak(values):
+    """行ごとの末尾からの連続未提出日数"""
+    observed = ~np.isnan(values)[:, ::-1]
+    return np.where(observed.any(axis=1), observed.argmax(axis=1), values.shape[1])
+
+
+def score(condition, mental, recent_days=RECENT_DAYS):
+    """行列から各指標とスコアの辞書（値はいずれも行数分の配列）を返す"""
+    days = condition.shape[1]
+    recent = slice(max(0, days - recent_days), days)
+    result = {
+        "condition_mean": _mean(condition[:, recent]),
+        "mental_mean": _mean(mental[:, recent]),
+        "condition_slope": _slope(condition),
+        "mental_slope": _slope(mental),
+        "missing_streak": _missing_streak(condition),
+    }
+
+    # 各要素を 0〜1 に正規化（「ふつう」=3 を下回った分・期間全体での下降幅・未提出の割合）
+    def level(mean):
+        return np.nan_to_num((3 - mean) / 2).clip(0, 1)
+
+    def decline(slope):
+        return np.nan_to_num(-slope * max(days - 1, 1) / 4).clip(0, 1)
+
+    total = (
+        WEIGHTS["mental_level"] * level(result["mental_mean"])
+        + WEIGHTS["mental_slope"] * decline(result["mental_slope"])
+        + WEIGHTS["condition_level"] * level(result["condition_mean"])
+        + WEIGHTS["condition_slope"] * decline(result["condition_slope"])
+        + WEIGHTS["missing"] * result["missing_streak"] / days
+    )
+    result["score"] = np.round(total * 100, 1)
+    return result
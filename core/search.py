@@ -0,0 +1,93 @@
+# 管理画面のユーザー・生徒検索（オートコンプリート）
+#
+# ・ユーザー名・姓・名・姓名・名姓を照合用に正規化（NFKC・カタカナ→ひらがな・小文字化・空白除去）し、
+#   UserSearchKey に保存する。検索語も同じく正規化し、キーの前方一致（範囲検索）でインデックスだけを引く
+# ・icontains（LIKE '%...%'）と違って表を全件読まないため、ユーザー数が増えても検索時間はほぼ一定
+# ・オートコンプリートは候補をキー順に上限件数だけ読み、完全一致 → キーの種類 → キーの短い順に並べて返す
+# ・一覧画面の検索は件数を制限せず、一致するキーをサブクエリにして絞り込む
+
+from django.db.models import Q
+
+from .alerts import normalize
+from .models import UserSearchKey
+
+MAX_KEY_LENGTH = 150
+# 前方一致の上限（どの文字よりも大きいコードポイント）
+_UPPER = "\U0010ffff"
+# 並べ替えの候補として、返す件数の何倍まで読むか
+CANDIDATE_FACTOR = 5
+
+
+def normalize_key(text):
+    """検索キー用の正規化（alerts.normalize に加えて空白を除く）"""
+    return "".join(normalize(text).split())[:MAX_KEY_LENGTH]
+
+
+def prefix_q(field, prefix):
+    """field が prefix で始まる条件（LIKE を使わない範囲検索。field のインデックスで引ける）"""
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": prefix + _UPPER})
+
+
+def search_keys(username, last_name, first_name):
+    """1ユーザー分の [(キー, 種類)]。同じキーは上位の種類だけを残す"""
+    Kind = UserSearchKey.Kind
+    candidates = [
+        (username, Kind.USERNAME),
+        (f"{last_name}{first_name}", Kind.FULL_NAME),
+        (last_name, Kind.LAST_NAME),
+        (first_name, Kind.FIRST_NAME),
+        (f"{first_name}{last_name}", Kind.FULL_NAME_REVERSED),
+    ]
+    keys = {}
+    for text, kind in candidates:
+        key = normalize_key(text)
+        if key and key not in keys:
+            keys[key] = kind
+    return list(keys.items())
+
+
+def index_users(queryset, using=None, chunk_size=1000):
+    """User のクエリセットの検索キーを作り直し、件数（ユーザー数）を返す"""
+    using = using or queryset.db
+    rows = queryset.using(using).order_by("pk").values_list("pk", "username", "last_name", "first_name")
+    count = 0
+    last_pk = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_pk)[:chunk_size])
+        if not chunk:
+            return count
+        ids = [pk for pk, *_ in chunk]
+        UserSearchKey.objects.using(using).filter(user_id__in=ids).delete()
+        UserSearchKey.objects.using(using).bulk_create(
+            [UserSearchKey(user_id=pk, key=key, kind=kind)
+             for pk, username, last, first in chunk for key, kind in search_keys(username, last, first)],
+            batch_size=chunk_size,
+        )
+        count += len(chunk)
+        last_pk = ids[-1]
+
+
+def matching_keys(term, using=None):
+    """検索語に前方一致する UserSearchKey のクエリセット（一覧画面の絞り込みにはサブクエリとして使う）"""
+    q = normalize_key(term)
+    if not q:
+        return UserSearchKey.objects.using(using).none()
+    return UserSearchKey.objects.using(using).filter(prefix_q("key", q))
+
+
+def search_user_ids(term, limit=20, using=None):
+    """検索語に前方一致するユーザーIDを関連度順に最大 limit 件返す"""
+    q = normalize_key(term)
+    if not q or limit <= 0:
+        return []
+    candidates = (
+        matching_keys(q, using)
+        .order_by("key")
+        .values_list("user_id", "kind", "key")[:limit * CANDIDATE_FACTOR]
+    )
+    best = {}
+    for user_id, kind, key in candidates:
+        rank = (key != q, kind, len(key))
+        if user_id not in best or rank < best[user_id]:
+            best[user_id] = rank
+    return sorted(best, key=lambda user_id: (best[user_id], user_id))[:limit]
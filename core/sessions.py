@@ -0,0 +1,20 @@
+# セッション（cached_db）のキャッシュヒット率の計測
+#
+# 読み込みはキャッシュ優先で、キャッシュに無い場合だけ DB から読む（Django 標準の cached_db と同じ）。
+# DB から読んだ場合をミスとして metrics の cache_requests_total{cache="session"} に数える。
+
+from django.contrib.sessions.backends import cached_db
+
+from . import metrics
+
+
+class SessionStore(cached_db.SessionStore):
+    def load(self):
+        self._cache_missed = False
+        data = super().load()
+        metrics.cache_lookup("session", not self._cache_missed)
+        return data
+
+    def _get_session_from_db(self):
+        self._cache_missed = True
+        return super()._get_session_from_db()
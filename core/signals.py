@@ -0,0 +1,68 @@
+# シグナル受信処理（条件付きGETのバージョン更新・検知キーワードの再構築・ユーザー検索キーの更新）
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .alerts import bump_keywords
+from .conditional import bump_global, bump_students
+from .models import School, Grade, ClassRoom, ClassStaff, Student, Entry, AlertKeyword
+from .search import index_users
+from .tenancy import clear_school_cache
+
+
+# 連絡帳の保存・削除（save()/create()/delete() 経由の変更）
+@receiver(post_save, sender=Entry)
+@receiver(post_delete, sender=Entry)
+def entry_changed(sender, instance, **kwargs):
+    bump_students([instance.student_id])
+
+
+# 学年・クラス・生徒の編成変更は担任スコープをまたぐため全体バージョンを進める
+@receiver(post_save, sender=School)
+@receiver(post_delete, sender=School)
+@receiver(post_save, sender=Grade)
+@receiver(post_delete, sender=Grade)
+@receiver(post_save, sender=ClassRoom)
+@receiver(post_delete, sender=ClassRoom)
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+@receiver(post_save, sender=ClassStaff)
+@receiver(post_delete, sender=ClassStaff)
+def roster_changed(sender, **kwargs):
+    bump_global()
+    if sender is School:
+        # ホスト名 → School のプロセス内キャッシュ（tenancy.get_school）も作り直す
+        clear_school_cache()
+
+
+# クラスの担任（homeroom_teacher）を担当教員（ClassStaff の担任）に同期する
+@receiver(post_save, sender=ClassRoom)
+def sync_homeroom(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    db = instance._state.db
+    ClassStaff.objects.using(db).filter(class_room=instance, role=ClassStaff.Role.HOMEROOM) \
+                                .exclude(user_id=instance.homeroom_teacher_id).delete()
+    ClassStaff.objects.using(db).update_or_create(
+        class_room=instance, user_id=instance.homeroom_teacher_id,
+        defaults={"role": ClassStaff.Role.HOMEROOM},
+    )
+
+
+# 氏名変更は画面表示・管理画面の検索キーに影響するが、ログイン時の last_login 更新と
+# パスワードの再ハッシュ（ログイン成功時の自動更新）だけなら無視する
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, raw=False, **kwargs):
+    if update_fields and set(update_fields) <= {"last_login", "password"}:
+        return
+    bump_global()
+    if not raw:
+        index_users(User.objects.filter(pk=instance.pk), using=instance._state.db)
+
+
+# 検知キーワードの変更は次回の走査時にオートマトンを作り直す
+@receiver(post_save, sender=AlertKeyword)
+@receiver(post_delete, sender=AlertKeyword)
+def alert_keyword_changed(sender, instance, **kwargs):
+    bump_keywords(instance._state.db)
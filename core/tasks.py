@@ -0,0 +1,14 @@
+# バックグラウンドジョブとして実行するタスク（core.jobs.enqueue で登録して使う）
+
+from .conditional import bump_entries
+from .jobs import task
+from .models import Entry
+
+
+# 提出データの削除（管理画面「未提出に戻す」）
+@task("entries.delete")
+def delete_entries(payload):
+    qs = Entry.objects.filter(pk__in=payload.get("ids", []))
+    bump_entries(qs)
+    deleted, _ = qs.delete()
+    return {"deleted": deleted}
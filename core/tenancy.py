@@ -0,0 +1,105 @@
+# 複数校（テナント）対応：リクエストごとの学校判定とDB振り分け
+#
+# settings.SCHOOLS は {学校コード: DBエイリアス} の辞書。
+# 学校ごとに別のSQLiteファイル（エイリアス）を割り当てれば、書き込みロックが学校間で競合しない。
+# 同じエイリアス（default）を複数校で共有する場合は School 外部キーで絞り込む。
+# 学校はホスト名の先頭ラベル（例: school-a.example.com → school-a）で判定する。
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# 現在処理中の学校のDBエイリアス（未設定時は None = default）
+_current_db = ContextVar("school_db", default=None)
+
+# (DBエイリアス, 学校コード) → (School インスタンス, 取得時刻)（プロセス内キャッシュ）
+# 変更・削除時はシグナルで消す。他のワーカーでも SCHOOL_CACHE_TIMEOUT 秒で読み直される
+_school_cache = {}
+SCHOOL_CACHE_TIMEOUT = 60
+
+
+def current_db() -> str:
+    """現在の学校のDBエイリアスを返す（transaction.atomic(using=...) 等で使用）"""
+    return _current_db.get() or DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def using_school(code):
+    """指定した学校のDBを対象に処理する（管理コマンド・バッチ用）"""
+    alias = settings.SCHOOLS.get(code, DEFAULT_DB_ALIAS) if code else None
+    token = _current_db.set(alias)
+    try:
+        yield alias or DEFAULT_DB_ALIAS
+    finally:
+        _current_db.reset(token)
+
+
+def school_code_for_host(host: str):
+    """ホスト名から学校コードを判定する（該当なしは None）"""
+    label = host.split(":")[0].split(".")[0]
+    return label if label in settings.SCHOOLS else None
+
+
+def get_school(code):
+    """学校コードに対応する School を返す（未登録なら None）"""
+    if not code:
+        return None
+    alias = settings.SCHOOLS.get(code, DEFAULT_DB_ALIAS)
+    cached = _school_cache.get((alias, code))
+    if cached is not None and time.monotonic() - cached[1] < SCHOOL_CACHE_TIMEOUT:
+        return cached[0]
+    from .models import School
+    school = School.objects.using(alias).filter(code=code).first()
+    if school is not None:
+        _school_cache[(alias, code)] = (school, time.monotonic())
+    else:
+        _school_cache.pop((alias, code), None)
+    return school
+
+
+def clear_school_cache():
+    """School の変更・削除時に呼ぶ（コード変更にも対応するため全件消す）"""
+    _school_cache.clear()
+
+
+class SchoolMiddleware:
+    """ホスト名から学校を判定し、リクエスト中のDBを切り替えるミドルウェア
+
+    セッション・認証もその学校のDBを参照するため、SessionMiddleware より前に置く。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        code = school_code_for_host(request.get_host()) if settings.SCHOOLS else None
+        with using_school(code):
+            request.school = get_school(code)
+            return self.get_response(request)
+
+
+class SchoolRouter:
+    """現在の学校のDBへ読み書きを振り分けるルーター
+
+    既に取得済みのインスタンスは、そのインスタンスが属するDBを優先する。
+    全DBに同じスキーマを作るため allow_migrate は制限しない（migrate --database=<alias> で作成）。
+    """
+
+    def _db(self, **hints):
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return _current_db.get()
+
+    def db_for_read(self, model, **hints):
+        return self._db(**hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db(**hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 学校DBをまたぐ関連は作らない
+        return obj1._state.db == obj2._state.db
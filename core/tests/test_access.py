@@ -0,0 +1,74 @@
+# 担当教員の権限（ClassStaff / core.access）のテスト
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.access import ACCESS_KEY, get_access
+from core.conditional import GLOBAL_KEY
+from core.models import School, Grade, ClassRoom, ClassStaff, Student, Entry, calc_prev_schoolday
+
+
+class AccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        teacher_group = Group.objects.get(name="TEACHER")
+        cls.homeroom = User.objects.create_user(username="teacher1", password="x")
+        cls.assistant = User.objects.create_user(username="teacher2", password="x")
+        cls.other = User.objects.create_user(username="teacher3", password="x")
+        for u in (cls.homeroom, cls.assistant, cls.other):
+            u.groups.add(teacher_group)
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        cls.c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.homeroom)
+        ClassRoom.objects.create(name="2組", grade=g1, homeroom_teacher=cls.other)
+        user = User.objects.create_user(username="stu01", password="x")
+        cls.student = Student.objects.create(user=user, class_room=cls.c1, student_no="1")
+
+    def setUp(self):
+        cache.clear()
+
+    # 担任はクラス保存時に担当教員として自動登録され、変更にも追従する
+    def test_homeroom_is_synced(self):
+        self.assertEqual(ClassStaff.objects.get(class_room=self.c1).user, self.homeroom)
+        self.c1.homeroom_teacher = self.assistant
+        self.c1.save()
+        self.assertEqual(list(ClassStaff.objects.filter(class_room=self.c1).values_list("user", "role")),
+                         [(self.assistant.pk, ClassStaff.Role.HOMEROOM)])
+
+    # 2回目以降は生徒ID集合がキャッシュから返り（担当クラスの確認のみ）、割り当てを変えると作り直される
+    def test_access_is_cached_and_invalidated(self):
+        self.assertEqual(get_access(self.assistant).student_ids, frozenset())
+        ClassStaff.objects.create(class_room=self.c1, user=self.assistant)
+        access = get_access(self.assistant)
+        self.assertEqual(access.student_ids, {self.student.pk})
+        with self.assertNumQueries(1):
+            self.assertEqual(get_access(self.assistant), access)
+
+    # 別ワーカー（bump_global が届かない LocMemCache）のキャッシュが残っていても、割り当ての解除は直ちに効く
+    def test_revoked_assignment_with_stale_worker_cache(self):
+        staff = ClassStaff.objects.create(class_room=self.c1, user=self.assistant)
+        entry = Entry.objects.create(student=self.student, target_date=calc_prev_schoolday(), content="ok")
+        self.assertEqual(get_access(self.assistant).student_ids, {self.student.pk})
+        keys = [GLOBAL_KEY.format(db="default"), ACCESS_KEY.format(db="default", classes=self.c1.pk)]
+        worker_cache = cache.get_many(keys)
+        self.assertEqual(len(worker_cache), 2)
+
+        staff.delete()  # このワーカーでは bump_global() される
+        cache.set_many(worker_cache)  # 別ワーカーのキャッシュ（解除前の状態）に戻す
+        self.assertEqual(get_access(self.assistant).student_ids, frozenset())
+        self.client.force_login(self.assistant)
+        res = self.client.post(reverse("mark_read", args=[entry.pk]), secure=True)
+        self.assertEqual(res.status_code, 403)
+        entry.refresh_from_db()
+        self.assertIsNone(entry.read_at)
+
+    # 全体バージョンが追い出された場合は、残っている生徒ID集合を信用せず作り直す
+    def test_missing_version_is_not_trusted(self):
+        ClassStaff.objects.create(class_room=self.c1, user=self.assistant)
+        cache.delete(GLOBAL_KEY.format(db="default"))
+        cache.set(ACCESS_KEY.format(db="default", classes=self.c1.pk), (None, frozenset()))
+        self.assertEqual(get_access(self.assistant).student_ids, {self.student.pk})
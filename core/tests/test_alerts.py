@@ -0,0 +1,81 @@
+# 要注意キーワード検知のテスト
+
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from core import alerts
+from core.alerts import Automaton, normalize
+from core.models import School, Grade, ClassRoom, Student, Entry, AlertKeyword, EntryAlert, calc_prev_schoolday
+
+
+class AutomatonTests(SimpleTestCase):
+    # 全角・半角・カタカナ・大文字の違いを吸収して照合する
+    def test_normalize_folds_width_and_kana(self):
+        self.assertEqual(normalize("ｲｼﾞﾒ"), "いじめ")
+        self.assertEqual(normalize("ＡＢＣ"), "abc")
+
+    # 重なり合うキーワードも1回の走査で全て検出する
+    def test_search_finds_overlapping_keywords(self):
+        ac = Automaton([("he", 1), ("she", 2), ("hers", 3), ("いじめ", 4)])
+        self.assertEqual(ac.search("USHERS"), [2, 1, 3])
+        self.assertEqual(ac.search("クラスでイジメがあった"), [4])
+        self.assertEqual(ac.search("特になし"), [])
+
+
+class AlertScanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+        cls.s1 = User.objects.create_user(username="stu01", password="x")
+        cls.s1.groups.add(Group.objects.get(name="STUDENT"))
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.student = Student.objects.create(user=cls.s1, class_room=c1, student_no="1")
+
+        AlertKeyword.objects.all().delete()
+        AlertKeyword.objects.create(keyword="いじめ", category=AlertKeyword.Category.BULLYING)
+
+    def setUp(self):
+        cache.clear()
+
+    # 版数の更新が届かないプロセス（別ワーカー・run_worker）でも AUTOMATON_TIMEOUT 秒後には作り直す
+    def test_automaton_is_rebuilt_after_timeout(self):
+        self.assertEqual(alerts.scan("ひやかし", alerts.get_automaton()), [])
+        # update() はシグナルを送らないため、他プロセスでの変更と同じく版数は変わらない
+        AlertKeyword.objects.update(keyword="ひやかし")
+        self.assertEqual(alerts.scan("ひやかし", alerts.get_automaton()), [])
+        later = time.monotonic() + alerts.AUTOMATON_TIMEOUT
+        with mock.patch("core.alerts.time.monotonic", return_value=later):
+            self.assertEqual(alerts.scan("ひやかし", alerts.get_automaton()),
+                             [("ひやかし", AlertKeyword.Category.BULLYING)])
+
+    # 提出時に検知され、担任ダッシュボードの先頭に表示される
+    def test_submit_flags_entry_and_dashboard_shows_it(self):
+        self.client.force_login(self.s1)
+        self.client.post(reverse("student_entry_new"),
+                         {"content": "昨日イジメを見ました", "condition": 3, "mental": 2}, secure=True)
+        entry = Entry.objects.get(student=self.student)
+        self.assertEqual(list(entry.alerts.values_list("keyword", flat=True)), ["いじめ"])
+
+        self.client.force_login(self.teacher)
+        res = self.client.get(reverse("teacher_dashboard"), secure=True)
+        self.assertEqual([e.pk for e in res.context["flagged"]], [entry.pk])
+
+    # キーワード追加後のバックフィルで既存の連絡帳も検知される
+    def test_backfill_command_scans_existing_entries(self):
+        Entry.objects.create(student=self.student, target_date=calc_prev_schoolday(), content="頭痛がする")
+        self.assertFalse(EntryAlert.objects.exists())
+        AlertKeyword.objects.create(keyword="頭痛", category=AlertKeyword.Category.ILLNESS)
+        call_command("scan_alerts", stdout=StringIO())
+        self.assertEqual(EntryAlert.objects.get().category, AlertKeyword.Category.ILLNESS)
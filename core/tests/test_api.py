@@ -0,0 +1,126 @@
+# JSON API（/api/v1/）のテスト
+
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from core.models import School, Grade, ClassRoom, Student, Entry, EntryEvent, calc_prev_schoolday
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.other = User.objects.create_user(username="teacher2", password="x")
+        for u in (cls.teacher, cls.other):
+            u.groups.add(Group.objects.get(name="TEACHER"))
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        cls.c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.c2 = ClassRoom.objects.create(name="2組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.c3 = ClassRoom.objects.create(name="3組", grade=g1, homeroom_teacher=cls.other)
+        cls.students = []
+        for i, class_room in enumerate([cls.c1, cls.c1, cls.c2, cls.c3]):
+            user = User.objects.create_user(username=f"stu0{i}", password="x", last_name="生徒", first_name=str(i))
+            user.groups.add(Group.objects.get(name="STUDENT"))
+            cls.students.append(Student.objects.create(user=user, class_room=class_room, student_no=str(i + 1)))
+        cls.tdate = calc_prev_schoolday()
+
+    def setUp(self):
+        cache.clear()
+
+    def _post(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type="application/json", secure=True)
+
+    def test_requires_login(self):
+        res = self.client.get(reverse("api:entries"), secure=True)
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(self.client.get(reverse("api:me"), secure=True).json(), {"user": None})
+
+    # 生徒：提出 → 上書き → 既読後は 409
+    def test_student_submit(self):
+        self.client.force_login(self.students[0].user)
+        res = self._post("api:today", {"content": " 元気です ", "condition": 4})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(res.json()["entry"]["content"], "元気です")
+        self.assertEqual(res.json()["entry"]["mental"], 3)
+
+        self.assertEqual(self._post("api:today", {"content": "更新", "mental": 6}).status_code, 400)
+        self.assertEqual(self._post("api:today", {"content": "更新", "mental": 5}).status_code, 200)
+
+        entry = Entry.objects.get(student=self.students[0])
+        entry.lock_as_read(self.teacher)
+        res = self._post("api:today", {"content": "再更新"})
+        self.assertEqual(res.status_code, 409)
+        self.assertEqual(res.json()["entry"]["content"], "更新")
+
+        today = self.client.get(reverse("api:today"), secure=True).json()
+        self.assertFalse(today["can_edit"])
+
+    # 指定項目だけを返し、カーソルで重複・欠落なくページを送る
+    def test_cursor_pagination_and_fields(self):
+        student = self.students[0]
+        for i in range(5):
+            Entry.objects.create(student=student, target_date=self.tdate - timedelta(days=i), content=str(i))
+        self.client.force_login(student.user)
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, "fields": "id,date,content"}
+            if cursor:
+                params["cursor"] = cursor
+            page = self.client.get(reverse("api:entries"), params, secure=True).json()
+            self.assertTrue(all(set(item) == {"id", "date", "content"} for item in page["items"]))
+            seen += [item["content"] for item in page["items"]]
+            cursor = page["next"]
+            if not cursor:
+                break
+        self.assertEqual(seen, ["0", "1", "2", "3", "4"])
+
+        res = self.client.get(reverse("api:entries"), {"fields": "id,password"}, secure=True)
+        self.assertEqual(res.status_code, 400)
+
+    # 担任：担当クラスの提出状況をまとめて取得（問い合わせ回数はクラス数によらない）
+    def test_class_status_batch(self):
+        Entry.objects.create(student=self.students[0], target_date=self.tdate, content="ok")
+        self.client.force_login(self.teacher)
+        url = reverse("api:class_status")
+        self.client.get(url, secure=True)
+        with self.assertNumQueries(8):
+            res = self.client.get(url, {"ids": f"{self.c1.pk},{self.c2.pk}"}, secure=True)
+        data = res.json()
+        self.assertEqual([c["name"] for c in data["classes"]], ["1組", "2組"])
+        self.assertEqual((data["classes"][0]["submitted"], data["classes"][0]["unread"]), (1, 1))
+        self.assertEqual([s["id"] for s in data["classes"][0]["not_submitted"]], [self.students[1].pk])
+
+        res = self.client.get(url, {"ids": f"{self.c1.pk},{self.c3.pk}"}, secure=True)
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(res.json()["forbidden"], [self.c3.pk])
+
+    # 担任：まとめて既読（担当外・既読済み・存在しないIDは結果で区別する）
+    def test_batch_mark_read(self):
+        e0, e1, e3 = (Entry.objects.create(student=self.students[i], target_date=self.tdate, content="ok")
+                      for i in (0, 1, 3))
+        e1.lock_as_read(self.teacher)
+        self.client.force_login(self.teacher)
+        res = self._post("api:mark_read", {"ids": [e0.pk, e1.pk, e3.pk, 999999]})
+        self.assertEqual(res.json(), {
+            "read": [e0.pk], "already_read": [e1.pk], "forbidden": [e3.pk], "not_found": [999999],
+        })
+        e0.refresh_from_db()
+        self.assertEqual(e0.read_by, self.teacher)
+        self.assertTrue(EntryEvent.objects.filter(entry_id=e0.pk, source="api").exists())
+        self.assertIsNone(Entry.objects.get(pk=e3.pk).read_at)
+
+        # 担任の一覧は担当生徒分のみ、unread=1 で未読だけ
+        page = self.client.get(reverse("api:entries"), {"unread": "1", "fields": "id,name"}, secure=True).json()
+        self.assertEqual(page["items"], [])
+        page = self.client.get(reverse("api:entries"), {"fields": "id,name"}, secure=True).json()
+        self.assertEqual(sorted(i["id"] for i in page["items"]), sorted([e0.pk, e1.pk]))
+        self.assertIn({"id": e0.pk, "name": "生徒0"}, page["items"])
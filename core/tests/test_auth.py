@@ -0,0 +1,51 @@
+# ログイン集中対策（core.auth）のテスト
+
+from django.contrib.auth.hashers import get_hasher
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core import auth
+
+
+@override_settings(PBKDF2_ITERATIONS=1000)
+class LoginCapacityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Group.objects.get_or_create(name="STUDENT")
+        cls.user = User.objects.create_user(username="stu01")
+        cls.user.password = get_hasher("default").encode("pass1234", "salt0123456789", 1000)
+        cls.user.save()
+        cls.user.groups.add(Group.objects.get(name="STUDENT"))
+
+    def _login(self, **extra):
+        return self.client.post(reverse("custom_login"), {"username": "stu01", "password": "pass1234", **extra},
+                                secure=True)
+
+    # 反復回数を変えると、次回ログイン成功時に新しい回数で再ハッシュされる
+    def test_rehash_on_login(self):
+        with self.settings(PBKDF2_ITERATIONS=1200):
+            self.assertEqual(self._login().status_code, 302)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1200$"))
+
+    # 「この端末を記憶する」を選んだ場合だけセッションを延長する
+    def test_remember_device(self):
+        self._login()
+        self.assertLess(self.client.session.get_expiry_age(), 30 * 24 * 60 * 60)
+        self.client.logout()
+        with self.settings(REMEMBER_DEVICE_DAYS=30):
+            self._login(remember="1")
+        self.assertEqual(self.client.session.get_expiry_age(), 30 * 24 * 60 * 60)
+
+    # 検証の枠が空かなければ 503（Retry-After 付き）を返し、他の画面は待たせない
+    @override_settings(LOGIN_HASH_CONCURRENCY=1, LOGIN_HASH_WAIT_SECONDS=0.01, LOGIN_RETRY_AFTER_SECONDS=7)
+    def test_busy_returns_503(self):
+        slots = auth._semaphore()
+        slots.acquire()
+        try:
+            res = self._login()
+        finally:
+            slots.release()
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "7")
+        self.assertEqual(self._login().status_code, 302)
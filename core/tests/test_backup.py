@@ -0,0 +1,68 @@
+# オンラインバックアップ・リストアのテスト
+
+import gzip
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.test import SimpleTestCase
+from core import backup
+
+
+class BackupTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        self.db = self.dir / "db.sqlite3"
+        conn = sqlite3.connect(self.db)
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+        conn.executemany("INSERT INTO t (v) VALUES (?)", [("x" * 100,)] * 2000)
+        conn.commit()
+        conn.close()
+
+    def _count(self):
+        conn = sqlite3.connect(self.db)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+        finally:
+            conn.close()
+
+    # 書き込み用の接続を開いたままでも、圧縮された検証済みのスナップショットが作れる
+    def test_snapshot_is_compressed_and_valid(self):
+        writer = sqlite3.connect(self.db)
+        self.addCleanup(writer.close)
+        path = backup.snapshot(self.db, "default", self.dir / "bk", pages=8, sleep=0)
+        self.assertTrue(path.name.startswith("default-") and path.name.endswith(".sqlite3.gz"))
+        self.assertLess(path.stat().st_size, self.db.stat().st_size)
+        raw = self.dir / "check.sqlite3"
+        raw.write_bytes(gzip.decompress(path.read_bytes()))
+        backup.integrity_check(raw)
+        self.assertEqual(list((self.dir / "bk").glob(".*")), [])
+
+    # 新しいものから keep 件だけ残す
+    def test_rotate_keeps_newest(self):
+        base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        paths = [backup.snapshot(self.db, "default", self.dir, now=base + timedelta(minutes=15 * i))
+                 for i in range(4)]
+        backup.rotate("default", self.dir, keep=2)
+        self.assertEqual(backup.snapshots("default", self.dir), paths[2:])
+
+    # 復元すると取得時点の内容に戻る
+    def test_restore_roundtrip(self):
+        path = backup.snapshot(self.db, "default", self.dir)
+        conn = sqlite3.connect(self.db)
+        conn.execute("DELETE FROM t")
+        conn.commit()
+        conn.close()
+        backup.restore(path, self.db)
+        self.assertEqual(self._count(), 2000)
+
+    # 壊れたファイルは復元しない
+    def test_restore_rejects_corrupt_snapshot(self):
+        bad = self.dir / "bad.sqlite3.gz"
+        bad.write_bytes(gzip.compress(b"SQLite format 3\x00" + b"\xff" * 4096))
+        with self.assertRaises(backup.BackupError):
+            backup.restore(bad, self.db)
+        self.assertEqual(self._count(), 2000)
@@ -0,0 +1,92 @@
+# 条件付きGET（ETag / 304）のテスト
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core.checks import shared_cache_check
+from core.models import School, Grade, ClassRoom, Student, Entry, calc_prev_schoolday
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+        cls.s1 = User.objects.create_user(username="stu01", password="x")
+        cls.s1.groups.add(Group.objects.get(name="STUDENT"))
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.student = Student.objects.create(user=cls.s1, class_room=c1, student_no="1")
+
+    def setUp(self):
+        cache.clear()
+
+    def _get(self, url, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(url, secure=True, **headers)
+
+    # 変更がなければ2回目は304が返る
+    def test_student_entries_returns_304_when_unchanged(self):
+        self.client.force_login(self.s1)
+        url = reverse("student_entries")
+        first = self._get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("ETag", first)
+        second = self._get(url, first["ETag"])
+        self.assertEqual(second.status_code, 304)
+
+    # 担任が既読にすると（.update() 経由でも）生徒側のETagが変わる
+    def test_mark_read_invalidates_student_and_teacher_etag(self):
+        e = Entry.objects.create(student=self.student, target_date=calc_prev_schoolday(), content="ok")
+
+        self.client.force_login(self.s1)
+        s_etag = self._get(reverse("student_entries"))["ETag"]
+        self.client.force_login(self.teacher)
+        t_etag = self._get(reverse("teacher_dashboard"))["ETag"]
+
+        e.lock_as_read(teacher=self.teacher)
+
+        self.assertEqual(self._get(reverse("teacher_dashboard"), t_etag).status_code, 200)
+        self.client.force_login(self.s1)
+        self.assertEqual(self._get(reverse("student_entries"), s_etag).status_code, 200)
+
+    # 提出データの削除でもETagが変わる
+    def test_delete_invalidates_etag(self):
+        e = Entry.objects.create(student=self.student, target_date=calc_prev_schoolday(), content="ok")
+        self.client.force_login(self.teacher)
+        url = reverse("teacher_dashboard")
+        etag = self._get(url)["ETag"]
+        e.delete()
+        self.assertEqual(self._get(url, etag).status_code, 200)
+
+    # 検索条件が違えば別のETagになる
+    def test_teacher_etag_depends_on_query(self):
+        self.client.force_login(self.teacher)
+        url = reverse("teacher_dashboard")
+        etag = self._get(url)["ETag"]
+        self.assertEqual(self._get(url + "?q=abc", etag).status_code, 200)
+
+    # 権限外のユーザーは条件付き応答にならず403のまま
+    def test_forbidden_user_gets_no_etag(self):
+        self.client.force_login(self.teacher)
+        res = self._get(reverse("student_entries"))
+        self.assertEqual(res.status_code, 403)
+        self.assertNotIn("ETag", res)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    # 本番（DEBUG=False）でプロセスごとのキャッシュを使うと、版数の更新が他のワーカーに届かないためエラーにする
+    @override_settings(DEBUG=False, CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+    def test_process_local_cache_is_an_error_in_production(self):
+        self.assertEqual([e.id for e in shared_cache_check(None)], ["core.E001"])
+
+    @override_settings(DEBUG=False, CACHES={"default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp/schoolcomms-test-cache"}})
+    def test_file_cache_is_accepted(self):
+        self.assertEqual(shared_cache_check(None), [])
@@ -0,0 +1,103 @@
+# 担当教員向けダイジェスト（build_digests / core.digest）のテスト
+
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from core import digest
+from core.models import School, Grade, ClassRoom, ClassStaff, Student, Entry, TeacherDigest
+
+DAY = date(2025, 6, 11)
+
+
+class DigestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.homeroom1 = User.objects.create_user(username="t1", password="x", email="t1@example.com", last_name="担任1")
+        cls.homeroom2 = User.objects.create_user(username="t2", password="x", email="t2@example.com")
+        cls.head = User.objects.create_user(username="t3", password="x", last_name="主任")  # メール未登録
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        cls.c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.homeroom1)
+        cls.c2 = ClassRoom.objects.create(name="2組", grade=g1, homeroom_teacher=cls.homeroom2)
+        ClassStaff.objects.create(class_room=cls.c1, user=cls.head, role=ClassStaff.Role.GRADE_HEAD)
+        ClassStaff.objects.create(class_room=cls.c2, user=cls.head, role=ClassStaff.Role.GRADE_HEAD)
+
+        cls.s = []
+        for i, class_room in enumerate([cls.c1, cls.c1, cls.c1, cls.c2]):
+            user = User.objects.create_user(username=f"stu{i}", password="x", last_name="生徒", first_name=str(i))
+            cls.s.append(Student.objects.create(user=user, class_room=class_room, student_no=str(i + 1)))
+        # 1組：生徒0は提出済み（未読）、生徒1は提出済み（既読）、生徒2は未提出。2組：全員提出済み
+        Entry.objects.create(student=cls.s[0], target_date=DAY, content="a")
+        read = Entry.objects.create(student=cls.s[1], target_date=DAY, content="b")
+        read.lock_as_read(cls.homeroom1)
+        Entry.objects.create(student=cls.s[3], target_date=DAY, content="c")
+        # 前の登校日の分の未読（対象登校日の分は当日読むため未読の一覧には載せない）
+        cls.old1 = Entry.objects.create(student=cls.s[1], target_date=DAY - timedelta(days=1), content="d")
+        cls.old2 = Entry.objects.create(student=cls.s[3], target_date=DAY - timedelta(days=1), content="e")
+
+    def test_collect(self):
+        with self.assertNumQueries(3):
+            digests, teachers = digest.collect(None, DAY, "default")
+        self.assertEqual([s["student_id"] for s in digests[self.homeroom1.pk]["missing"]], [self.s[2].pk])
+        self.assertEqual(digests[self.homeroom2.pk]["missing"], [])
+        # 提出時刻に関係なく、対象登校日より前の分の未読だけを載せる
+        self.assertEqual([e["entry_id"] for e in digests[self.homeroom1.pk]["unread"]], [self.old1.pk])
+        self.assertEqual([e["entry_id"] for e in digests[self.homeroom2.pk]["unread"]], [self.old2.pk])
+        self.assertEqual(len(digests[self.head.pk]["missing"]), 1)
+        self.assertEqual(len(digests[self.head.pk]["unread"]), 2)
+        self.assertEqual(teachers[self.head.pk], ("", "主任"))
+
+    def test_command_saves_and_emails(self):
+        out = StringIO()
+        call_command("build_digests", "--date", DAY.isoformat(), "--email", stdout=out)
+        self.assertIn("3人分", out.getvalue())
+        row = TeacherDigest.objects.get(teacher=self.homeroom1, school_day=DAY)
+        self.assertEqual((row.missing_count, row.unread_count), (1, 1))
+        self.assertEqual(row.missing[0]["name"], "生徒2")
+        self.assertIsNotNone(row.emailed_at)
+        # メールアドレスのない教員には送らない
+        self.assertIsNone(TeacherDigest.objects.get(teacher=self.head).emailed_at)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["t1@example.com", "t2@example.com"])
+        body = next(m.body for m in mail.outbox if m.to == ["t1@example.com"])
+        self.assertIn("1年 1組 3番 生徒2", body)
+        self.assertIn("未読（1件）", body)
+
+        # 再実行すると同じ教員・登校日の行を上書きする
+        self.old1.lock_as_read(self.homeroom1)
+        call_command("build_digests", "--date", DAY.isoformat(), stdout=StringIO())
+        self.assertEqual(TeacherDigest.objects.count(), 3)
+        self.assertEqual(TeacherDigest.objects.get(teacher=self.homeroom1).unread_count, 0)
+
+    # 遡る日数より古い未読は載せない
+    def test_unread_window(self):
+        stale = Entry.objects.create(student=self.s[2], target_date=DAY - timedelta(days=30), content="f")
+        digests, _ = digest.collect(None, DAY, "default")
+        self.assertNotIn(stale.pk, [e["entry_id"] for e in digests[self.homeroom1.pk]["unread"]])
+        call_command("build_digests", "--date", DAY.isoformat(), "--unread-days", "31", stdout=StringIO())
+        self.assertEqual(TeacherDigest.objects.get(teacher=self.homeroom1).unread_count, 2)
+        with self.assertRaises(CommandError):
+            call_command("build_digests", "--unread-days", "0", stdout=StringIO())
+
+    # 送信に失敗した教員の分は送信日時を記録せず、再実行で送り直せるようにする
+    def test_send_stamps_only_delivered(self):
+        digests, teachers = digest.collect(None, DAY, "default")
+        digest.save(digests, DAY, "default")
+        messages = digest.build_messages(digests, teachers, DAY)
+        with mock.patch("core.digest.get_connection") as get_connection:
+            connection = get_connection.return_value.__enter__.return_value
+            connection.send_messages.side_effect = lambda msgs: 0 if msgs[0].to == ["t2@example.com"] else 1
+            self.assertEqual(digest.send(messages, DAY, "default"), 1)
+        self.assertIsNotNone(TeacherDigest.objects.get(teacher=self.homeroom1).emailed_at)
+        self.assertIsNone(TeacherDigest.objects.get(teacher=self.homeroom2).emailed_at)
+
+    # 存在しない学校コードでは全校分を作らずにエラーにする
+    def test_unknown_school_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command("build_digests", "--school", "no-such-school", "--email", stdout=StringIO())
+        self.assertFalse(TeacherDigest.objects.exists())
+        self.assertEqual(mail.outbox, [])
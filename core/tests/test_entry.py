@@ -1,6 +1,6 @@
 from django.test import TestCase
 from django.core.exceptions import ValidationError
-from core.models import  Grade, ClassRoom, Student, Entry, calc_prev_schoolday
+from core.models import  School, Grade, ClassRoom, Student, Entry, calc_prev_schoolday
 from django.contrib.auth.models import Group, User
 
 
@@ -20,7 +20,8 @@ class EntryCleanTests(TestCase):
         cls.s1.groups.add(Group.objects.get(name="STUDENT"))
 
         # 学年・クラス・生徒
-        g1 = Grade.objects.create(name="1年", year=2025)
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
         c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
         cls.student = Student.objects.create(user=cls.s1, class_room=c1, student_no="1")
 
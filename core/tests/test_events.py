@@ -0,0 +1,116 @@
+# 既読・未読の操作履歴（EntryEvent）のテスト
+
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from core.models import School, Grade, ClassRoom, Student, Entry, EntryEvent, Job, calc_prev_schoolday
+
+
+class EntryEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+        cls.admin = User.objects.create_superuser(username="admin1", password="x")
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.students = []
+        for no in range(1, 4):
+            user = User.objects.create_user(username=f"stu0{no}", password="x")
+            cls.students.append(Student.objects.create(user=user, class_room=c1, student_no=str(no)))
+
+    def _entries(self):
+        return [Entry.objects.create(student=s, target_date=calc_prev_schoolday(), content="ok")
+                for s in self.students]
+
+    # 既読→未読の取り消しがそれぞれ1件ずつ記録される（二重の既読は記録しない）
+    def test_lock_and_unlock_record_events(self):
+        e = self._entries()[0]
+        e.lock_as_read(self.teacher)
+        e.lock_as_read(self.teacher)
+        e.unlock_as_unread(actor=self.admin)
+        self.assertEqual(
+            list(e.events.order_by("id").values_list("action", "actor__username", "source")),
+            [("READ", "teacher1", "teacher"), ("UNREAD", "admin1", "admin")],
+        )
+
+    # 管理画面の一括既読は1回の INSERT でまとめて記録される
+    def test_admin_bulk_action_records_events_in_one_insert(self):
+        entries = self._entries()
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(reverse("admin:core_entry_changelist"), {
+                "action": "mark_as_read",
+                "_selected_action": [e.pk for e in entries],
+            }, secure=True)
+        self.assertEqual(res.status_code, 302)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "core_entryevent"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(EntryEvent.objects.filter(action="READ", source="admin_bulk").count(), 3)
+        self.assertEqual(EntryEvent.objects.values("created_at").distinct().count(), 1)
+
+    # 履歴は変更・削除できず、連絡帳を削除しても残る
+    def test_events_are_append_only(self):
+        e = self._entries()[0]
+        e.lock_as_read(self.teacher)
+        event = EntryEvent.objects.get()
+        with self.assertRaises(ValueError):
+            event.save()
+        with self.assertRaises(ValueError):
+            event.delete()
+        Entry.objects.filter(pk=e.pk).delete()
+        self.assertTrue(EntryEvent.objects.filter(entry_id=e.pk).exists())
+
+    # 管理画面の変更フォームに履歴が表示される
+    def test_change_form_shows_events(self):
+        e = self._entries()[0]
+        e.lock_as_read(self.teacher)
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("admin:core_entry_change", args=[e.pk]), secure=True)
+        self.assertContains(res, "teacher1")
+
+    # 一括既読は未読のものだけを更新し、既読済みの読者・日時と履歴はそのまま
+    def test_admin_bulk_read_skips_already_read(self):
+        entries = self._entries()
+        entries[0].lock_as_read(self.teacher)
+        entries[0].refresh_from_db()
+        self.client.force_login(self.admin)
+        self.client.post(reverse("admin:core_entry_changelist"), {
+            "action": "mark_as_read",
+            "_selected_action": [e.pk for e in entries],
+        }, secure=True)
+        first = Entry.objects.get(pk=entries[0].pk)
+        self.assertEqual((first.read_by, first.read_at), (self.teacher, entries[0].read_at))
+        self.assertEqual(Entry.objects.filter(read_by=self.admin).count(), 2)
+        self.assertEqual(
+            sorted(EntryEvent.objects.values_list("entry_id", "source")),
+            sorted([(entries[0].pk, "teacher"), (entries[1].pk, "admin_bulk"), (entries[2].pk, "admin_bulk")]),
+        )
+
+    # 連絡帳を削除しても、操作履歴の一覧に残る
+    def test_changelist_lists_events_of_deleted_entries(self):
+        e = self._entries()[0]
+        e.lock_as_read(self.teacher)
+        Entry.objects.filter(pk=e.pk).delete()
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("admin:core_entryevent_changelist"), secure=True)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([ev.entry_id for ev in res.context["cl"].result_list], [e.pk])
+
+    # 「未提出に戻す」は管理画面から実行でき、削除ジョブを登録する
+    def test_revert_to_unsubmitted_enqueues_delete_job(self):
+        entries = self._entries()
+        self.client.force_login(self.admin)
+        res = self.client.post(reverse("admin:core_entry_changelist"), {
+            "action": "revert_to_unsubmitted",
+            "_selected_action": [e.pk for e in entries[:2]],
+        }, secure=True)
+        self.assertEqual(res.status_code, 302)
+        job = Job.objects.get()
+        self.assertEqual((job.name, sorted(job.payload["ids"])), ("entries.delete", sorted(e.pk for e in entries[:2])))
@@ -0,0 +1,74 @@
+# 一覧画面の Jinja2 版テンプレートのテスト（DTL 版と同じ内容を表示する）
+
+import re
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.models import School, Grade, ClassRoom, Student, Entry, EntryAlert, RiskScore, calc_prev_schoolday
+
+
+def _text(html):
+    """タグ・CSRFトークン・空白を除いた表示テキスト"""
+    return re.sub(r"\s+", "", re.sub(r"<[^>]*>", "", html))
+
+
+class Jinja2TemplateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x", last_name="担任")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.students = []
+        for no in range(1, 4):
+            user = User.objects.create_user(username=f"stu0{no}", password="x",
+                                            last_name="生徒" if no != 3 else "", first_name=str(no))
+            user.groups.add(Group.objects.get(name="STUDENT"))
+            cls.students.append(Student.objects.create(user=user, class_room=c1, student_no=str(no)))
+        RiskScore.objects.create(student=cls.students[0], score=75, missing_streak=0, as_of=calc_prev_schoolday())
+        RiskScore.objects.create(student=cls.students[2], score=55, missing_streak=2, as_of=calc_prev_schoolday())
+
+        tdate = calc_prev_schoolday()
+        e1 = Entry.objects.create(student=cls.students[0], target_date=tdate, content="<b>元気</b>",
+                                  condition=4, mental=2)
+        Entry.objects.create(student=cls.students[1], target_date=tdate, content="")
+        Entry.objects.create(student=cls.students[1], target_date=calc_prev_schoolday(tdate), content="前日")
+        EntryAlert.objects.create(entry=e1, keyword="いじめ", category="BULLYING")
+        e1.lock_as_read(cls.teacher)
+        Entry.objects.create(student=cls.students[0], target_date=calc_prev_schoolday(tdate), content="x" * 60)
+
+    def setUp(self):
+        cache.clear()
+
+    def _render_both(self, user, url, params=None):
+        self.client.force_login(user)
+        pages = {}
+        for engine in ("django", "jinja2"):
+            with override_settings(LIST_TEMPLATE_ENGINE=engine):
+                res = self.client.get(url, params or {}, secure=True)
+                self.assertEqual(res.status_code, 200)
+                pages[engine] = res.content.decode()
+        return pages
+
+    def test_teacher_dashboard_matches(self):
+        for params in ({}, {"q": "元気"}, {"sid": self.students[1].pk}):
+            pages = self._render_both(self.teacher, reverse("teacher_dashboard"), params)
+            self.assertEqual(_text(pages["jinja2"]), _text(pages["django"]))
+        # 自動エスケープされる
+        self.assertIn("&lt;b&gt;元気&lt;/b&gt;", pages["jinja2"])
+
+    def test_student_entries_matches(self):
+        pages = self._render_both(self.students[0].user, reverse("student_entries"))
+        self.assertEqual(_text(pages["jinja2"]), _text(pages["django"]))
+
+    def test_benchmark_command_runs(self):
+        from io import StringIO
+        out = StringIO()
+        call_command("bench_templates", "--rows", "20", "--repeat", "1", stdout=out)
+        self.assertIn("teacher_dashboard.html", out.getvalue())
@@ -0,0 +1,87 @@
+# バックグラウンドジョブキューのテスト
+
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from core import jobs
+from core.models import Job
+
+
+@jobs.task("tests.echo")
+def _echo(payload):
+    return {"echo": payload["value"]}
+
+
+_released = threading.Event()
+
+
+# tests.release が実行されるまで待つ（同じバッチの完了待ちで詰まると時間切れで失敗する）
+@jobs.task("tests.wait")
+def _wait(payload):
+    if not _released.wait(timeout=5):
+        raise TimeoutError("not released")
+    return {"released": True}
+
+
+@jobs.task("tests.release")
+def _release(payload):
+    _released.set()
+    return {}
+
+
+@jobs.task("tests.fail")
+def _fail(payload):
+    raise RuntimeError("boom")
+
+
+# ワーカーは別スレッドの接続で書き込むため、テスト用トランザクションで包まない
+class RunWorkerTests(TransactionTestCase):
+    # 登録したジョブがワーカーで実行され、結果が状態に反映される
+    def test_worker_runs_queued_job(self):
+        job = jobs.enqueue("tests.echo", {"value": 1})
+        call_command("run_worker", once=True, threads=2, stdout=StringIO())
+        status = jobs.job_status(job.pk)
+        self.assertEqual(status["status"], Job.Status.DONE)
+        self.assertEqual(status["result"], {"echo": 1})
+
+    # 時間のかかるジョブの実行中も、空いたスレッドが後続のジョブを取得して実行する
+    def test_free_thread_claims_next_job(self):
+        _released.clear()
+        slow = jobs.enqueue("tests.wait", max_attempts=1)
+        for i in range(3):
+            jobs.enqueue("tests.echo", {"value": i})
+        jobs.enqueue("tests.release")
+        call_command("run_worker", once=True, threads=2, poll=0.05, stdout=StringIO())
+        self.assertEqual(jobs.job_status(slow.pk)["status"], Job.Status.DONE)
+        self.assertFalse(Job.objects.exclude(status=Job.Status.DONE).exists())
+
+
+class JobQueueTests(TestCase):
+    # 取得済みのジョブは別のワーカーから取得されない
+    def test_claim_is_exclusive(self):
+        jobs.enqueue("tests.echo", {"value": 1})
+        self.assertEqual(len(jobs.claim("w1", 10)), 1)
+        self.assertEqual(jobs.claim("w2", 10), [])
+
+    # 失敗時はバックオフ後に再実行待ち、上限に達したら FAILED
+    def test_failed_job_retries_with_backoff_then_fails(self):
+        job = jobs.enqueue("tests.fail", max_attempts=2)
+
+        jobs.run(jobs.claim("w", 1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(jobs.claim("w", 1), [])  # バックオフ中は取得されない
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        jobs.run(jobs.claim("w", 1)[0])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.Status.FAILED)
+        self.assertIn("RuntimeError: boom", job.last_error)
+
+    def test_enqueue_unknown_task_raises(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue("tests.unknown")
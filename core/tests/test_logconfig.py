@@ -0,0 +1,74 @@
+# キュー経由のファイルログ出力のテスト
+
+import json
+import logging
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+from schoolcomms.logconfig import QueueFileHandler, JsonFormatter, InfoSampleFilter
+
+
+class QueueFileHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "app.log")
+        self.logger = logging.getLogger("core.tests.queue_file")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        for h in list(self.logger.handlers):
+            self.logger.removeHandler(h)
+            h.close()
+        self.tmpdir.cleanup()
+
+    # バックグラウンドスレッド経由でJSON形式（例外含む）が書き込まれる
+    def test_writes_json_lines_via_listener(self):
+        handler = QueueFileHandler(self.path)
+        handler.setFormatter(JsonFormatter())
+        self.logger.addHandler(handler)
+
+        self.logger.info("hello %s", "world")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            self.logger.exception("failed")
+        handler.flush()
+
+        with open(self.path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(rows[0]["message"], "hello world")
+        self.assertEqual(rows[1]["level"], "ERROR")
+        self.assertIn("ValueError: boom", rows[1]["exc"])
+
+    # サンプリング率0ではINFOは捨てられ、WARNINGは残る
+    def test_info_sampling(self):
+        handler = QueueFileHandler(self.path)
+        handler.setFormatter(logging.Formatter("{levelname} {message}", style="{"))
+        handler.addFilter(InfoSampleFilter(rate=0.0))
+        self.logger.addHandler(handler)
+
+        self.logger.info("dropped")
+        self.logger.warning("kept")
+        handler.flush()
+
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read().strip(), "WARNING kept")
+
+    # 外部ローテーション時は、ファイルが入れ替えられたら開き直して新しいファイルに書く
+    def test_external_rotation_reopens_file(self):
+        handler = QueueFileHandler(self.path, external_rotation=True)
+        handler.setFormatter(logging.Formatter("{message}", style="{"))
+        self.logger.addHandler(handler)
+
+        self.logger.warning("before")
+        handler.flush()
+        os.rename(self.path, self.path + ".1")  # logrotate によるローテーション
+        self.logger.warning("after")
+        handler.flush()
+
+        with open(self.path + ".1", encoding="utf-8") as f:
+            self.assertEqual(f.read().strip(), "before")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read().strip(), "after")
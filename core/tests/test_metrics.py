@@ -0,0 +1,57 @@
+# メトリクス出力・レディネスチェックのテスト
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core import metrics
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    # リクエスト後にビュー名ラベル付きでカウンタ・ヒストグラムが出力される
+    def test_metrics_exposes_request_counters(self):
+        self.client.get(reverse("health"))
+        res = self.client.get(reverse("metrics"))
+        self.assertEqual(res.status_code, 200)
+        body = res.content.decode()
+        self.assertIn('schoolcomms_http_requests_total{method="GET",status="200",view="health"} 1', body)
+        self.assertIn('schoolcomms_http_request_duration_seconds_count{view="health"} 1', body)
+        self.assertIn("# TYPE schoolcomms_entry_submissions_total counter", body)
+
+    # DBクエリ数はDBエイリアス別、セッションのキャッシュ参照はヒット/ミス別に数える
+    @override_settings(SESSION_ENGINE="core.sessions")
+    def test_db_queries_by_alias_and_session_cache_hits(self):
+        user = User.objects.create_user(username="u1", password="x")
+        self.client.force_login(user)
+        self.client.get(reverse("api:me"), secure=True)
+        self.client.get(reverse("api:me"), secure=True)
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('schoolcomms_cache_requests_total{cache="session",result="hit"}', body)
+        self.assertIn('schoolcomms_db_queries_total{db="default",view="api:me"}', body)
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_metrics_requires_token_when_configured(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        res = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secret")
+        self.assertEqual(res.status_code, 200)
+
+
+class ReadinessTests(TestCase):
+    databases = "__all__"
+
+    def test_ready_ok(self):
+        res = self.client.get(reverse("readiness"))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()["status"], "ok")
+        # 学校専用DB・レプリカも含め、設定済みのDBをすべて確認する
+        self.assertEqual(set(res.json()["databases"]), set(connections))
+
+    # DB往復が閾値を超えたら degraded（503）
+    @override_settings(READINESS_DB_THRESHOLD_MS=-1)
+    def test_ready_degraded_above_threshold(self):
+        res = self.client.get(reverse("readiness"))
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res.json()["status"], "degraded")
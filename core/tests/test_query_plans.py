@@ -0,0 +1,145 @@
+# 主要なクエリの実行計画（EXPLAIN QUERY PLAN）のテスト
+#
+# 画面・管理画面を実際に表示して発行された SELECT を記録し、それぞれの実行計画に
+# 全件走査（SCAN <テーブル>。インデックスを端から読むだけの SCAN ... USING INDEX も含む）がないことを確認する。
+
+import re
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.admin import EntryAdmin
+from core.models import School, Grade, ClassRoom, Student, Entry, calc_prev_schoolday
+
+# 行数が学校の規模に比例しない小さな表（全件読んでも問題ない）
+SMALL_TABLES = {"core_school", "core_grade", "core_classroom", "auth_group", "core_alertkeyword", "django_content_type"}
+# 管理画面の一覧が総件数の表示に使う、条件なしの COUNT(*)（全件を数える以外の方法がないため対象外）
+WHOLE_TABLE_COUNT = re.compile(r'^SELECT COUNT\(\*\) AS "__count" FROM "\w+"$')
+
+
+def _scanned_table(detail, limited=False):
+    """「SCAN <テーブル>」ならテーブル名、それ以外は None
+
+    「SCAN t USING (COVERING) INDEX ...」もインデックス全体を端から読むだけなので全件走査として扱い、
+    インデックスで範囲を絞る「SEARCH t USING ...」だけを許す。ただし limited（LIMIT 付きで、全体の並べ替えを
+    せずインデックスの順序で読んでいる）なら、先頭から LIMIT 件で打ち切るページ送りなので許す。
+    """
+    words = detail.split()
+    if len(words) < 2 or words[0] != "SCAN" or words[1] in ("CONSTANT", "SUBQUERY"):
+        return None
+    if limited and "USING" in words:
+        return None
+    return words[1]
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+        cls.admin = User.objects.create_superuser(username="admin1", password="x")
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.s1 = User.objects.create_user(username="stu01", password="x")
+        cls.s1.groups.add(Group.objects.get(name="STUDENT"))
+        cls.student = Student.objects.create(user=cls.s1, class_room=c1, student_no="1")
+        cls.entry = Entry.objects.create(student=cls.student, target_date=calc_prev_schoolday(), content="ok")
+
+    def _full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        # 「USE TEMP B-TREE FOR RIGHT PART OF ORDER BY」は先頭の列の順に読みながらの部分的な並べ替えなので打ち切れる
+        limited = " LIMIT " in sql and "USE TEMP B-TREE FOR ORDER BY" not in details
+        scans = [_scanned_table(d, limited) for d in details]
+        return [t for t in scans if t and t not in SMALL_TABLES], details
+
+    def assertNoFullScan(self, user, url, method="get"):
+        """url の表示で発行された全 SELECT に全件走査がないことを確認し、実行計画の一覧を返す"""
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method)(url, secure=True)
+        self.assertIn(res.status_code, (200, 302, 304))
+        selects = [q["sql"] for q in ctx.captured_queries
+                   if q["sql"].startswith("SELECT") and not WHOLE_TABLE_COUNT.match(q["sql"])]
+        self.assertTrue(selects)
+        plans = []
+        for sql in selects:
+            scans, details = self._full_scans(sql)
+            self.assertEqual(scans, [], f"{url}: 全件走査 {scans}\n{sql}\n" + "\n".join(details))
+            plans.extend(details)
+        return plans
+
+    def test_student_pages(self):
+        self.assertNoFullScan(self.s1, reverse("student_entries"))
+        self.assertNoFullScan(self.s1, reverse("student_entry_new"))
+
+    # 本日分は (target_date, student)、ETag の MAX(updated_at) は (student, updated_at) で引く
+    def test_teacher_dashboard(self):
+        url = reverse("teacher_dashboard")
+        plans = "\n".join(self.assertNoFullScan(self.teacher, url))
+        self.assertIn("idx_entry_date_student", plans)
+        self.assertIn("COVERING INDEX idx_entry_stu_updated", plans)
+        self.assertNoFullScan(self.teacher, f"{url}?sid={self.student.pk}")
+        self.assertNoFullScan(self.teacher, f"{url}?q=ok")
+
+    # 未読の絞り込みは未読のみの部分インデックス（idx_entry_unread）で引く
+    # （既読が大半の実データに近い分布で analyze_db により統計情報を作った状態）
+    def test_unread_queries_use_partial_index(self):
+        users = User.objects.bulk_create([User(username=f"stu{i:02d}x") for i in range(20)])
+        students = Student.objects.bulk_create(
+            [Student(user=u, class_room=self.student.class_room, student_no=str(i + 2)) for i, u in enumerate(users)])
+        now = timezone.now()
+        Entry.objects.bulk_create([
+            Entry(student=s, target_date=date(2025, 4, 1) + timedelta(days=d), content="ok",
+                  read_at=None if d >= 48 else now)
+            for s in students for d in range(50)
+        ])
+        call_command("analyze_db", stdout=StringIO())
+        cache.clear()  # bulk_create はシグナルを送らないため担当生徒のキャッシュを作り直させる
+
+        plans = "\n".join(self.assertNoFullScan(self.teacher, reverse("api:entries") + "?unread=1"))
+        self.assertIn("idx_entry_unread", plans)
+        ids = [s.pk for s in students]
+        sql, params = (Entry.objects.filter(student_id__in=ids, read_at__isnull=True)
+                       .order_by("-target_date", "-id").values_list("id", flat=True).query.sql_with_params())
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            details = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("idx_entry_unread", details)
+
+    # 既読にする操作（権限確認・条件付き UPDATE 後の再表示前）も全件走査しない
+    def test_mark_read(self):
+        self.assertNoFullScan(self.teacher, reverse("mark_read", args=[self.entry.pk]), method="post")
+
+    # 一覧は1ページ分（LIMIT）だけを並び順のインデックスから読む
+    def test_admin_entry_pages(self):
+        Entry.objects.create(student=self.student, target_date=calc_prev_schoolday() - timedelta(days=7), content="ok")
+        with mock.patch.object(EntryAdmin, "list_per_page", 1):
+            self.assertNoFullScan(self.admin, reverse("admin:core_entry_changelist"))
+            self.assertNoFullScan(self.admin, reverse("admin:core_entry_changelist")
+                                  + f"?student__class_room__id__exact={self.student.class_room_id}")
+        self.assertNoFullScan(self.admin, reverse("admin:core_entry_change", args=[self.entry.pk]))
+
+    # 管理画面の生徒・ユーザー検索（一覧の ?q= とオートコンプリート）は検索キー・生徒番号のインデックスで引く
+    def test_admin_search_pages(self):
+        for q in ("stu", "1", "ｓｔｕ"):
+            self.assertNoFullScan(self.admin, reverse("admin:core_student_changelist") + f"?q={q}")
+            self.assertNoFullScan(self.admin, reverse("admin:auth_user_changelist") + f"?q={q}")
+        autocomplete = reverse("admin:autocomplete")
+        self.assertNoFullScan(
+            self.admin, f"{autocomplete}?app_label=core&model_name=entry&field_name=student&term=stu")
+        self.assertNoFullScan(
+            self.admin, f"{autocomplete}?app_label=core&model_name=student&field_name=user&term=stu")
@@ -0,0 +1,126 @@
+# 読み取りレプリカ振り分けのテスト
+
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core import replica
+from core.conditional import bump_students
+from core.models import School, Grade, ClassRoom, Student, Entry, calc_prev_schoolday
+
+
+@override_settings(REPLICAS={"default": "replica"}, REPLICA_MAX_LAG_SECONDS=60)
+class ChooseReplicaTests(SimpleTestCase):
+    def setUp(self):
+        self.rf = RequestFactory()
+
+    def test_fresh_replica_is_used_for_get(self):
+        with mock.patch.object(replica, "replica_age", return_value=5):
+            self.assertEqual(replica.choose_replica(self.rf.get("/")), "replica")
+
+    # 同期が古い場合はプライマリ
+    def test_stale_replica_falls_back_to_primary(self):
+        with mock.patch.object(replica, "replica_age", return_value=120):
+            self.assertIsNone(replica.choose_replica(self.rf.get("/")))
+
+    # 書き込み直後（固定クッキーあり）や POST はプライマリ
+    def test_pinned_or_write_request_uses_primary(self):
+        pinned = self.rf.get("/")
+        pinned.COOKIES[replica.PIN_COOKIE] = "1"
+        with mock.patch.object(replica, "replica_age", return_value=5):
+            self.assertIsNone(replica.choose_replica(pinned))
+            self.assertIsNone(replica.choose_replica(self.rf.post("/")))
+
+    def test_pin_cookie_is_set_after_post(self):
+        mw = replica.ReplicaPinMiddleware(lambda request: HttpResponse("ok"))
+        self.assertIn(replica.PIN_COOKIE, mw(self.rf.post("/")).cookies)
+        self.assertNotIn(replica.PIN_COOKIE, mw(self.rf.get("/")).cookies)
+
+    # レプリカから読んだインスタンスの保存はプライマリへ
+    def test_router_writes_replica_instances_to_primary(self):
+        obj = mock.Mock()
+        obj._state.db = "replica"
+        self.assertEqual(replica.ReplicaRouter().db_for_write(object, instance=obj), "default")
+
+
+# レプリカ用のエイリアス（replica_test）を使った結合テスト
+@override_settings(REPLICAS={"default": "replica_test"}, REPLICA_MAX_LAG_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    databases = {"default", "replica_test"}
+
+    @classmethod
+    def setUpTestData(cls):
+        group = Group.objects.create(name="STUDENT")
+        school = School.objects.create(code="default", name="テスト校")
+        teacher = User.objects.create_user(username="teacher1", password="x")
+        grade = Grade.objects.create(school=school, name="1年", year=2025)
+        room = ClassRoom.objects.create(name="1組", grade=grade, homeroom_teacher=teacher)
+        cls.user = User.objects.create_user(username="stu01", password="x")
+        cls.user.groups.add(group)
+        cls.student = Student.objects.create(user=cls.user, class_room=room, student_no="1")
+        # sync_replica 相当：同じ行をレプリカにも作る
+        for obj in (group, school, teacher, grade, room, cls.user, cls.student):
+            obj.save(using="replica_test", force_insert=True)
+        User.groups.through.objects.using("replica_test").create(user_id=cls.user.pk, group_id=group.pk)
+        cls.tdate = calc_prev_schoolday()
+        Entry.objects.using("replica_test").create(student_id=cls.student.pk, target_date=cls.tdate, content="レプリカ")
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def _contents(self):
+        res = self.client.get(reverse("api:entries"), {"fields": "content"}, secure=True)
+        self.assertEqual(res.status_code, 200)
+        return [e["content"] for e in res.json()["items"]]
+
+    # 同期が新しければ GET はレプリカから読み、書き込み後は固定クッキーでプライマリから読む
+    def test_get_reads_replica_until_write_pins_primary(self):
+        with mock.patch.object(replica, "replica_age", return_value=1):
+            self.assertEqual(self._contents(), ["レプリカ"])
+
+            res = self.client.post(reverse("api:today"), json.dumps({"content": "プライマリ"}),
+                                   content_type="application/json", secure=True)
+            self.assertEqual(res.status_code, 201)
+            self.assertIn(replica.PIN_COOKIE, res.cookies)
+            self.assertFalse(Entry.objects.using("replica_test").filter(content="プライマリ").exists())
+
+            self.assertEqual(self._contents(), ["プライマリ"])
+
+    # 版数の更新だけでレプリカが古い間の画面は、同期後の再検証で 304 にならず作り直される
+    def test_stale_replica_page_is_revalidated_after_sync(self):
+        # 同期済みの状態：古い提出分と最新の提出分が両方のDBにある
+        Entry.objects.using("replica_test").all().delete()
+        old = Entry.objects.create(student=self.student, target_date=self.tdate - timedelta(days=7), content="古い")
+        old.save(using="replica_test", force_insert=True)
+        new = Entry.objects.create(student=self.student, target_date=self.tdate, content="最新")
+        new.save(using="replica_test", force_insert=True)
+
+        # プライマリで古い分を削除（MAX(updated_at) は変わらず、版数だけ進む）
+        Entry.objects.filter(pk=old.pk).delete()
+        bump_students([self.student.pk])
+
+        with mock.patch.object(replica, "replica_age", return_value=1), \
+                mock.patch.object(replica, "replica_synced_at", return_value=1000.0):
+            res = self.client.get(reverse("api:entries"), {"fields": "content"}, secure=True)
+            # 同期されないまま再検証すれば 304（CSRFクッキーの発行でETagが変わった分もここで揃える）
+            res = self.client.get(reverse("api:entries"), {"fields": "content"}, secure=True)
+            self.assertEqual(self.client.get(reverse("api:entries"), {"fields": "content"}, secure=True,
+                                             HTTP_IF_NONE_MATCH=res["ETag"]).status_code, 304)
+        self.assertEqual(sorted(e["content"] for e in res.json()["items"]), ["古い", "最新"])
+
+        # sync_replica 相当：レプリカにも削除を反映して同期時刻が進む（ファイルのコピーなのでシグナルは出ない）
+        with connections["replica_test"].cursor() as cursor:
+            cursor.execute("DELETE FROM core_entry WHERE id = %s", [old.pk])
+        with mock.patch.object(replica, "replica_age", return_value=1), \
+                mock.patch.object(replica, "replica_synced_at", return_value=2000.0):
+            res = self.client.get(reverse("api:entries"), {"fields": "content"}, secure=True,
+                                  HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([e["content"] for e in res.json()["items"]], ["最新"])
@@ -0,0 +1,80 @@
+# 週次レポート（build_reports）のテスト
+
+import tempfile
+from datetime import date
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.test import TestCase
+from core import reports
+from core.models import School, Grade, ClassRoom, Student, Entry
+
+
+class BuildReportsTests(TestCase):
+    # 2025-06-09(月)〜13(金)。祝日はない週
+    MONDAY = date(2025, 6, 9)
+
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.school = School.objects.create(code="default", name="テスト校")
+        grade = Grade.objects.create(school=cls.school, name="1年", year=2025)
+        cls.classes = []
+        for c in range(1, 3):
+            teacher = User.objects.create_user(username=f"teacher{c}", password="x", last_name=f"担任{c}")
+            class_room = ClassRoom.objects.create(name=f"{c}組", grade=grade, homeroom_teacher=teacher)
+            cls.classes.append(class_room)
+            for no in range(1, 3):
+                user = User.objects.create_user(username=f"stu{c}{no}", password="x")
+                Student.objects.create(user=user, class_room=class_room, student_no=str(no))
+
+        # 1組の1番は月〜木に提出（金曜は未提出）、2番は月曜だけ提出
+        first, second = Student.objects.filter(class_room=cls.classes[0]).order_by("student_no")
+        for i in range(4):
+            Entry.objects.create(student=first, target_date=cls.MONDAY.replace(day=9 + i),
+                                 content="ok", condition=4, mental=2 + i % 2)
+        Entry.objects.create(student=second, target_date=cls.MONDAY, content="ok", condition=2, mental=2)
+
+    # 対象週のデータはクラス・生徒・連絡帳の3回のクエリで集める
+    def test_collect_uses_three_queries(self):
+        days = reports.week_days(self.MONDAY)
+        with self.assertNumQueries(3):
+            classes = reports.collect(self.school, days, "default")
+        self.assertEqual([c["name"] for c in classes], ["1組", "2組"])
+        self.assertEqual(len(classes[0]["students"][0]["entries"]), 4)
+
+    def test_summarize(self):
+        days = reports.week_days(self.MONDAY)
+        summary = reports.summarize(reports.collect(self.school, days, "default")[0])
+        self.assertEqual(summary["submitted"], 5)
+        self.assertEqual(summary["missing"], 5)
+        self.assertEqual(summary["rate"], 50.0)
+        self.assertEqual(summary["daily"], [2, 1, 1, 1, 0])
+        first = summary["rows"][0]
+        self.assertEqual(first["missing"], [date(2025, 6, 13)])
+        self.assertEqual(first["condition_avg"], 4)
+        self.assertEqual(first["mental_avg"], 2.5)
+        self.assertEqual(summary["condition_avg"], 3.6)
+
+    # 祝日は登校日から除く（2025-07-21 は海の日）
+    def test_week_days_skip_holidays(self):
+        self.assertEqual(reports.week_days(date(2025, 7, 23))[0], date(2025, 7, 22))
+
+    # プロセスプールで描画し、クラスごとの HTML と一覧を書き出す
+    def test_command_writes_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = StringIO()
+            call_command("build_reports", "--week", "2025-06-11", "--out", tmp, "--workers", "2", stdout=out)
+            week_dir = Path(tmp, "all", "2025-06-09")
+            self.assertIn("2クラス", out.getvalue())
+            self.assertEqual(sorted(p.name for p in week_dir.iterdir()),
+                             sorted(["index.html"] + [f"class-{c.id}.html" for c in self.classes]))
+            html = (week_dir / f"class-{self.classes[0].id}.html").read_text(encoding="utf-8")
+            self.assertIn("提出率 50.0%", html)
+            self.assertIn("未提出", html)
+            index = (week_dir / "index.html").read_text(encoding="utf-8")
+            self.assertIn(f'href="class-{self.classes[1].id}.html"', index)
+            self.assertIn("担任2", index)
@@ -0,0 +1,80 @@
+# 早期警戒スコアのテスト
+
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth.models import Group, User
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from core import risk
+from core.models import School, Grade, ClassRoom, Student, Entry, RiskScore, calc_prev_schoolday
+
+
+class ScoreTests(SimpleTestCase):
+    # 「ふつう」から落ち込みへ下降する生徒は、安定した生徒より高スコアになる
+    def test_declining_student_scores_higher(self):
+        stable = [3] * 10
+        declining = [3, 3, 3, 3, 3, 2, 2, 2, 1, 1]
+        mental = np.array([stable, declining], dtype=float)
+        result = risk.score(np.full_like(mental, 3), mental)
+        self.assertEqual(result["score"][0], 0)
+        self.assertGreater(result["score"][1], 30)
+        self.assertLess(result["mental_slope"][1], 0)
+
+    # 末尾の連続未提出日数を数え、未提出だけの行でもエラーにならない
+    def test_missing_streak(self):
+        condition = np.array([[3, 3, np.nan, np.nan], [np.nan] * 4])
+        result = risk.score(condition, condition.copy())
+        self.assertEqual(list(result["missing_streak"]), [2, 4])
+        self.assertTrue(np.isnan(result["mental_mean"][1]))
+
+
+class ComputeRiskTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+        cls.teacher = User.objects.create_user(username="teacher1", password="x")
+        cls.teacher.groups.add(Group.objects.get(name="TEACHER"))
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.teacher)
+        cls.students = []
+        for no in range(1, 3):
+            user = User.objects.create_user(username=f"stu0{no}", password="x")
+            cls.students.append(Student.objects.create(user=user, class_room=c1, student_no=str(no)))
+
+        # 1人目は毎日「ふつう」、2人目は落ち込んでいく
+        cls.days = risk.school_days(calc_prev_schoolday(), 10)
+        for i, d in enumerate(cls.days):
+            Entry.objects.create(student=cls.students[0], target_date=d, content="ok")
+            Entry.objects.create(student=cls.students[1], target_date=d, content="…",
+                                 mental=max(1, 3 - i // 3))
+
+    # 1回のクエリで行列を作り、生徒・日付の位置に値が入る
+    def test_load_matrix_places_values(self):
+        ids = [s.id for s in reversed(self.students)]
+        with self.assertNumQueries(1):
+            condition, mental = risk.load_matrix(ids, self.days)
+        self.assertEqual(condition.shape, (2, 10))
+        self.assertEqual(mental[0, -1], 1)
+        self.assertEqual(mental[1, -1], 3)
+
+    # コマンドでスコアが保存され、ダッシュボードはスコアの高い順に並ぶ
+    def test_command_writes_scores_and_dashboard_sorts(self):
+        call_command("compute_risk", stdout=StringIO())
+        self.assertEqual(RiskScore.objects.count(), 2)
+        self.assertGreater(self.students[1].risk.score, RiskScore.objects.get(student=self.students[0]).score)
+
+        self.client.force_login(self.teacher)
+        res = self.client.get(reverse("teacher_dashboard"), secure=True)
+        self.assertEqual([e.student_id for e in res.context["entries_today"]],
+                         [self.students[1].id, self.students[0].id])
+
+    # 存在しない学校コードは全生徒を対象にせずエラーにする
+    def test_unknown_school_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command("compute_risk", school="nope", stdout=StringIO())
+        self.assertFalse(RiskScore.objects.exists())
@@ -0,0 +1,106 @@
+# 管理画面のユーザー・生徒検索（core.search / UserSearchKey）のテスト
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.admin import DebouncedAutocompleteSelect
+from core.models import School, Grade, ClassRoom, Student, Entry, UserSearchKey
+from core.search import normalize_key, search_keys, search_user_ids
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="x")
+        cls.tanaka = User.objects.create_user(username="tanaka", password="x", last_name="タナカ", first_name="ハナコ")
+        cls.tanabe = User.objects.create_user(username="tanabe", password="x", last_name="田辺", first_name="一郎")
+        cls.tana = User.objects.create_user(username="tana", password="x", last_name="棚", first_name="太郎")
+
+        school = School.objects.create(code="default", name="テスト校")
+        g1 = Grade.objects.create(school=school, name="1年", year=2025)
+        c1 = ClassRoom.objects.create(name="1組", grade=g1, homeroom_teacher=cls.admin)
+        for i, user in enumerate([cls.tanaka, cls.tanabe, cls.tana]):
+            Student.objects.create(user=user, class_room=c1, student_no=str(i + 1))
+
+    # 全角・カタカナ・大文字は同じキーになる
+    def test_normalize(self):
+        self.assertEqual(normalize_key("ＴＡＮＡＫＡ"), "tanaka")
+        self.assertEqual(normalize_key("タナカ ハナコ"), "たなかはなこ")
+        self.assertEqual(search_keys("tanaka", "タナカ", "ハナコ"),
+                         [("tanaka", UserSearchKey.Kind.USERNAME),
+                          ("たなかはなこ", UserSearchKey.Kind.FULL_NAME),
+                          ("たなか", UserSearchKey.Kind.LAST_NAME),
+                          ("はなこ", UserSearchKey.Kind.FIRST_NAME),
+                          ("はなこたなか", UserSearchKey.Kind.FULL_NAME_REVERSED)])
+
+    # 前方一致で、完全一致 → 種類 → 短いキーの順
+    def test_search_ranking(self):
+        self.assertEqual(search_user_ids("tana"), [self.tana.pk, self.tanaka.pk, self.tanabe.pk])
+        self.assertEqual(search_user_ids("たなか"), [self.tanaka.pk])
+        self.assertEqual(search_user_ids("ﾀﾅｶ ﾊ"), [self.tanaka.pk])
+        self.assertEqual(search_user_ids("tana", limit=1), [self.tana.pk])
+        self.assertEqual(search_user_ids("  "), [])
+
+    # 氏名の変更は保存時に検索キーへ反映される
+    def test_reindex_on_save(self):
+        self.tanabe.last_name = "鈴木"
+        self.tanabe.save()
+        self.assertEqual(search_user_ids("田辺"), [])
+        self.assertEqual(search_user_ids("鈴木"), [self.tanabe.pk])
+
+    # 前方一致の検索はインデックスだけで完結する（auth_user を走査しない）
+    def test_query_plan_uses_index(self):
+        sql, params = (UserSearchKey.objects.filter(key__gte="tana", key__lt="tana\U0010ffff")
+                       .order_by("key").values_list("user_id", "kind", "key")[:100].query.sql_with_params())
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(row[-1] for row in cursor.fetchall())
+        self.assertIn("COVERING INDEX idx_usersearchkey_key", plan)
+
+    # オートコンプリートは関連度順・上限件数で返す
+    @override_settings(ADMIN_AUTOCOMPLETE_LIMIT=2)
+    def test_admin_autocomplete(self):
+        self.client.force_login(self.admin)
+        res = self.client.get(reverse("admin:autocomplete"), {
+            "app_label": "core", "model_name": "entry", "field_name": "student", "term": "ＴＡＮＡ"}, secure=True)
+        self.assertEqual(res.status_code, 200)
+        ids = [int(r["id"]) for r in res.json()["results"]]
+        students = dict(Student.objects.values_list("user_id", "pk"))
+        self.assertEqual(ids, [students[self.tana.pk], students[self.tanaka.pk]])
+
+    # 一覧の検索：氏名・生徒番号とも前方一致（全角数字も可。番号の途中の数字では見つからない）
+    def test_admin_changelist_search(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin:core_student_changelist")
+        res = self.client.get(url, {"q": "田辺"}, secure=True)
+        self.assertEqual(res.context["cl"].result_count, 1)
+        res = self.client.get(url, {"q": "３"}, secure=True)
+        self.assertEqual([s.user_id for s in res.context["cl"].result_list], [self.tana.pk])
+        sato = User.objects.create_user(username="sato", password="x")
+        Student.objects.create(user=sato, class_room=Student.objects.first().class_room, student_no="12")
+        res = self.client.get(url, {"q": "1"}, secure=True)
+        self.assertEqual(sorted(s.user_id for s in res.context["cl"].result_list), [self.tanaka.pk, sato.pk])
+        res = self.client.get(url, {"q": "2"}, secure=True)
+        self.assertEqual([s.user_id for s in res.context["cl"].result_list], [self.tanabe.pk])
+        res = self.client.get(reverse("admin:auth_user_changelist"), {"q": "tana"}, secure=True)
+        self.assertEqual(res.context["cl"].result_count, 3)
+
+    # 一覧の検索は件数を制限せず、ユーザー一覧ではメールアドレスでも探せる
+    @override_settings(ADMIN_AUTOCOMPLETE_LIMIT=1)
+    def test_admin_user_changelist_search_is_uncapped_and_matches_email(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin:auth_user_changelist")
+        res = self.client.get(url, {"q": "ta"}, secure=True)
+        self.assertEqual(res.context["cl"].result_count, 3)
+        User.objects.filter(pk=self.tanabe.pk).update(email="Ichiro.T@example.com")
+        res = self.client.get(url, {"q": "ichiro.t@example.com"}, secure=True)
+        self.assertEqual([u.pk for u in res.context["cl"].result_list], [self.tanabe.pk])
+
+    @override_settings(ADMIN_AUTOCOMPLETE_DELAY_MS=250, ADMIN_AUTOCOMPLETE_MIN_CHARS=2)
+    def test_widget_debounce(self):
+        from django.contrib import admin
+        widget = DebouncedAutocompleteSelect(Entry._meta.get_field("student"), admin.site)
+        attrs = widget.build_attrs({})
+        self.assertEqual(attrs["data-ajax--delay"], 250)
+        self.assertEqual(attrs["data-minimum-input-length"], 2)
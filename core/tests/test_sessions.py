@@ -0,0 +1,25 @@
+# 期限切れセッション削除コマンドのテスト
+
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+
+class PurgeSessionsTests(TestCase):
+    # チャンク分割しても期限切れのみ全件削除され、有効なセッションは残る
+    def test_purge_expired_sessions_in_chunks(self):
+        past = timezone.now() - timedelta(days=1)
+        future = timezone.now() + timedelta(days=1)
+        for i in range(5):
+            Session.objects.create(session_key=f"old{i:029d}", session_data="", expire_date=past)
+        Session.objects.create(session_key="live" + "0" * 28, session_data="", expire_date=future)
+
+        out = StringIO()
+        call_command("purge_sessions", chunk_size=2, sleep=0, stdout=out)
+
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["live" + "0" * 28])
+        self.assertIn("5件", out.getvalue())
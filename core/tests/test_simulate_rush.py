@@ -0,0 +1,24 @@
+# 負荷シミュレーション（simulate_rush）の補助関数のテスト
+
+import random
+
+from django.test import SimpleTestCase
+from core.management.commands.simulate_rush import _percentile, arrival_offsets
+
+
+class SimulateRushTests(SimpleTestCase):
+    # 到着プロファイルごとの開始時刻
+    def test_arrival_profiles(self):
+        rng = random.Random(1)
+        self.assertEqual(arrival_offsets("flat", 3, 60, rng), [0.0, 0.0, 0.0])
+        self.assertEqual(arrival_offsets("linear", 4, 60, rng), [0.0, 15.0, 30.0, 45.0])
+        bell = arrival_offsets("bell", 1000, 60, rng)
+        self.assertTrue(all(0 <= t <= 60 for t in bell))
+        # 始業前（後半）に集中する
+        self.assertGreater(sum(t > 30 for t in bell), 600)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(_percentile(values, 50), 50)
+        self.assertEqual(_percentile(values, 99), 99)
+        self.assertEqual(_percentile([], 95), 0.0)
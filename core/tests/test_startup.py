@@ -0,0 +1,24 @@
+# 起動時のウォームアップ・起動時間計測のテスト
+
+from django.test import SimpleTestCase
+from core.management.commands.startup_report import parse_importtime
+from core.models import is_holiday
+from schoolcomms.warmup import warm_up
+
+
+class StartupTests(SimpleTestCase):
+    # ウォームアップ後は祝日判定がキャッシュから返る（DBには接続しない）
+    def test_warm_up_primes_calendar(self):
+        is_holiday.cache_clear()
+        timings = warm_up()
+        self.assertEqual(set(timings), {"urls", "templates", "calendar"})
+        self.assertGreater(is_holiday.cache_info().currsize, 700)
+
+    def test_parse_importtime(self):
+        stderr = "\n".join([
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   jpholiday.holiday",
+            "import time:       300 |        420 | jpholiday",
+        ])
+        self.assertEqual(parse_importtime(stderr),
+                         [(120, 120, "jpholiday.holiday", 1), (420, 300, "jpholiday", 0)])
@@ -0,0 +1,135 @@
+# 複数校（テナント）対応のテスト
+
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from core import metrics, tenancy
+from core.models import School, Grade, ClassRoom, Student, Entry, calc_prev_schoolday
+
+SCHOOLS = {"school-a": "default", "school-b": "default"}
+HOSTS = ["school-a.example.com", "school-b.example.com"]
+
+
+@override_settings(SCHOOLS=SCHOOLS, ALLOWED_HOSTS=HOSTS)
+class SchoolScopeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for g in ["ADMIN", "TEACHER", "STUDENT"]:
+            Group.objects.get_or_create(name=g)
+
+        # 2校を同一DBに作成（学年コードは学校ごとに一意であればよい）
+        cls.students = {}
+        for code in ["school-a", "school-b"]:
+            school = School.objects.create(code=code, name=code)
+            teacher = User.objects.create_user(username=f"{code}_t", password="x")
+            teacher.groups.add(Group.objects.get(name="TEACHER"))
+            stu = User.objects.create_user(username=f"{code}_s", password="x")
+            stu.groups.add(Group.objects.get(name="STUDENT"))
+            grade = Grade.objects.create(school=school, name="1年", year=1)
+            room = ClassRoom.objects.create(name="1組", grade=grade, homeroom_teacher=teacher)
+            cls.students[code] = Student.objects.create(user=stu, class_room=room, student_no="1")
+
+    def setUp(self):
+        tenancy._school_cache.clear()
+
+    def test_for_school_filters_by_school(self):
+        a = School.objects.get(code="school-a")
+        Entry.objects.create(student=self.students["school-a"], target_date=calc_prev_schoolday(), content="a")
+        Entry.objects.create(student=self.students["school-b"], target_date=calc_prev_schoolday(), content="b")
+        self.assertEqual(list(Entry.objects.for_school(a).values_list("content", flat=True)), ["a"])
+        self.assertEqual(Entry.objects.for_school(None).count(), 2)
+
+    # ホスト名で学校が決まり、他校の生徒はその学校の画面を使えない
+    def test_student_of_other_school_is_not_found(self):
+        self.client.force_login(self.students["school-b"].user)
+        res = self.client.get(reverse("student_entries"), secure=True, HTTP_HOST="school-a.example.com")
+        self.assertEqual(res.status_code, 404)
+        res = self.client.get(reverse("student_entries"), secure=True, HTTP_HOST="school-b.example.com")
+        self.assertEqual(res.status_code, 200)
+
+    def test_school_code_for_host(self):
+        self.assertEqual(tenancy.school_code_for_host("school-a.example.com:8000"), "school-a")
+        self.assertIsNone(tenancy.school_code_for_host("unknown.example.com"))
+
+    # School の変更・削除はホスト名 → School のキャッシュに直ちに反映される
+    def test_school_cache_is_cleared_on_change(self):
+        school = tenancy.get_school("school-a")
+        school.name = "改名後"
+        school.save()
+        self.assertEqual(tenancy.get_school("school-a").name, "改名後")
+        closed = School.objects.create(code="school-x", name="閉校")
+        self.assertEqual(tenancy.get_school("school-x"), closed)
+        closed.delete()
+        self.assertIsNone(tenancy.get_school("school-x"))
+
+
+# school-b は専用のDB（school_b）を使う
+@override_settings(SCHOOLS={"school-a": "default", "school-b": "school_b"}, ALLOWED_HOSTS=HOSTS)
+class SchoolDatabaseTests(TestCase):
+    databases = {"default", "school_b"}
+    host = {"HTTP_HOST": "school-b.example.com", "secure": True}
+
+    @classmethod
+    def setUpTestData(cls):
+        with tenancy.using_school("school-b"):
+            group = Group.objects.create(name="STUDENT")
+            school = School.objects.create(code="school-b", name="B校")
+            teacher = User.objects.create_user(username="b_t", password="x")
+            grade = Grade.objects.create(school=school, name="1年", year=1)
+            room = ClassRoom.objects.create(name="1組", grade=grade, homeroom_teacher=teacher)
+            stu = User.objects.create_user(username="b_s", password="x")
+            stu.groups.add(group)
+            cls.student = Student.objects.create(user=stu, class_room=room, student_no="1")
+
+    def setUp(self):
+        tenancy._school_cache.clear()
+        cache.clear()
+        metrics.reset()
+
+    def _post(self, name, data):
+        return self.client.post(reverse(name), json.dumps(data), content_type="application/json", **self.host)
+
+    # ログイン（セッション）・提出は学校のDBに書き込まれ、一覧はそのDBから読まれる
+    def test_writes_and_reads_use_school_database(self):
+        self.assertEqual(self.student._state.db, "school_b")
+        self.assertFalse(User.objects.using("default").filter(username="b_s").exists())
+
+        self.assertEqual(self._post("api:login", {"username": "b_s", "password": "x"}).status_code, 200)
+        self.assertTrue(Session.objects.using("school_b").exists())
+        self.assertFalse(Session.objects.using("default").exists())
+
+        self.assertEqual(self._post("api:today", {"content": "B校の提出"}).status_code, 201)
+        self.assertEqual(list(Entry.objects.using("school_b").values_list("content", flat=True)), ["B校の提出"])
+        self.assertFalse(Entry.objects.using("default").exists())
+
+        # 学校DBに直接書いた行が一覧に現れる（読み取りも学校DB）
+        Entry.objects.using("school_b").create(
+            student=self.student, target_date=calc_prev_schoolday() - timedelta(days=7), content="過去分")
+        res = self.client.get(reverse("api:entries"), {"fields": "content"}, **self.host)
+        self.assertEqual(sorted(e["content"] for e in res.json()["items"]), ["B校の提出", "過去分"])
+        self.assertIn('db="school_b"', metrics.render())
+
+        # 他校のホストでは、このDBのユーザーではログインできない
+        self.client.logout()
+        res = self.client.post(reverse("api:login"), json.dumps({"username": "b_s", "password": "x"}),
+                               content_type="application/json", HTTP_HOST="school-a.example.com", secure=True)
+        self.assertNotEqual(res.status_code, 200)
+
+    # 期限切れセッションは --school で指定した学校のDBから削除する
+    def test_purge_sessions_for_school(self):
+        past = timezone.now() - timedelta(days=1)
+        for db in ("default", "school_b"):
+            Session.objects.using(db).create(session_key=f"old{db:>29}", session_data="", expire_date=past)
+        call_command("purge_sessions", school="school-b", sleep=0, stdout=StringIO())
+        self.assertFalse(Session.objects.using("school_b").exists())
+        self.assertTrue(Session.objects.using("default").exists())
+        with self.assertRaises(CommandError):
+            call_command("purge_sessions", school="school-x", stdout=StringIO())
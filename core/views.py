@@ -1,18 +1,29 @@
 from datetime import date, timedelta
+import time
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, logout
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponseForbidden
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
 from django.db import models
 from django.db.models import Q
 from django.db.models.functions import Concat
 from django.contrib.auth.forms import AuthenticationForm
-from django.views.decorators.http import require_POST
-from django.db import transaction
+from django.views.decorators.http import require_POST, condition
+from django.views.decorators.cache import cache_control
+from django.db import transaction, connections, DatabaseError
+from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import never_cache
 from django.contrib import messages
 from django.urls import reverse
-from .models import Student, Entry, ClassRoom
+from .models import Student, Entry, EntryAlert
 from .models import calc_prev_schoolday
+from . import metrics, jobs
+from .access import request_access
+from .auth import LoginBusy, remember_device
+from .replica import read_from_replica
+from .conditional import student_etag, student_last_modified, teacher_etag, teacher_last_modified
 import logging
 
 def is_in(user, group_name: str) -> bool:
@@ -44,6 +55,8 @@ def custom_login(request):
             if form.is_valid():
                 user = form.get_user()
                 login(request, user)
+                # 「この端末を記憶する」なら毎朝の再ログイン（パスワード検証）を省けるようセッションを延長
+                remember_device(request, request.POST.get("remember"))
                 # 一元ルートへ集約
                 return redirect("home")
             else:
@@ -52,8 +65,14 @@ def custom_login(request):
             form = AuthenticationForm()
 
         # GET やエラー時もここで描画
-        return render(request, "registration/login.html", {"form": form}) 
+        return render(request, "registration/login.html", {
+            "form": form,
+            "remember_days": settings.REMEMBER_DEVICE_DAYS,
+        })
     
+    # パスワード検証の順番待ち超過は LoginBusyMiddleware が 503 にする（障害としては記録しない）
+    except LoginBusy:
+        raise
     # 本番環境時のExceptionのロギング処理
     except Exception as e:
         # ここで例外の詳細とスタックトレースをログに出す
@@ -84,12 +103,16 @@ def route_after_login(request):
     # 権限が付与されていないユーザーの場合
     return HttpResponseForbidden("権限がありません")
 
+# 条件付きGET：提出内容に変化がなければ 304 を返し、テンプレート描画と主要クエリを省略する
+# （private + no-cache で毎回再検証させる）
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=student_etag, last_modified_func=student_last_modified)
 def student_entry_new(request):
     if not is_in(request.user, "STUDENT"):
         return HttpResponseForbidden("学生のみ利用可")
 
-    student = get_object_or_404(Student, user=request.user)
+    student = get_object_or_404(Student.objects.for_school(request.school), user=request.user)
     tdate = calc_prev_schoolday()  
     # 曜日ラベル（0=月 ... 6=日）
     weekday = "月火水木金土日"[tdate.weekday()]
@@ -109,41 +132,14 @@ def student_entry_new(request):
         condition = _to_scale(request.POST.get("condition"))
         mental    = _to_scale(request.POST.get("mental"))
 
-        # 競合対策：最新状態でロックして取得（管理画面の操作と衝突しにくくする）
-        with transaction.atomic():
-            entry = (Entry.objects
-                     .select_for_update()
-                     .filter(student=student, target_date=tdate)
-                     .first())
-
-            if entry:
-                if entry.is_read:
-                    # 既読なら編集不可
-                    messages.info(request, "既読済みのため編集できません。")
-                else:
-                    # 未読（提出済）なら上書きOK
-                    entry.content = content
-                    entry.condition = condition
-                    entry.mental    = mental
-                    fields = ["content", "condition", "mental"]
-                    # statusを併用しているなら未読＝提出済みに同期しておく
-                    if hasattr(Entry, "Status"):
-                        entry.status = Entry.Status.SUBMITTED
-                        fields.append("status")
-                    entry.save(update_fields=fields)
-                    messages.success(request, "✅提出を更新しました。")
-            else:
-                # まだ当日（前登校日）分が無ければ新規作成
-                kwargs = dict(student=student, 
-                              target_date=tdate, 
-                              content=content,
-                              condition=condition,
-                              mental=mental,
-                              )
-                if hasattr(Entry, "Status"):
-                    kwargs["status"] = Entry.Status.SUBMITTED
-                Entry.objects.create(**kwargs)
-                messages.success(request, "✅提出が完了しました。")
+        _, result = Entry.submit(student, tdate, content, condition, mental)
+        if result == "locked":
+            # 既読なら編集不可
+            messages.info(request, "既読済みのため編集できません。")
+        elif result == "updated":
+            messages.success(request, "✅提出を更新しました。")
+        else:
+            messages.success(request, "✅提出が完了しました。")
 
         # PRG（Post→Redirect→Get）：二重送信防止＆最新状態で再描画
         return redirect(reverse("student_entry_new"))
@@ -162,35 +158,56 @@ def student_entry_new(request):
         "HOME_LABEL": "連絡帳履歴に移動",
     })
 
+# 読み取り専用の画面はレプリカから読む（ETag の計算も同じデータで行うため condition より外側。
+# ETag にはレプリカの同期時刻も入るため、同期前に返した画面は同期後の再検証で作り直される）
 @login_required
+@read_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=student_etag, last_modified_func=student_last_modified)
 def student_entries(request):
     if not is_in(request.user, "STUDENT"):
         return HttpResponseForbidden("学生のみ利用可")
-    student = get_object_or_404(Student, user=request.user)
+    student = get_object_or_404(Student.objects.for_school(request.school), user=request.user)
     entries = Entry.objects.filter(student=student).order_by("-target_date")
-    return render(request, "student_entries.html", {"entries": entries})
+    return render(request, "student_entries.html", {"entries": entries}, using=settings.LIST_TEMPLATE_ENGINE)
 
 @login_required
+@read_from_replica
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=teacher_etag, last_modified_func=teacher_last_modified)
 def teacher_dashboard(request):
     # 先生（担任）以外は利用不可
     if not is_in(request.user, "TEACHER"):
         return HttpResponseForbidden("担任のみ利用可")
 
-    # 担任に紐づくクラスの生徒のみ、本日提出分（前日の連絡帳）を表示する
-    classes = ClassRoom.objects.filter(homeroom_teacher=request.user)
+    # 担当クラス（担任・副担任・学年主任）の生徒のみ、本日提出分（前日の連絡帳）を表示する
+    access = request_access(request)
     tdate = calc_prev_schoolday()  # 例：月曜アクセス→金曜
 
-    students = Student.objects.filter(class_room__in=classes) \
+    students = Student.objects.filter(class_room_id__in=access.class_ids) \
                               .select_related("user", "class_room")
 
+    # 早期警戒スコア（compute_risk の夜間計算結果）の高い順に並べる
+    by_risk = models.F("student__risk__score").desc(nulls_last=True)
     entries_today = Entry.objects.filter(student__in=students, target_date=tdate) \
-                                 .select_related("student", "student__user", "student__class_room")
+                                 .select_related("student", "student__user", "student__class_room",
+                                                 "student__risk") \
+                                 .order_by(by_risk, "student_id")
+
+    # キーワード検知された未読の連絡帳（画面の先頭に表示）
+    flagged = Entry.objects.filter(student__in=students, read_at__isnull=True,
+                                   alerts__isnull=False).distinct() \
+                           .select_related("student", "student__user", "student__class_room") \
+                           .prefetch_related(models.Prefetch("alerts", queryset=EntryAlert.objects.order_by("id"))) \
+                           .order_by("-target_date", "-id")[:50]
 
     # entries_today の各エントリ(e)をキー化して提出/未提出の生徒を判定
     # by_student = {e.student_id: e for e in entries_today}
     # not_submitted = [s for s in students if s.id not in by_student]
     by_student = {e.student_id: e for e in entries_today}
-    not_submitted = [s for s in students if s.id not in by_student]
+    not_submitted = [s for s in students.select_related("risk")
+                     .order_by(models.F("risk__score").desc(nulls_last=True), "id")
+                     if s.id not in by_student]
 
     # 履歴ベースのクエリセット
     history = Entry.objects.filter(student__in=students) \
@@ -236,19 +253,65 @@ def teacher_dashboard(request):
 
     return render(request, "teacher_dashboard.html", {
         "tdate": tdate,
+        "flagged": flagged,
+        "risk_threshold": settings.RISK_ALERT_THRESHOLD,
         "entries_today": entries_today,
         "not_submitted": not_submitted,
         "history": history,
         "selected_student": selected_student,
-    })
+    }, using=settings.LIST_TEMPLATE_ENGINE)
 
 @login_required
 @require_POST
 def mark_read(request, entry_id: int):
     if not is_in(request.user, "TEACHER"):
         return HttpResponseForbidden("担任のみ利用可")
-    entry = get_object_or_404(Entry, pk=entry_id)
-    if entry.student.class_room.homeroom_teacher != request.user:
+    # 権限は担当生徒IDの集合で判定する（クラス・担任を辿る追加の問い合わせをしない）
+    entry = get_object_or_404(Entry.objects.only("id", "student_id", "read_at"), pk=entry_id)
+    if not request_access(request).can_view_student(entry.student_id):
         return HttpResponseForbidden("担当外の生徒です")
     entry.lock_as_read(request.user)
-    return redirect("teacher_dashboard")
\ No newline at end of file
+    return redirect("teacher_dashboard")
+
+# Prometheus 形式のメトリクス出力（METRICS_TOKEN 設定時は Bearer トークン必須）
+@csrf_exempt
+@never_cache
+def metrics_view(request):
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponseForbidden("forbidden")
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# レディネスチェック（全DBエイリアスの往復時間を計測し、閾値超過・エラー時は 503 を返してLBから外す）
+@csrf_exempt
+@never_cache
+def readiness(request):
+    threshold_ms = getattr(settings, "READINESS_DB_THRESHOLD_MS", 200)
+    timings = {}
+    # 学校専用DB・レプリカも含め、設定済みのDBをすべて確認する（どれか1つでも使えなければ外す）
+    for conn in connections.all():
+        started = time.perf_counter()
+        try:
+            with conn.cursor() as cursor:
+                # SELECT 1 だけではDBファイルに触れないため、実テーブルを読んでロック状態も検知する
+                cursor.execute("SELECT 1 FROM django_migrations LIMIT 1")
+                cursor.fetchone()
+        except DatabaseError as e:
+            logger.warning("readiness db check failed (%s): %s", conn.alias, e)
+            return JsonResponse({"status": "error", "alias": conn.alias, "db": str(e)}, status=503)
+        timings[conn.alias] = round((time.perf_counter() - started) * 1000, 2)
+    db_ms = max(timings.values())
+
+    status = "ok" if db_ms <= threshold_ms else "degraded"
+    return JsonResponse(
+        {"status": status, "db_ms": db_ms, "databases": timings, "threshold_ms": threshold_ms},
+        status=200 if status == "ok" else 503,
+    )
+
+# バックグラウンドジョブの状態確認（管理者のみ）
+@staff_member_required
+def job_status(request, job_id: int):
+    status = jobs.job_status(job_id)
+    if status is None:
+        return JsonResponse({"error": "not found"}, status=404)
+    return JsonResponse(status)
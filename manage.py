@@ -6,6 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    # テスト実行時はテスト用のDBエイリアス等を加えた設定を使う（--settings / DJANGO_SETTINGS_MODULE が優先）
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'schoolcomms.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'schoolcomms.settings')
     try:
         from django.core.management import execute_from_command_line
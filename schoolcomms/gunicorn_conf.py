@@ -0,0 +1,59 @@
+# gunicorn の本番設定
+#
+# 起動例: gunicorn -c python:schoolcomms.gunicorn_conf schoolcomms.wsgi
+#
+# ・preload_app でマスタープロセスが Django を1回だけ読み込み、warm_up() を済ませてから fork する
+#   （ワーカーごとに jpholiday・URLconf・テンプレートを読み直さない。メモリもコピーオンライトで共有）
+# ・max_requests + jitter でワーカーを少しずつ入れ替え、メモリ増加を防ぐ（全ワーカーが同時に再起動しない）
+# ・SQLite は書き込みが1本に直列化されるため、ワーカーを増やすよりスレッドで待ち時間を埋める
+
+import multiprocessing
+import os
+
+# 待ち受け（App Service は PORT / WEBSITES_PORT を渡す）
+bind = os.getenv("GUNICORN_BIND") or f"0.0.0.0:{os.getenv('PORT') or os.getenv('WEBSITES_PORT') or '8000'}"
+
+# ワーカー数・スレッド数（threads > 1 で gthread ワーカーになる）
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(multiprocessing.cpu_count() * 2 + 1, 4))))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# アプリの事前読み込み
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# ワーカーの入れ替え（jitter で再起動時刻をずらす）
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+# タイムアウト
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# TLS 終端のプロキシからの X-Forwarded-* を信頼する
+forwarded_allow_ips = os.getenv("GUNICORN_FORWARDED_ALLOW_IPS", "*")
+
+# アクセスログ（既定は出力しない。"-" で標準出力）
+accesslog = os.getenv("GUNICORN_ACCESSLOG") or None
+
+
+def _warm_up(log, where):
+    from django.db import connections
+    from schoolcomms.warmup import warm_up
+
+    timings = warm_up()
+    # fork 前に開いた接続をワーカーへ引き継がない
+    connections.close_all()
+    log.info("warm-up (%s): %s", where,
+             ", ".join(f"{name}={sec * 1000:.0f}ms" for name, sec in timings.items()))
+
+
+def when_ready(server):
+    # preload 時はマスターで一度だけ温めて、以降の fork に引き継ぐ
+    if server.cfg.preload_app:
+        _warm_up(server.log, "master")
+
+
+def post_worker_init(worker):
+    # preload しない場合はワーカーごとに温める
+    if not worker.cfg.preload_app:
+        _warm_up(worker.log, f"worker {worker.pid}")
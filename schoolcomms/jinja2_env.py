@@ -0,0 +1,48 @@
+# Jinja2 テンプレートの環境設定（一覧の多い画面の描画用。settings.LIST_TEMPLATE_ENGINE で切り替える）
+#
+# ・DTL 版と同じ表示になるよう、日付・切り詰め・URLエンコードなどのフィルタは Django のものをそのまま登録する
+# ・コンパイル済みテンプレートは Environment がプロセス内に保持する（DEBUG 以外では更新確認もしない）。
+#   JINJA2_BYTECODE_DIR を設定するとバイトコードをファイルにも保存し、ワーカーの再起動後も再コンパイルしない
+
+from datetime import datetime
+
+from django.conf import settings
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils import timezone
+from jinja2 import Environment, FileSystemBytecodeCache
+
+
+def url(name, *args, **kwargs):
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+def date(value, arg=None):
+    """DTL と同様に、aware な日時は現在のタイムゾーンに変換してから書式化する"""
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return defaultfilters.date(value, arg)
+
+
+def display_name(user):
+    """姓名（未登録ならユーザー名）"""
+    if user is None:
+        return ""
+    return f"{user.last_name}{user.first_name}" if (user.last_name or user.first_name) else user.username
+
+
+def environment(**options):
+    if settings.JINJA2_BYTECODE_DIR:
+        settings.JINJA2_BYTECODE_DIR.mkdir(parents=True, exist_ok=True)
+        options.setdefault("bytecode_cache", FileSystemBytecodeCache(str(settings.JINJA2_BYTECODE_DIR)))
+    env = Environment(**options)
+    env.globals.update(static=static, url=url)
+    env.filters.update(
+        date=date,
+        truncatechars=defaultfilters.truncatechars,
+        urlencode=defaultfilters.urlencode,
+        floatformat=defaultfilters.floatformat,
+        display_name=display_name,
+    )
+    return env
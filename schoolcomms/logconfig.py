@@ -0,0 +1,123 @@
+# ログ出力の補助クラス（settings.LOGGING から参照）
+#
+# ファイル出力はリクエスト処理スレッドで直接書き込まず、QueueHandler でキューに積んで
+# QueueListener のバックグラウンドスレッドが書き込む（ディスク遅延をリクエストに持ち込まない）。
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+
+class QueueFileHandler(logging.handlers.QueueHandler):
+    """キュー経由でローテーション付きファイルへ書き込むハンドラ
+
+    when を指定すると時間ベース（TimedRotatingFileHandler）、
+    指定しなければサイズベース（RotatingFileHandler）でローテーションする。
+    どちらもプロセスごとにファイル名を変更するため、複数プロセスで同じファイルに書く場合は
+    external_rotation=True とし、ローテーションは logrotate 等の外部に任せる
+    （WatchedFileHandler がファイルの入れ替えを検知して開き直す）。
+    キューが溢れた場合は呼び出し側を待たせずに破棄し、dropped に件数を数える。
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, when=None, queue_size=10000,
+                 external_rotation=False):
+        super().__init__(queue.Queue(queue_size))
+        if external_rotation:
+            self.target = logging.handlers.WatchedFileHandler(filename, encoding="utf-8", delay=True)
+        elif when:
+            self.target = logging.handlers.TimedRotatingFileHandler(
+                filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True)
+        else:
+            self.target = logging.handlers.RotatingFileHandler(
+                filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        # gunicorn の preload 後に fork されるとスレッドは引き継がれないため、プロセスごとに起動する
+        if self._pid == os.getpid():
+            return
+        with self.lock:
+            if self._pid == os.getpid():
+                return
+            if self.formatter is not None:
+                self.target.setFormatter(self.formatter)
+            self._listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=False)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def _stop(self):
+        if self._listener is not None and self._pid == os.getpid():
+            self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def prepare(self, record):
+        # 書式化は書き込みスレッド側の Formatter に任せ、ここではメッセージと例外文字列の確定のみ行う
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def emit(self, record):
+        self._ensure_listener()
+        super().emit(record)
+
+    def flush(self):
+        # キューに積まれた分を書き切ってからファイルをフラッシュする
+        if self._listener is not None and self._pid == os.getpid():
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        # 終了時は logging.shutdown() から呼ばれ、残りのキューを書き切ってから閉じる
+        self._stop()
+        self.target.close()
+        super().close()
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1JSONで出力するフォーマッタ（ログ収集基盤向け）"""
+
+    def format(self, record):
+        payload = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class InfoSampleFilter(logging.Filter):
+    """INFO 以下のログを rate の割合だけ通すフィルタ（WARNING 以上は常に通す）"""
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
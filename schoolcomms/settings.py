@@ -1,5 +1,7 @@
 from pathlib import Path
 import os
+
+from django.core.exceptions import ImproperlyConfigured
 """
 Django settings for schoolcomms project.
 
@@ -40,6 +42,8 @@ if not DEBUG:
     #本番用のセキュリティ設定
     SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
     SECURE_SSL_REDIRECT = True
+    # LB のヘルスチェック・メトリクス収集は内部から http で来るためリダイレクト対象外にする
+    SECURE_REDIRECT_EXEMPT = [r"^health/$", r"^ready/$", r"^metrics/$"]
     SESSION_COOKIE_SECURE = True
     CSRF_COOKIE_SECURE = True
     SECURE_HSTS_SECONDS = 31536000
@@ -60,13 +64,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.metrics.MetricsMiddleware",  # 全体の処理時間を計測するため先頭に置く
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    "core.tenancy.SchoolMiddleware",  # セッション・認証も学校DBを参照するため SessionMiddleware より前
+    "core.replica.ReplicaPinMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    "core.auth.LoginBusyMiddleware",  # パスワード検証の順番待ち超過を 503 にする
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -87,8 +95,26 @@ TEMPLATES = [
             ],
         },
     },
+    # 一覧の多い画面（担任ダッシュボード・提出履歴）の Jinja2 版（templates_jinja2/ 配下）
+    {
+        'BACKEND': 'django.template.backends.jinja2.Jinja2',
+        'DIRS': [BASE_DIR / "templates_jinja2"],
+        'APP_DIRS': False,
+        'OPTIONS': {
+            'environment': "schoolcomms.jinja2_env.environment",
+            'context_processors': [
+                'django.contrib.messages.context_processors.messages',
+                "core.context_processors.home_link",
+            ],
+        },
+    },
 ]
 
+# 一覧の多い画面を描画するテンプレートエンジン（"django" または "jinja2"）
+LIST_TEMPLATE_ENGINE = os.getenv("DJANGO_LIST_TEMPLATE_ENGINE", "django")
+# 設定すると Jinja2 のコンパイル結果（バイトコード）をこのディレクトリに保存する
+JINJA2_BYTECODE_DIR = Path(os.getenv("DJANGO_JINJA2_BYTECODE_DIR")) if os.getenv("DJANGO_JINJA2_BYTECODE_DIR") else None
+
 WSGI_APPLICATION = 'schoolcomms.wsgi.application'
 
 
@@ -108,6 +134,163 @@ DATABASES = {
     }
 }
 
+# 複数校（テナント）設定
+# DJANGO_SCHOOLS="school-a=/home/data/school-a.sqlite3,school-b" の形式で学校コードを列挙する。
+#   コード=パス : その学校専用のSQLiteファイルを使う（エイリアス school_<コード> を追加）
+#   コードのみ  : default DB を共有し、School 外部キーで絞り込む
+# 学校はホスト名の先頭ラベルで判定する（school-a.example.com → school-a）。
+# 専用DBは `python manage.py migrate --database=school_<コード>` で作成する。
+SCHOOLS = {}
+_REPLICA_PATHS = {}
+for _item in [x.strip() for x in os.getenv("DJANGO_SCHOOLS", "").split(",") if x.strip()]:
+    _code, _, _path = _item.partition("=")
+    _code = _code.strip()
+    _path, _, _replica_path = _path.partition("|")
+    if _path.strip():
+        _alias = f"school_{_code}"
+        DATABASES[_alias] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': Path(_path.strip()),
+        }
+        SCHOOLS[_code] = _alias
+        if _replica_path.strip():
+            _REPLICA_PATHS[_alias] = _replica_path.strip()
+    else:
+        SCHOOLS[_code] = "default"
+
+# 読み取り専用レプリカ
+# DJANGO_REPLICA_DB_PATH（学校専用DBは DJANGO_SCHOOLS の "コード=パス|レプリカのパス"）を設定すると、
+# ダッシュボード・履歴・管理画面一覧の読み取りをレプリカへ振り分ける。
+# レプリカは `python manage.py sync_replica` を定期実行して作る。最終同期が
+# DJANGO_REPLICA_MAX_LAG_SECONDS より古い場合と、書き込み直後の同じ時間はプライマリで読む。
+if os.getenv("DJANGO_REPLICA_DB_PATH"):
+    _REPLICA_PATHS["default"] = os.getenv("DJANGO_REPLICA_DB_PATH")
+REPLICAS = {}
+for _primary, _replica_path in _REPLICA_PATHS.items():
+    _alias = "replica" if _primary == "default" else f"{_primary}_replica"
+    DATABASES[_alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': Path(_replica_path),
+        'OPTIONS': {"init_command": "PRAGMA query_only = 1;"},  # 誤って書き込まないよう読み取り専用で開く
+        'TEST': {"MIRROR": _primary},
+    }
+    REPLICAS[_primary] = _alias
+REPLICA_MAX_LAG_SECONDS = int(os.getenv("DJANGO_REPLICA_MAX_LAG_SECONDS", "60"))
+
+DATABASE_ROUTERS = ["core.replica.ReplicaRouter", "core.tenancy.SchoolRouter"]
+
+# バックアップ（backup_db / restore_db）
+# 圧縮スナップショットの保存先と保持数（15分間隔なら 96 件で約1日分）
+BACKUP_DIR = Path(os.getenv("DJANGO_BACKUP_DIR", DB_PATH.parent / "backups"))
+BACKUP_KEEP = int(os.getenv("DJANGO_BACKUP_KEEP", "96"))
+
+# 週次レポート（build_reports）の出力先
+REPORTS_DIR = Path(os.getenv("DJANGO_REPORTS_DIR", DB_PATH.parent / "reports"))
+
+# Cache
+# 条件付きGET（ETag）のバージョンカウンタ等で使用。gunicorn の全ワーカーと管理コマンド・run_worker の間で
+# 共有する必要があるため、ファイルキャッシュを DJANGO_CACHE_DIR（未設定時はDBと同じ場所の cache/）に置く。
+# プロセスごとに別になる LocMemCache は DEBUG 時だけ使う（本番で使うと core.checks がエラーにする）。
+_CACHE_DIR = os.getenv("DJANGO_CACHE_DIR") or ("" if DEBUG else str(DB_PATH.parent / "cache"))
+_SHARED_CACHE = bool(_CACHE_DIR)
+if _SHARED_CACHE:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": _CACHE_DIR,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Sessions / Messages
+# 既定は、共有キャッシュ（DJANGO_CACHE_DIR）があれば cached_db（読み込みはキャッシュ優先、DBはミス時と書き込み時のみ）、
+# なければ db。LocMemCache で cached_db にすると、ログアウトしても他のワーカーのキャッシュに
+# セッションが残って使えてしまうため、この組み合わせは起動時にエラーにする。
+# DJANGO_SESSION_ENGINE=signed_cookies にするとセッションテーブルを一切使わない
+# （ただしサーバー側でセッションを失効できないため、ログアウト時の無効化はクッキー削除のみとなる）。
+_SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "core.sessions",  # cached_db にキャッシュヒット率の計測を加えたもの
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_ENGINE = _SESSION_ENGINES[os.getenv("DJANGO_SESSION_ENGINE", "cached_db" if _SHARED_CACHE else "db")]
+if SESSION_ENGINE == _SESSION_ENGINES["cached_db"] and not _SHARED_CACHE:
+    raise ImproperlyConfigured("DJANGO_SESSION_ENGINE=cached_db には共有キャッシュ（DJANGO_CACHE_DIR）が必要です。")
+SESSION_CACHE_ALIAS = os.getenv("DJANGO_SESSION_CACHE_ALIAS", "default")
+# フラッシュメッセージはクッキーに保存（セッションへの書き込みを発生させない）
+MESSAGE_STORAGE = "django.contrib.messages.storage.cookie.CookieStorage"
+
+# 監視
+# レディネスチェックでDB往復がこの時間（ミリ秒）を超えたら degraded（503）を返す
+READINESS_DB_THRESHOLD_MS = int(os.getenv("DJANGO_READINESS_DB_THRESHOLD_MS", "200"))
+# 設定時は /metrics/ に "Authorization: Bearer <token>" を要求する
+METRICS_TOKEN = os.getenv("DJANGO_METRICS_TOKEN", "")
+
+# 早期警戒スコア（compute_risk）がこの値以上の生徒を担任ダッシュボードで強調表示する
+RISK_ALERT_THRESHOLD = float(os.getenv("DJANGO_RISK_ALERT_THRESHOLD", "40"))
+
+# 担当教員向けダイジェスト（build_digests）の未読一覧は、対象登校日の前この日数分の連絡帳に限る
+DIGEST_UNREAD_DAYS = int(os.getenv("DJANGO_DIGEST_UNREAD_DAYS", "14"))
+
+# 管理画面のユーザー・生徒検索（core.search）
+# オートコンプリートは入力が止まってから DELAY_MS 後に問い合わせ、関連度順に LIMIT 件を返す。
+# 一覧画面の検索は件数を制限しない
+ADMIN_AUTOCOMPLETE_DELAY_MS = int(os.getenv("DJANGO_ADMIN_AUTOCOMPLETE_DELAY_MS", "300"))
+ADMIN_AUTOCOMPLETE_MIN_CHARS = int(os.getenv("DJANGO_ADMIN_AUTOCOMPLETE_MIN_CHARS", "1"))
+ADMIN_AUTOCOMPLETE_LIMIT = int(os.getenv("DJANGO_ADMIN_AUTOCOMPLETE_LIMIT", "20"))
+
+# メール送信（build_digests --email）
+# 既定は標準出力へ表示（console）。DJANGO_EMAIL_FILE_PATH を設定するとそのディレクトリへ書き出す（file）。
+# 実際に送信する場合は DJANGO_EMAIL_BACKEND=smtp と DJANGO_EMAIL_HOST 等を設定する
+_EMAIL_BACKENDS = {
+    "console": "django.core.mail.backends.console.EmailBackend",
+    "file": "django.core.mail.backends.filebased.EmailBackend",
+    "smtp": "django.core.mail.backends.smtp.EmailBackend",
+}
+EMAIL_FILE_PATH = os.getenv("DJANGO_EMAIL_FILE_PATH", "")
+EMAIL_BACKEND = _EMAIL_BACKENDS[os.getenv("DJANGO_EMAIL_BACKEND", "file" if EMAIL_FILE_PATH else "console")]
+EMAIL_HOST = os.getenv("DJANGO_EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.getenv("DJANGO_EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.getenv("DJANGO_EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.getenv("DJANGO_EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.getenv("DJANGO_EMAIL_USE_TLS", "False").lower() == "true"
+DEFAULT_FROM_EMAIL = os.getenv("DJANGO_DEFAULT_FROM_EMAIL", "noreply@localhost")
+
+
+# パスワードハッシュ・ログイン集中対策（core.auth）
+# DJANGO_PASSWORD_HASHER で新しく保存するハッシュ方式（pbkdf2 / argon2 / scrypt / bcrypt）を選ぶ
+# （argon2 / bcrypt は argon2-cffi / bcrypt の追加インストールが必要）。
+# DJANGO_PBKDF2_ITERATIONS で PBKDF2 の反復回数を変えられる（0 は Django の既定値）。
+# 既存のハッシュは、次回ログイン成功時に選んだ方式・反復回数で自動的に再ハッシュされる。
+_HASHERS = {
+    "pbkdf2": "core.auth.TunablePBKDF2PasswordHasher",
+    "argon2": "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "scrypt": "django.contrib.auth.hashers.ScryptPasswordHasher",
+    "bcrypt": "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+}
+_preferred_hasher = _HASHERS[os.getenv("DJANGO_PASSWORD_HASHER", "pbkdf2")]
+PASSWORD_HASHERS = [_preferred_hasher] + [
+    h for h in [*_HASHERS.values(), "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher"]
+    if h != _preferred_hasher
+]
+PBKDF2_ITERATIONS = int(os.getenv("DJANGO_PBKDF2_ITERATIONS", "0"))
+
+# パスワード検証をプロセス内で同時に行う件数（0 で無制限）と、空きを待つ最大秒数。
+# 待ちきれない場合は 503 と Retry-After を返す
+AUTHENTICATION_BACKENDS = ["core.auth.LimitedModelBackend"]
+LOGIN_HASH_CONCURRENCY = int(os.getenv("DJANGO_LOGIN_HASH_CONCURRENCY", "2"))
+LOGIN_HASH_WAIT_SECONDS = float(os.getenv("DJANGO_LOGIN_HASH_WAIT_SECONDS", "10"))
+LOGIN_RETRY_AFTER_SECONDS = int(os.getenv("DJANGO_LOGIN_RETRY_AFTER_SECONDS", "5"))
+
+# ログイン画面の「この端末を記憶する」でセッションを延長する日数（0 で項目を表示しない）。
+# signed_cookies セッションでは SESSION_COOKIE_AGE が上限になる
+REMEMBER_DEVICE_DAYS = int(os.getenv("DJANGO_REMEMBER_DEVICE_DAYS", "30"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -145,6 +328,23 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / "staticfiles"  # 本番: collectstatic 置き場
+STATICFILES_DIRS = [BASE_DIR / "static"]
+
+# 本番は collectstatic でハッシュ付きファイル名＋圧縮版（gzip / brotli※）を生成して WhiteNoise で配信する。
+# ハッシュ付きファイルは WhiteNoise が immutable・長期キャッシュ（max-age 10年）で返す。
+# ※brotli は Brotli パッケージがインストールされている場合のみ生成される。
+# DEBUG 時は collectstatic 前でも動くよう通常のストレージを使う（DJANGO_STATIC_MANIFEST で上書き可。テストは test_settings）。
+_STATIC_MANIFEST = os.getenv("DJANGO_STATIC_MANIFEST", str(not DEBUG)).lower() == "true"
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": (
+            "whitenoise.storage.CompressedManifestStaticFilesStorage"
+            if _STATIC_MANIFEST
+            else "django.contrib.staticfiles.storage.StaticFilesStorage"
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -157,14 +357,22 @@ LOGOUT_REDIRECT_URL = "/accounts/login/"  # ログアウト後の遷移先
 LOGIN_URL = "/accounts/login/"    # ログインが必要なページでリダイレクトされるURL
 
 #ログ出力（本番環境時）
+# DJANGO_LOG_INFO_SAMPLE: INFO 以下のログを出力する割合（0.0〜1.0、既定 1.0 = 全件）
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
         "verbose": {"format": "[{levelname}] {asctime} {name}: {message}", "style": "{"},
+        "json": {"()": "schoolcomms.logconfig.JsonFormatter"},
+    },
+    "filters": {
+        "sample_info": {
+            "()": "schoolcomms.logconfig.InfoSampleFilter",
+            "rate": float(os.getenv("DJANGO_LOG_INFO_SAMPLE", "1.0")),
+        },
     },
     "handlers": {
-        "console": {"class": "logging.StreamHandler", "formatter": "verbose"},
+        "console": {"class": "logging.StreamHandler", "formatter": "verbose", "filters": ["sample_info"]},
         # ← 最初は console だけ。file は後で条件付きで追加
     },
     "root": {"handlers": ["console"], "level": "INFO"},
@@ -175,11 +383,26 @@ LOGGING = {
 }
 
 # Azure App Service(Linux) 上にあるときだけファイル出力を追加（ローカルにはログファイルがないため定義）
+# ファイル書き込みはキュー経由でバックグラウンドスレッドが行う（リクエスト処理をディスク遅延で待たせない）。
+#   DJANGO_LOG_WHEN      : 設定時は時間ベースでローテーション（例: midnight）。未設定時はサイズベース
+#   DJANGO_LOG_MAX_BYTES : サイズベースのローテーション閾値（既定 10MB）
+#   DJANGO_LOG_BACKUP_COUNT : 世代数（既定 5）
+#   DJANGO_LOG_JSON      : true で1行1JSON形式
+#   DJANGO_LOG_EXTERNAL_ROTATION : true でアプリ側ではローテーションせず、外部（logrotate 等）に任せる
+# ※サイズ・時間ベースのどちらも各ワーカーがそれぞれファイル名を変更するため、複数ワーカーが
+#   同じファイルに書くと競合する（時間ベースでも日付の変わり目に全ワーカーがローテーションする）。
+#   複数ワーカー時は DJANGO_LOG_EXTERNAL_ROTATION=true とし、logrotate（copytruncate または
+#   ローテーション後にファイルを作り直す設定）でローテーションすること
 if os.path.isdir("/home/LogFiles"):
     LOGGING["handlers"]["file"] = {
-        "class": "logging.FileHandler",
+        "()": "schoolcomms.logconfig.QueueFileHandler",
         "filename": "/home/LogFiles/django_error.log",
-        "formatter": "verbose",
+        "max_bytes": int(os.getenv("DJANGO_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+        "backup_count": int(os.getenv("DJANGO_LOG_BACKUP_COUNT", "5")),
+        "when": os.getenv("DJANGO_LOG_WHEN") or None,
+        "external_rotation": os.getenv("DJANGO_LOG_EXTERNAL_ROTATION", "False").lower() == "true",
+        "formatter": "json" if os.getenv("DJANGO_LOG_JSON", "False").lower() == "true" else "verbose",
+        "filters": ["sample_info"],
     }
     LOGGING["root"]["handlers"].append("file")
     LOGGING["loggers"]["django.request"]["handlers"].append("file")
@@ -0,0 +1,25 @@
+# テスト用の設定（manage.py test のときに manage.py が既定で選ぶ）
+#
+# 本番の settings を読み込んだうえで、テストでしか使わないものだけを上書きする。
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, STORAGES
+import os
+
+# 学校専用DB・レプリカへの振り分けを確かめるためのエイリアス
+# （テスト用DBはエイリアスごとに別のインメモリDB。SCHOOLS / REPLICAS はテスト側で override_settings する）
+DATABASES = {
+    **DATABASES,
+    **{
+        alias: {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"{alias}.sqlite3"}
+        for alias in ("school_b", "replica_test")
+        if alias not in DATABASES
+    },
+}
+
+# collectstatic 前でも動くよう通常のストレージを使う（DJANGO_STATIC_MANIFEST=true のときだけ本番と同じ）
+if os.getenv("DJANGO_STATIC_MANIFEST", "false").lower() != "true":
+    STORAGES = {**STORAGES, "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"}}
+
+# テストは1プロセスで動くため、ファイルを残さないプロセス内キャッシュを使う
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+SILENCED_SYSTEM_CHECKS = ["core.E001"]
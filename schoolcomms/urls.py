@@ -22,12 +22,23 @@ urlpatterns = [
     # 教師用の画面
     path("teacher/dashboard/", views.teacher_dashboard, name="teacher_dashboard"),
     path("teacher/entry/<int:entry_id>/read/", views.mark_read, name="mark_read"),
+
+    # タブレット・モバイル向けの JSON API（バージョンをパスに含める）
+    path("api/v1/", include("core.api")),
     
     # custom_login画面（/accounts/login/ を自作で処理、処理順の関係から標準ログイン画面より先の処理順で実装）
     path("accounts/login/", views.custom_login, name="custom_login"),
     # ログイン画面
     path("accounts/", include("django.contrib.auth.urls")),
 
+    # バックグラウンドジョブの状態確認（管理者用）
+    path("jobs/<int:job_id>/", views.job_status, name="job_status"),
+
+    # 監視用（死活確認・DB往復を含むレディネス・Prometheus メトリクス）
+    path("health/", health, name="health"),
+    path("ready/", views.readiness, name="readiness"),
+    path("metrics/", views.metrics_view, name="metrics"),
+
     # ✅ 最後に一時的な確認用ルートを追加
     path("check/", lambda request: HttpResponse("OK", content_type="text/plain")),
 ]
\ No newline at end of file
@@ -0,0 +1,63 @@
+# 起動直後の初回リクエストが遅くならないよう、よく使う処理を事前に実行しておく
+#
+# gunicorn の preload_app 時はマスタープロセスで1回実行し、fork したワーカーに引き継ぐ
+# （gunicorn_conf.py の when_ready から呼ぶ）。DBには接続しない。
+
+import time
+from datetime import timedelta
+from pathlib import Path
+
+
+def _urls():
+    from django.urls import get_resolver, reverse
+
+    # URLconf の読み込みと逆引き用の辞書の構築
+    get_resolver().reverse_dict
+    for name in ("custom_login", "home", "student_entry_new", "student_entries", "teacher_dashboard"):
+        reverse(name)
+
+
+def _templates():
+    from django.conf import settings
+    from django.template import engines
+
+    # DIRS 配下の全テンプレートを読み込み、キャッシュローダーにコンパイル結果を保持させる
+    engine = engines["django"]
+    count = 0
+    for directory in settings.TEMPLATES[0]["DIRS"]:
+        for path in sorted(Path(directory).rglob("*.html")):
+            engine.get_template(path.relative_to(directory).as_posix())
+            count += 1
+    for name in ("admin/index.html", "admin/change_list.html", "admin/change_form.html"):
+        engine.get_template(name)
+    # Jinja2 版（一覧画面）もコンパイルして Environment に保持させる
+    if settings.LIST_TEMPLATE_ENGINE == "jinja2":
+        env = engines["jinja2"].env
+        for name in env.list_templates(extensions=["html"]):
+            env.get_template(name)
+            count += 1
+    return count
+
+
+def _calendar():
+    from django.utils import timezone
+    from core.models import calc_prev_schoolday, is_holiday
+
+    # 祝日判定のキャッシュを前後1年分埋め、前登校日を一度計算しておく
+    today = timezone.localdate()
+    for offset in range(-366, 367):
+        is_holiday(today + timedelta(days=offset))
+    calc_prev_schoolday()
+
+
+STEPS = (("urls", _urls), ("templates", _templates), ("calendar", _calendar))
+
+
+def warm_up():
+    """各ステップの所要時間（秒）を返す"""
+    timings = {}
+    for name, func in STEPS:
+        started = time.perf_counter()
+        func()
+        timings[name] = time.perf_counter() - started
+    return timings